@@ -4,16 +4,20 @@ import pandas as pd
 from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, flash, session
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.datastructures import MultiDict
+from pymongo import ASCENDING, DESCENDING
 import logging
 from datetime import datetime
 from typing import List, Dict, Any
-import tempfile
-import io
+import shutil
 import uuid
 
 from config import Config
-from models import Database, VendorSession, Vendor
+from models import Database, VendorSession, Vendor, ClassificationCache, CATEGORY_NAMES, annotate_for_category
 from gemini_ai import classify_vendor, VendorClassificationResult
+from batch_classifier import BatchVendorClassifier
+from exporter import CategorizedExporter
+from vendor_keys import normalize_vendor_name, has_tax_id
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,6 +32,19 @@ Config.init_app(app)
 db = Database(app.config['MONGO_URI'], app.config['MONGO_DB_NAME'])
 vendor_session_model = VendorSession(db)
 vendor_model = Vendor(db)
+classification_cache = ClassificationCache(db)
+
+# Batched AI classifier (falls back to rules when no model backend is configured)
+batch_classifier = BatchVendorClassifier(
+    cache=classification_cache,
+    batch_size=app.config['AI_BATCH_SIZE'],
+    max_workers=app.config['AI_MAX_WORKERS'],
+    requests_per_minute=app.config['AI_REQUESTS_PER_MINUTE'],
+    max_retries=app.config['AI_MAX_RETRIES']
+)
+
+# Categorized exports, cached per session data version
+exporter = CategorizedExporter(vendor_model, os.path.join(app.config['UPLOAD_FOLDER'], 'exports'))
 
 # File upload settings
 ALLOWED_EXTENSIONS = app.config['ALLOWED_EXTENSIONS']
@@ -54,10 +71,22 @@ def get_vendor_data() -> List[Dict[str, Any]]:
     return vendor_model.get_vendors_by_session(session_id)
 
 
-def set_vendor_data(data: List[Dict[str, Any]]) -> bool:
-    """Set vendor data for current session in MongoDB"""
+def set_vendor_data(data: List[Dict[str, Any]], merge: bool = False) -> bool:
+    """Set vendor data for current session in MongoDB
+    
+    With merge=True the upload is diffed against the stored vendors so notes and
+    manual classifications survive a corrected re-upload.
+    """
     session_id = get_session_id()
     
+    if merge:
+        merge_stats = vendor_model.merge_vendors(session_id, data)
+        if merge_stats is None:
+            return False
+        
+        vendor_session_model.increment_totals(session_id, merge_stats['count_delta'], merge_stats['amount_delta'])
+        return True
+    
     # Replace all vendors for this session
     success = vendor_model.replace_all_vendors(session_id, data)
     
@@ -71,6 +100,33 @@ def set_vendor_data(data: List[Dict[str, Any]]) -> bool:
     return success
 
 
+def classify_unclassified_vendors(session_id: str, vendors_data: List[Dict[str, Any]], use_ai: bool = True) -> Dict[str, Any]:
+    """Classify vendors without a classification and persist the results
+    
+    Updates vendors_data in place and returns the batch classifier statistics.
+    """
+    unclassified = [v for v in vendors_data if not v.get('classification')]
+    results, stats = batch_classifier.classify(unclassified, use_ai=use_ai)
+    
+    batch_updates = []
+    for vendor in unclassified:
+        result = results[vendor['global_index']]
+        update_data = {
+            'classification': result.classification,
+            'form': result.form,
+            'reason': result.reason
+        }
+        vendor.update(update_data)
+        batch_updates.append({'global_index': vendor['global_index'], **update_data})
+    
+    # Batch update database
+    if batch_updates:
+        vendor_model.bulk_update_vendors(session_id, batch_updates)
+    
+    stats['classified_count'] = len(batch_updates)
+    return stats
+
+
 @app.route('/')
 def index():
     """Main page with file upload form"""
@@ -98,8 +154,9 @@ def upload_file():
             # Process the uploaded file
             vendors_data = process_vendor_file(filepath)
             
-            # Save to MongoDB
-            if set_vendor_data(vendors_data):
+            # Save to MongoDB (merge keeps notes/manual classifications from earlier uploads)
+            merge = request.form.get('merge', '') in ('1', 'true', 'on')
+            if set_vendor_data(vendors_data, merge=merge):
                 # Update session with file info
                 session_id = get_session_id()
                 vendor_session_model.update_session(session_id, {
@@ -260,25 +317,6 @@ def detect_columns(df: pd.DataFrame) -> Dict[str, str]:
     return column_mapping
 
 
-def normalize_vendor_name(vendor_name: str) -> str:
-    """Normalize vendor name for deduplication"""
-    # Convert to lowercase and remove common variations
-    normalized = vendor_name.lower().strip()
-    
-    # Remove common suffixes and prefixes
-    suffixes = ['inc', 'inc.', 'corp', 'corp.', 'llc', 'ltd', 'ltd.', 'co', 'co.', 'company']
-    for suffix in suffixes:
-        if normalized.endswith(' ' + suffix):
-            normalized = normalized[:-len(suffix)-1].strip()
-    
-    # Remove special characters and extra spaces
-    import re
-    normalized = re.sub(r'[^\w\s]', '', normalized)
-    normalized = re.sub(r'\s+', ' ', normalized).strip()
-    
-    return normalized
-
-
 def categorize_vendors(vendors: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
     """Categorize vendors into three lists based on classification"""
     categories = {
@@ -289,13 +327,12 @@ def categorize_vendors(vendors: List[Dict[str, Any]]) -> Dict[str, List[Dict[str
     
     for vendor in vendors:
         classification = vendor.get('classification', '')
-        vendor_id = vendor.get('vendor_id', '').strip()
         
-        # Enhanced detection: Check if vendor has a valid tax ID
-        no_tax_id_phrases = ['no tax id', 'no ssn', 'no ein', 'missing', 'not provided', 'n/a']
-        has_tax_id = bool(vendor_id and 
-                         vendor_id != '-' and 
-                         not any(phrase in vendor_id.lower() for phrase in no_tax_id_phrases))
+        # Same check as the stored has_tax_id flag used by paginated /results, so
+        # both views dual-list the same vendors. Unlike the earlier inline check,
+        # placeholder IDs ('none', 'null', 'nan', 'na') count as missing, so a
+        # 1099-Eligible vendor carrying one is now also listed under W-9 Required.
+        vendor_has_tax_id = has_tax_id(vendor.get('vendor_id', ''))
         
         total_paid = vendor.get('total_paid', 0)
         
@@ -303,7 +340,7 @@ def categorize_vendors(vendors: List[Dict[str, Any]]) -> Dict[str, List[Dict[str
             categories[classification].append(vendor)
             
             # Rule 1: If 1099-Eligible but no SSN/EIN, also add to W-9 Required
-            if classification == '1099-Eligible' and not has_tax_id:
+            if classification == '1099-Eligible' and not vendor_has_tax_id:
                 categories['W-9 Required'].append(vendor)
             
             # Rule 2: If W-9 Required with $600+, also add to 1099-Eligible
@@ -329,134 +366,171 @@ def categorize_vendors(vendors: List[Dict[str, Any]]) -> Dict[str, List[Dict[str
     return categories
 
 
-def calculate_vendor_stats_safe(vendors: List[Dict[str, Any]], categories: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
-    """Calculate comprehensive statistics with guaranteed keys"""
-    total_vendors = len(vendors)
-    total_amount = sum(vendor.get('total_paid', 0) for vendor in vendors)
-    total_transactions = sum(vendor.get('transaction_count', 1) for vendor in vendors)
+def calculate_session_stats(session_id: str) -> Dict[str, Any]:
+    """Calculate comprehensive statistics with guaranteed keys (single Mongo aggregation)"""
+    summary = vendor_model.get_session_summary(session_id)
+    totals = summary['totals']
+    
+    total_vendors = totals.get('total_vendors', 0)
     
     # Ensure all required categories exist
-    required_categories = ['1099-Eligible', 'Non-Reportable', 'W-9 Required']
     category_stats = {}
-    
-    for category_name in required_categories:
-        category_vendors = categories.get(category_name, [])
-        category_total = sum(vendor.get('total_paid', 0) for vendor in category_vendors)
+    for category_name in CATEGORY_NAMES:
+        category = summary['categories'].get(category_name, {'count': 0, 'total_amount': 0})
         category_stats[category_name] = {
-            'count': len(category_vendors),
-            'total_amount': category_total,
-            'percentage': (len(category_vendors) / total_vendors * 100) if total_vendors > 0 else 0
+            'count': category['count'],
+            'total_amount': category['total_amount'],
+            'percentage': (category['count'] / total_vendors * 100) if total_vendors > 0 else 0
         }
     
     # Form type statistics with guaranteed keys
     required_forms = ['1099-NEC', '1099-MISC', 'Not Required', 'W-9 Needed', 'Unclassified']
-    form_stats = {}
+    form_stats = {form_type: {'count': 0, 'total_amount': 0} for form_type in required_forms}
+    form_stats.update(summary['forms'])
     
-    for form_type in required_forms:
-        form_stats[form_type] = {'count': 0, 'total_amount': 0}
-    
-    for vendor in vendors:
-        form_type = vendor.get('form', 'Unclassified')
-        if form_type not in form_stats:
-            form_stats[form_type] = {'count': 0, 'total_amount': 0}
-        form_stats[form_type]['count'] += 1
-        form_stats[form_type]['total_amount'] += vendor.get('total_paid', 0)
-    
-    # Threshold analysis
-    over_600 = [v for v in vendors if v.get('total_paid', 0) >= 600]
-    under_600 = [v for v in vendors if v.get('total_paid', 0) < 600]
+    classified_count = totals.get('classified_count', 0)
+    over_600_count = totals.get('over_600_count', 0)
     
     return {
         'total_vendors': total_vendors,
-        'total_amount': total_amount,
-        'total_transactions': total_transactions,
+        'total_amount': totals.get('total_amount', 0),
+        'total_transactions': totals.get('total_transactions', 0),
         'categories': category_stats,
         'forms': form_stats,
-        'over_600_count': len(over_600),
-        'under_600_count': len(under_600),
-        'over_600_amount': sum(v.get('total_paid', 0) for v in over_600),
-        'classified_count': len([v for v in vendors if v.get('classification')]),
-        'unclassified_count': len([v for v in vendors if not v.get('classification')])
+        'over_600_count': over_600_count,
+        'under_600_count': total_vendors - over_600_count,
+        'over_600_amount': totals.get('over_600_amount', 0),
+        'classified_count': classified_count,
+        'unclassified_count': total_vendors - classified_count
     }
 
 
+def get_vendor_page(session_id: str, category: str, args) -> Dict[str, Any]:
+    """Fetch one page of a category tab using request query parameters"""
+    def to_float(value):
+        try:
+            return float(value) if value not in (None, '') else None
+        except ValueError:
+            return None
+    
+    vendor_page = vendor_model.get_vendors_page(
+        session_id,
+        category=category if category in CATEGORY_NAMES else None,
+        page=args.get('page', 1, type=int),
+        per_page=args.get('per_page', app.config['RESULTS_PAGE_SIZE'], type=int),
+        sort_field=args.get('sort', 'global_index'),
+        sort_direction=DESCENDING if args.get('order') == 'desc' else ASCENDING,
+        search=args.get('q') or None,
+        form=args.get('form') or None,
+        min_amount=to_float(args.get('min_amount')),
+        max_amount=to_float(args.get('max_amount'))
+    )
+    vendor_page['vendors'] = [annotate_for_category(vendor, category) for vendor in vendor_page['vendors']]
+    vendor_page['category'] = category
+    return vendor_page
+
+
 @app.route('/results')
 def results():
-    """Display results page with categorized vendor data"""
-    vendors_data = get_vendor_data()
-    if not vendors_data:
+    """Display results page with categorized, paginated vendor data"""
+    session_id = get_session_id()
+    stats = calculate_session_stats(session_id)
+    if not stats['total_vendors']:
         flash('No vendor data available. Please upload a file first.')
         return redirect(url_for('index'))
     
-    # Categorize vendors
-    vendor_categories = categorize_vendors(vendors_data)
+    # The active tab honours the paging/sort/filter parameters, others show page 1
+    active_category = request.args.get('category', '1099-Eligible')
+    if active_category not in CATEGORY_NAMES + ['All']:
+        active_category = '1099-Eligible'
     
-    # Calculate statistics with guaranteed keys
-    stats = calculate_vendor_stats_safe(vendors_data, vendor_categories)
+    vendor_pages = {}
+    for category in CATEGORY_NAMES + ['All']:
+        args = request.args if category == active_category else {}
+        vendor_pages[category] = get_vendor_page(session_id, category, MultiDict(args))
     
     return render_template('results.html', 
-                         vendors=vendors_data,
-                         vendor_categories=vendor_categories,
+                         vendor_pages=vendor_pages,
+                         active_category=active_category,
+                         filters=request.args,
                          stats=stats,
                          processed_vendors=True)
 
 
+@app.route('/api/v1/vendors', methods=['GET'])
+def api_list_vendors():
+    """
+    Paginated, sortable, filterable vendor listing
+    
+    Query parameters:
+    - session_id: (optional) API session ID; defaults to the browser session
+    - category: '1099-Eligible', 'Non-Reportable', 'W-9 Required' or 'All'
+    - page, per_page: Pagination (per_page max 1000)
+    - sort: global_index, vendor_name, total_paid, transaction_count, classification, form
+    - order: 'asc' or 'desc'
+    - q: Vendor name search; form, min_amount, max_amount: filters
+    - include_stats: 'true' to include category/form statistics
+    """
+    try:
+        session_id = request.args.get('session_id') or get_session_id()
+        category = request.args.get('category', 'All')
+        
+        vendor_page = get_vendor_page(session_id, category, request.args)
+        
+        result = {
+            'session_id': session_id,
+            'category': category,
+            'vendors': vendor_page['vendors'],
+            'total': vendor_page['total'],
+            'page': vendor_page['page'],
+            'per_page': vendor_page['per_page'],
+            'pages': vendor_page['pages']
+        }
+        if request.args.get('include_stats', '').lower() == 'true':
+            result['stats'] = calculate_session_stats(session_id)
+        
+        return jsonify({
+            'success': True,
+            'tool_id': 'tracker_1099',
+            'result': result,
+            'timestamp': datetime.utcnow().isoformat()
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error listing vendors: {e}", exc_info=True)
+        return jsonify({'success': False, 'tool_id': 'tracker_1099', 'error': str(e)}), 500
+
+
 @app.route('/classify', methods=['POST'])
 def classify_vendors():
-    """Fast classification using rule-based logic only"""
+    """Classify unclassified vendors with batched AI (cached, rule-based fallback)
+
+    AI is on by default; post {"use_ai": false} for the rules-only
+    classification this endpoint used to run.
+    """
     vendors_data = get_vendor_data()
     
     if not vendors_data:
         return jsonify({'error': 'No vendor data available'}), 400
     
     try:
-        import time
-        start = time.time()
-        
-        classified_count = 0
-        batch_updates = []
+        payload = request.get_json(silent=True) or {}
+        use_ai = bool(payload.get('use_ai', True))
         
-        for vendor in vendors_data:
-            if not vendor.get('classification'):
-                # Use ONLY fast fallback rules (skip AI entirely)
-                from gemini_ai import classify_vendor_fallback
-                
-                result = classify_vendor_fallback(
-                    vendor['vendor_name'],
-                    vendor['vendor_id'],
-                    vendor['total_paid'],
-                    vendor['accounts']
-                )
-                
-                update_data = {
-                    'global_index': vendor['global_index'],
-                    'classification': result.classification,
-                    'form': result.form,
-                    'reason': result.reason
-                }
-                
-                batch_updates.append(update_data)
-                vendor.update({
-                    'classification': result.classification,
-                    'form': result.form,
-                    'reason': result.reason
-                })
-                
-                classified_count += 1
-        
-        # Batch update database
-        if batch_updates:
-            session_id = get_session_id()
-            vendor_model.bulk_update_vendors(session_id, batch_updates)
+        session_id = get_session_id()
+        stats = classify_unclassified_vendors(session_id, vendors_data, use_ai=use_ai)
         
-        elapsed = time.time() - start
-        logger.info(f"✅ Classified {classified_count} vendors in {elapsed:.2f} seconds")
+        logger.info(f"✅ Classified {stats['classified_count']} vendors in {stats['time_seconds']:.2f} seconds")
         
         return jsonify({
             'success': True,
-            'classified_count': classified_count,
+            'classified_count': stats['classified_count'],
             'total_vendors': len(vendors_data),
-            'time_seconds': elapsed
+            'time_seconds': stats['time_seconds'],
+            'cache_hits': stats['cache_hits'],
+            'ai_classified': stats['ai_classified'],
+            'fallback_classified': stats['fallback_classified'],
+            'backend': stats['backend']
         })
         
     except Exception as e:
@@ -476,9 +550,14 @@ def update_vendor():
         if vendor_index is None or field not in ['classification', 'form', 'reason', 'notes']:
             return jsonify({'error': 'Invalid request'}), 400
         
+        update_data = {field: value}
+        if field != 'notes':
+            # Keep user edits when a corrected file is merged in later
+            update_data['manually_classified'] = True
+        
         # Update in database
         session_id = get_session_id()
-        success = vendor_model.update_vendor(session_id, vendor_index, {field: value})
+        success = vendor_model.update_vendor(session_id, vendor_index, update_data)
         
         if success:
             return jsonify({'success': True})
@@ -517,7 +596,7 @@ def transfer_vendor():
             return jsonify({'success': False, 'error': f'Cannot transfer from {old_classification}'}), 400
         
         # Update vendor classification
-        update_data = {'classification': new_classification}
+        update_data = {'classification': new_classification, 'manually_classified': True}
         
         # Update form based on new classification
         if new_classification == '1099-Eligible':
@@ -543,167 +622,39 @@ def transfer_vendor():
 @app.route('/export/<format_type>')
 def export_data(format_type):
     """Export vendor data to CSV or Excel"""
-    vendors_data = get_vendor_data()
-    
-    if not vendors_data:
+    if format_type not in ('csv', 'excel'):
+        flash('Invalid export format')
+        return redirect(url_for('results'))
+
+    session_id = get_session_id()
+    if not vendor_model.get_vendor_count(session_id):
         flash('No data to export')
         return redirect(url_for('results'))
-    
+
     try:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
+        export_path, _ = exporter.get_export(session_id, format_type)
+
         if format_type == 'csv':
-            return export_to_csv(vendors_data, f'vendor_classification_{timestamp}.csv')
-        elif format_type == 'excel':
-            return export_to_excel_categorized(vendors_data, f'vendor_classification_{timestamp}.xlsx')
-        else:
-            flash('Invalid export format')
-            return redirect(url_for('results'))
-            
+            return send_file(
+                export_path,
+                as_attachment=True,
+                download_name=f'vendor_classification_{timestamp}.csv',
+                mimetype='text/csv'
+            )
+        return send_file(
+            export_path,
+            as_attachment=True,
+            download_name=f'vendor_classification_{timestamp}.xlsx',
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+
     except Exception as e:
         logger.error(f"Error exporting data: {e}")
         flash(f'Export failed: {str(e)}')
         return redirect(url_for('results'))
 
 
-def export_to_csv(vendors: List[Dict], filename: str):
-    """Export vendors to CSV format with category sections"""
-    vendor_categories = categorize_vendors(vendors)
-    
-    output = io.StringIO()
-    
-    # Write summary section
-    output.write('VENDOR CLASSIFICATION SUMMARY\n')
-    output.write('Category,Vendor Count,Total Amount ($),Percentage\n')
-    
-    total_vendors = len(vendors)
-    total_amount = sum(v.get('total_paid', 0) for v in vendors)
-    
-    output.write(f'OVERALL TOTAL,{total_vendors},{total_amount:.2f},100.0%\n')
-    
-    for category_name in ['1099-Eligible', 'Non-Reportable', 'W-9 Required']:
-        category_vendors = vendor_categories.get(category_name, [])
-        category_total = sum(v.get('total_paid', 0) for v in category_vendors)
-        category_count = len(category_vendors)
-        percentage = f"{(category_count / total_vendors * 100):.1f}%" if total_vendors > 0 else "0.0%"
-        output.write(f'{category_name},{category_count},{category_total:.2f},{percentage}\n')
-    
-    output.write('\n')
-    
-    # Define headers
-    headers = ['Vendor Name', 'SSN/EIN No.', 'Total Paid', 'Transaction Count',
-               'Classification', 'Likely 1099 Form', 'AI Reason', 'Accounts', 'Memo', 'Manual Notes']
-    
-    # Write categorized vendor data
-    for category_name in ['1099-Eligible', 'Non-Reportable', 'W-9 Required']:
-        category_vendors = vendor_categories.get(category_name, [])
-        
-        if category_vendors:
-            output.write('\n')
-            output.write(f'=== {category_name.upper()} ===\n')
-            output.write(','.join(headers) + '\n')
-            
-            for vendor in category_vendors:
-                row = [
-                    vendor.get('vendor_name', ''),
-                    vendor.get('vendor_id', ''),
-                    str(vendor.get('total_paid', 0)),
-                    str(vendor.get('transaction_count', 1)),
-                    vendor.get('classification', ''),
-                    vendor.get('form', ''),
-                    vendor.get('reason', ''),
-                    vendor.get('accounts', ''),
-                    vendor.get('memo', ''),
-                    vendor.get('notes', '')
-                ]
-                
-                # Escape commas in fields
-                escaped_row = []
-                for field in row:
-                    if ',' in str(field):
-                        escaped_row.append(f'"{field}"')
-                    else:
-                        escaped_row.append(str(field))
-                
-                output.write(','.join(escaped_row) + '\n')
-    
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        as_attachment=True,
-        download_name=filename,
-        mimetype='text/csv'
-    )
-
-
-def export_to_excel_categorized(vendors: List[Dict], filename: str):
-    """Export vendors to Excel with Summary tab and categorized sheets"""
-    vendor_categories = categorize_vendors(vendors)
-    
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-    
-    with pd.ExcelWriter(temp_file.name, engine='openpyxl') as writer:
-        # Create Summary sheet
-        summary_data = []
-        total_vendors = len(vendors)
-        total_amount = sum(v.get('total_paid', 0) for v in vendors)
-        
-        summary_data.append(['OVERALL TOTAL', total_vendors, total_amount, '100.0%'])
-        
-        for category_name in ['1099-Eligible', 'Non-Reportable', 'W-9 Required']:
-            category_vendors = vendor_categories.get(category_name, [])
-            category_total = sum(v.get('total_paid', 0) for v in category_vendors)
-            category_count = len(category_vendors)
-            percentage = f"{(category_count / total_vendors * 100):.1f}%" if total_vendors > 0 else "0.0%"
-            summary_data.append([category_name, category_count, category_total, percentage])
-        
-        summary_df = pd.DataFrame(summary_data)
-        summary_df.columns = ['Category', 'Vendor Count', 'Total Amount ($)', 'Percentage']
-        summary_df.to_excel(writer, sheet_name='Summary', index=False)
-        
-        # Create category sheets
-        headers = ['Vendor Name', 'SSN/EIN No.', 'Total Paid', 'Transaction Count',
-                   'Classification', 'Likely 1099 Form', 'AI Reason', 'Accounts', 'Memo', 'Manual Notes']
-        
-        category_order = ['1099-Eligible', 'Non-Reportable', 'W-9 Required']
-        
-        for category_name in category_order:
-            category_vendors = vendor_categories.get(category_name, [])
-            
-            if category_vendors:
-                data = []
-                for vendor in category_vendors:
-                    data.append([
-                        vendor.get('vendor_name', ''),
-                        vendor.get('vendor_id', ''),
-                        vendor.get('total_paid', 0),
-                        vendor.get('transaction_count', 1),
-                        vendor.get('classification', ''),
-                        vendor.get('form', ''),
-                        vendor.get('reason', ''),
-                        vendor.get('accounts', ''),
-                        vendor.get('memo', ''),
-                        vendor.get('notes', '')
-                    ])
-                
-                df = pd.DataFrame(data)
-                df.columns = headers
-                sheet_name = category_name.replace('/', '_').replace(' ', '_').replace('-', '_')[:31]
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-            else:
-                empty_df = pd.DataFrame(columns=headers)
-                sheet_name = category_name.replace('/', '_').replace(' ', '_').replace('-', '_')[:31]
-                empty_df.to_excel(writer, sheet_name=sheet_name, index=False)
-    
-    temp_file.close()
-    return send_file(
-        temp_file.name,
-        as_attachment=True,
-        download_name=filename,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-
-
 @app.route('/test_classify_one', methods=['POST'])
 def test_classify_one():
     """Test classification on a single vendor for debugging"""
@@ -795,9 +746,11 @@ def api_track_1099():
     Request (multipart/form-data or JSON):
     - action: 'add', 'classify', 'report'
     - file: (for add) Excel/CSV with vendor data
-    - session_id: (for classify/report) Session ID from 'add' step
+    - session_id: (for classify/report) Session ID from 'add' step;
+      (for add) merge the file into this existing session
     - tax_year: (optional) Tax year (default: current year)
     - format: (for report) 'excel' or 'csv'
+    - use_ai: (for classify) 'false' for rule-based classification only (default: true)
     
     Response:
     {
@@ -822,11 +775,13 @@ def api_track_1099():
             tax_year = data.get('tax_year', str(datetime.now().year))
             session_id_param = data.get('session_id')
             report_format = data.get('format', 'excel')
+            use_ai_param = data.get('use_ai', True)
         else:
             action = request.form.get('action', 'query')
             tax_year = request.form.get('tax_year', str(datetime.now().year))
             session_id_param = request.form.get('session_id')
             report_format = request.form.get('format', 'excel')
+            use_ai_param = request.form.get('use_ai', 'true')
         
         logger.info(f"Action: {action}")
         logger.info(f"Tax Year: {tax_year}")
@@ -855,10 +810,15 @@ def api_track_1099():
                     'error_type': 'invalid_file_type'
                 }), 400
             
-            # Create NEW session for this workflow
-            api_session_id = str(uuid.uuid4())
-            vendor_session_model.create_session(api_session_id)
-            logger.info(f"✅ Created new session: {api_session_id}")
+            # Merge into an existing session when one is given, otherwise start a new workflow
+            merging = bool(session_id_param and vendor_session_model.get_session(session_id_param))
+            if merging:
+                api_session_id = session_id_param
+                logger.info(f"Merging upload into existing session: {api_session_id}")
+            else:
+                api_session_id = str(uuid.uuid4())
+                vendor_session_model.create_session(api_session_id)
+                logger.info(f"✅ Created new session: {api_session_id}")
             
             # Save file temporarily
             filename = secure_filename(file.filename)
@@ -869,25 +829,43 @@ def api_track_1099():
                 # Process vendors
                 vendors_data = process_vendor_file(filepath)
                 
-                # Save to database
-                vendor_model.bulk_create_vendors(api_session_id, vendors_data)
-                
-                total_amount = sum(v.get('total_paid', 0) for v in vendors_data)
-                
-                # Update session
-                vendor_session_model.update_session(api_session_id, {
-                    'file_name': filename,
-                    'vendor_count': len(vendors_data),
-                    'total_amount': total_amount,
-                    'file_uploaded_at': datetime.utcnow(),
-                    'tax_year': tax_year
-                })
+                if merging:
+                    # Incremental merge: only changed vendors are written, totals adjusted with $inc
+                    merge_stats = vendor_model.merge_vendors(api_session_id, vendors_data)
+                    if merge_stats is None:
+                        raise Exception("Failed to merge vendors into session")
+                    vendor_session_model.increment_totals(
+                        api_session_id, merge_stats['count_delta'], merge_stats['amount_delta']
+                    )
+                    vendor_session_model.update_session(api_session_id, {
+                        'file_name': filename,
+                        'file_uploaded_at': datetime.utcnow(),
+                        'tax_year': tax_year
+                    })
+                    total_amount = vendor_session_model.get_session(api_session_id).get('total_amount', 0)
+                else:
+                    # Save to database
+                    vendor_model.bulk_create_vendors(api_session_id, vendors_data)
+                    
+                    total_amount = sum(v.get('total_paid', 0) for v in vendors_data)
+                    
+                    # Update session
+                    vendor_session_model.update_session(api_session_id, {
+                        'file_name': filename,
+                        'vendor_count': len(vendors_data),
+                        'total_amount': total_amount,
+                        'file_uploaded_at': datetime.utcnow(),
+                        'tax_year': tax_year
+                    })
+                    merge_stats = None
                 
                 result = {
                     'session_id': api_session_id,  # CRITICAL: Return this!
                     'vendors_processed': len(vendors_data),
                     'total_amount': total_amount
                 }
+                if merge_stats:
+                    result['merge'] = {k: merge_stats[k] for k in ('inserted', 'updated', 'unchanged', 'deleted')}
                 
                 logger.info(f"✅ Processed {len(vendors_data)} vendors")
                 
@@ -925,35 +903,10 @@ def api_track_1099():
             
             logger.info(f"Found {len(vendors_data)} vendors to classify")
             
-            # Fast classification using rule-based logic
-            classified_count = 0
-            batch_updates = []
-            
-            for vendor in vendors_data:
-                if not vendor.get('classification'):
-                    from gemini_ai import classify_vendor_fallback
-                    
-                    result_class = classify_vendor_fallback(
-                        vendor['vendor_name'],
-                        vendor['vendor_id'],
-                        vendor['total_paid'],
-                        vendor.get('accounts', '')
-                    )
-                    
-                    update_data = {
-                        'global_index': vendor['global_index'],
-                        'classification': result_class.classification,
-                        'form': result_class.form,
-                        'reason': result_class.reason
-                    }
-                    
-                    batch_updates.append(update_data)
-                    vendor.update(update_data)
-                    classified_count += 1
-            
-            # Batch update
-            if batch_updates:
-                vendor_model.bulk_update_vendors(api_session_id, batch_updates)
+            # Batched classification (cached AI results, rule-based fallback)
+            use_ai = str(use_ai_param).lower() not in ('false', '0', 'no')
+            classify_stats = classify_unclassified_vendors(api_session_id, vendors_data, use_ai=use_ai)
+            classified_count = classify_stats['classified_count']
             
             # Categorize
             categories = categorize_vendors(vendors_data)
@@ -962,6 +915,8 @@ def api_track_1099():
                 'session_id': api_session_id,
                 'classified_count': classified_count,
                 'total_vendors': len(vendors_data),
+                'cache_hits': classify_stats['cache_hits'],
+                'ai_classified': classify_stats['ai_classified'],
                 'categories': {
                     '1099-Eligible': len(categories.get('1099-Eligible', [])),
                     'Non-Reportable': len(categories.get('Non-Reportable', [])),
@@ -987,10 +942,7 @@ def api_track_1099():
             api_session_id = session_id_param
             logger.info(f"Generating report for session: {api_session_id}")
             
-            # Get vendors for this session
-            vendors_data = vendor_model.get_vendors_by_session(api_session_id)
-            
-            if not vendors_data:
+            if not vendor_model.get_vendor_count(api_session_id):
                 return jsonify({
                     'success': False,
                     'tool_id': 'tracker_1099',
@@ -999,82 +951,19 @@ def api_track_1099():
                 }), 400
             
             try:
-                # Generate report filename DIRECTLY in output folder (no temp file!)
+                export_format = 'csv' if report_format == 'csv' else 'excel'
+                extension = 'csv' if export_format == 'csv' else 'xlsx'
+                
+                # Generate report filename DIRECTLY in output folder
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                report_filename = f"1099_report_{tax_year}_{timestamp}.xlsx"
+                report_filename = f"1099_report_{tax_year}_{timestamp}.{extension}"
                 report_path = os.path.join(app.config['UPLOAD_FOLDER'], report_filename)
                 
-                logger.info(f"Creating Excel report at: {report_path}")
-                
-                # Categorize vendors
-                vendor_categories = categorize_vendors(vendors_data)
-                
-                # Create Excel file DIRECTLY (no temp file needed - Windows safe!)
-                with pd.ExcelWriter(report_path, engine='openpyxl') as writer:
-                    # Summary sheet
-                    summary_data = []
-                    total_vendors = len(vendors_data)
-                    total_amount = sum(v.get('total_paid', 0) for v in vendors_data)
-                    
-                    summary_data.append(['OVERALL TOTAL', total_vendors, f'${total_amount:,.2f}', '100.0%'])
-                    summary_data.append(['', '', '', ''])  # Blank row
-                    
-                    for category_name in ['1099-Eligible', 'Non-Reportable', 'W-9 Required']:
-                        category_vendors = vendor_categories.get(category_name, [])
-                        category_total = sum(v.get('total_paid', 0) for v in category_vendors)
-                        category_count = len(category_vendors)
-                        percentage = f"{(category_count / total_vendors * 100):.1f}%" if total_vendors > 0 else "0.0%"
-                        summary_data.append([
-                            category_name, 
-                            category_count, 
-                            f'${category_total:,.2f}', 
-                            percentage
-                        ])
-                    
-                    summary_df = pd.DataFrame(summary_data)
-                    summary_df.columns = ['Category', 'Vendor Count', 'Total Amount', 'Percentage']
-                    summary_df.to_excel(writer, sheet_name='Summary', index=False)
-                    
-                    logger.info("✅ Summary sheet created")
-                    
-                    # Category sheets
-                    headers = [
-                        'Vendor Name', 'SSN/EIN No.', 'Total Paid', 'Transaction Count',
-                        'Classification', 'Likely 1099 Form', 'AI Reason', 
-                        'Accounts', 'Memo', 'Manual Notes'
-                    ]
-                    
-                    for category_name in ['1099-Eligible', 'Non-Reportable', 'W-9 Required']:
-                        category_vendors = vendor_categories.get(category_name, [])
-                        
-                        data = []
-                        for vendor in category_vendors:
-                            data.append([
-                                vendor.get('vendor_name', ''),
-                                vendor.get('vendor_id', ''),
-                                vendor.get('total_paid', 0),
-                                vendor.get('transaction_count', 1),
-                                vendor.get('classification', ''),
-                                vendor.get('form', ''),
-                                vendor.get('reason', ''),
-                                vendor.get('accounts', ''),
-                                vendor.get('memo', ''),
-                                vendor.get('notes', '')
-                            ])
-                        
-                        if data:
-                            df = pd.DataFrame(data, columns=headers)
-                        else:
-                            df = pd.DataFrame(columns=headers)
-                        
-                        # Clean sheet name (max 31 chars, no special chars)
-                        sheet_name = category_name.replace('/', '_').replace(' ', '_').replace('-', '_')
-                        sheet_name = sheet_name[:31]
-                        
-                        df.to_excel(writer, sheet_name=sheet_name, index=False)
-                        logger.info(f"✅ Created sheet: {sheet_name} with {len(data)} vendors")
+                logger.info(f"Creating {export_format} report at: {report_path}")
                 
-                # File is automatically closed by the context manager - Windows safe!
+                # Streamed export, reused as long as the session data is unchanged
+                export_path, export_summary = exporter.get_export(api_session_id, export_format)
+                shutil.copyfile(export_path, report_path)
                 
                 # Verify file was created
                 if not os.path.exists(report_path):
@@ -1092,11 +981,9 @@ def api_track_1099():
                     'download_url': download_url,
                     'file_size': file_size,
                     'tax_year': tax_year,
-                    'vendors_count': len(vendors_data),
+                    'vendors_count': export_summary['total_vendors'],
                     'categories': {
-                        '1099-Eligible': len(vendor_categories.get('1099-Eligible', [])),
-                        'Non-Reportable': len(vendor_categories.get('Non-Reportable', [])),
-                        'W-9 Required': len(vendor_categories.get('W-9 Required', []))
+                        name: export_summary['categories'][name]['count'] for name in CATEGORY_NAMES
                     }
                 }
                 
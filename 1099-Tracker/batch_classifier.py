@@ -0,0 +1,474 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, List, Tuple
+
+import requests
+from google.genai import types
+from pydantic import BaseModel
+
+from gemini_ai import (
+    VendorClassificationResult,
+    classify_vendor_fallback,
+    enforce_tax_id_policy,
+    get_gemini_client,
+)
+from rule_engine import classify_vendor_records
+from vendor_keys import parse_amount, vendor_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Marker separating the instructions from the vendor payload in batch prompts.
+# The fake model server relies on it to find the vendors it was sent.
+VENDORS_MARKER = "VENDORS_JSON:"
+
+# Stands in for the vendor's own amount in cached reasons, which are shared by
+# every vendor in the same amount bucket
+AMOUNT_PLACEHOLDER = "{amount}"
+
+BATCH_PROMPT_TEMPLATE = """
+You are an AI-powered 1099 Vendor Eligibility Assistant. Classify EVERY vendor in the list below for accurate 2024 IRS 1099 form classification.
+
+**STRICT 1099-ELIGIBLE REQUIREMENTS - ALL MUST BE MET:**
+1. **MUST have SSN/EIN/Tax ID present** (not empty/missing)
+2. **MUST be $600+ payment**
+3. **MUST be for SERVICES only** (not goods/products/equipment)
+
+1099-ELIGIBLE (1099-NEC): consultants, contractors, freelancers, professional services, sole proprietors,
+single-member LLCs and partnerships providing services, ATTORNEYS/LAW FIRMS (even if corporations).
+
+1099-ELIGIBLE (1099-MISC): $600+ for rents, prizes, awards; $10+ royalties or broker payments;
+medical/healthcare SERVICE payments to corporations.
+
+**AUTOMATICALLY NON-REPORTABLE (never need W9):**
+- C-Corporations and S-Corporations (except attorney fees)
+- Government entities, banks and financial institutions, payroll services
+- Insurance companies, utilities, credit card companies and merchant services
+- Payments under $600 annually (except royalties), payments for GOODS/PRODUCTS/EQUIPMENT
+- Employee wages, foreign vendors
+
+W-9 REQUIRED (ONLY when we cannot determine entity type): missing Tax ID AND cannot determine
+if corporation/government/bank.
+
+Classify each vendor as "1099-Eligible", "Non-Reportable" or "W-9 Required" with form
+"1099-NEC", "1099-MISC", "Not Required" or "W-9 Needed".
+
+Respond with JSON in this exact format, one entry per vendor, echoing each vendor's "index":
+{{
+    "results": [
+        {{"index": 0, "classification": "...", "form": "...", "reason": "...", "confidence": 0.9}}
+    ]
+}}
+
+{marker}
+{vendors_json}
+"""
+
+
+class BatchVendorResult(BaseModel):
+    index: int
+    classification: str
+    form: str
+    reason: str
+    confidence: float
+
+
+class BatchClassificationResponse(BaseModel):
+    results: List[BatchVendorResult]
+
+
+def build_batch_prompt(vendors: List[Dict[str, Any]]) -> str:
+    """Pack a batch of vendors into a single classification prompt"""
+    payload = [
+        {
+            'index': position,
+            'vendor_name': vendor.get('vendor_name', ''),
+            'tax_id': vendor.get('vendor_id', ''),
+            'total_paid': round(parse_amount(vendor.get('total_paid', 0) or 0), 2),
+            'accounts': vendor.get('accounts', ''),
+        }
+        for position, vendor in enumerate(vendors)
+    ]
+    return BATCH_PROMPT_TEMPLATE.format(marker=VENDORS_MARKER, vendors_json=json.dumps(payload, indent=1))
+
+
+def parse_batch_response(raw_json: str) -> Dict[int, VendorClassificationResult]:
+    """Parse a model response into results keyed by batch position"""
+    if not raw_json:
+        raise ValueError("Empty response from model")
+
+    data = json.loads(raw_json)
+    # Some models return the bare list instead of the wrapping object
+    if isinstance(data, list):
+        data = {'results': data}
+
+    response = BatchClassificationResponse(**data)
+    return {
+        item.index: VendorClassificationResult(
+            classification=item.classification,
+            form=item.form,
+            reason=item.reason,
+            confidence=item.confidence
+        )
+        for item in response.results
+    }
+
+
+# ============================================================================
+# MODEL BACKENDS
+# ============================================================================
+
+class GeminiBatchBackend:
+    """Batch backend using the Gemini API"""
+
+    name = 'gemini'
+
+    def __init__(self, client, model: str = "gemini-2.5-flash"):
+        self.client = client
+        self.model = model
+        self.cache_source = f"gemini:{model}"
+
+    def generate(self, prompt: str) -> str:
+        response = self.client.models.generate_content(
+            model=self.model,
+            contents=[types.Content(role="user", parts=[types.Part(text=prompt)])],
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=BatchClassificationResponse,
+            ),
+        )
+        return response.text
+
+
+class HTTPBatchBackend:
+    """Batch backend for an Ollama-compatible /api/generate endpoint
+
+    Also used against the local fake model server (see start_fake_model_server).
+    """
+
+    name = 'http'
+
+    def __init__(self, endpoint: str, model: str = "gpt-oss", timeout: float = 60):
+        self.endpoint = endpoint
+        self.model = model
+        self.timeout = timeout
+        self.http = requests.Session()
+        # The endpoint is part of the source, so fake-server answers are never
+        # served to a real model's cache lookups
+        self.cache_source = f"http:{model}@{endpoint}"
+
+    def generate(self, prompt: str) -> str:
+        response = self.http.post(
+            self.endpoint,
+            json={
+                "model": self.model,
+                "prompt": prompt,
+                "stream": False,
+                "format": "json"
+            },
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json().get('response', '')
+
+
+def get_default_backend():
+    """Pick the batch backend from the environment
+
+    CLASSIFIER_ENDPOINT (an Ollama-compatible URL, e.g. the fake model server)
+    takes precedence over Gemini so tests never reach the real API.
+    """
+    endpoint = os.environ.get('CLASSIFIER_ENDPOINT')
+    if endpoint:
+        return HTTPBatchBackend(endpoint, model=os.environ.get('CLASSIFIER_MODEL', 'gpt-oss'))
+
+    client = get_gemini_client()
+    if client:
+        return GeminiBatchBackend(client)
+
+    return None
+
+
+# ============================================================================
+# RATE LIMITING
+# ============================================================================
+
+class TokenBucket:
+    """Thread-safe token bucket limiting model requests per minute"""
+
+    def __init__(self, requests_per_minute: float, capacity: Optional[int] = None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1, int(requests_per_minute // 10))
+        self.tokens = float(self.capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1) -> float:
+        """Block until tokens are available; returns seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+
+                sleep_for = (tokens - self.tokens) / self.rate
+
+            time.sleep(sleep_for)
+            waited += sleep_for
+
+
+# ============================================================================
+# BATCH CLASSIFIER
+# ============================================================================
+
+class BatchVendorClassifier:
+    """Classify many vendors per prompt, concurrently, with a persistent cache
+
+    Flow for a list of vendors:
+    1. Build a cache key per vendor, scoped to the backend's cache_source so
+       one backend never serves another's answers, and resolve hits in one
+       cache query
+    2. Deduplicate misses by key and pack them into batches
+    3. Send batches concurrently, each gated by the token bucket and retried
+       with exponential backoff
+    4. Fall back to the compiled rule engine (one table pass) for anything
+       the model did not answer, and store model answers in the cache
+    """
+
+    def __init__(self, backend=None, cache=None, batch_size: int = 25, max_workers: int = 4,
+                 requests_per_minute: float = 30, max_retries: int = 3, backoff_base: float = 1.0):
+        self.backend = backend if backend is not None else get_default_backend()
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.rate_limiter = TokenBucket(requests_per_minute)
+
+    def classify(self, vendors: List[Dict[str, Any]], use_ai: bool = True) -> Tuple[Dict[int, VendorClassificationResult], Dict[str, Any]]:
+        """Classify vendors
+
+        Args:
+            vendors: Vendor dicts with 'global_index', 'vendor_name', 'vendor_id',
+                'total_paid' and 'accounts'
+            use_ai: When False, only the cache and rule-based fallback are used
+
+        Returns:
+            (results keyed by global_index, run statistics)
+        """
+        start = time.time()
+        stats = {
+            'total': len(vendors),
+            'cache_hits': 0,
+            'ai_classified': 0,
+            'fallback_classified': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'backend': self.backend.name if (self.backend and use_ai) else 'rules'
+        }
+
+        results: Dict[int, VendorClassificationResult] = {}
+        if not vendors:
+            stats['time_seconds'] = 0.0
+            return results, stats
+
+        # Cached answers are only reused for the backend that produced them
+        source = self.backend.cache_source if self.backend else 'none'
+        keys = {}
+        for vendor in vendors:
+            key = vendor_cache_key(
+                vendor.get('vendor_name', ''), vendor.get('vendor_id', ''), vendor.get('total_paid', 0)
+            )
+            keys[vendor['global_index']] = f"{source}|{key}" if key else None
+
+        # 1. Cache lookup
+        cached = self.cache.get_many([key for key in keys.values() if key]) if self.cache else {}
+
+        misses: Dict[str, List[Dict[str, Any]]] = {}
+        fallback_vendors = []
+        for vendor in vendors:
+            key = keys[vendor['global_index']]
+            if key is None:
+                # Amount is not a number: no bucket to cache under, rules only
+                fallback_vendors.append(vendor)
+                continue
+
+            entry = cached.get(key)
+            if entry:
+                results[vendor['global_index']] = self._finalize(VendorClassificationResult(
+                    classification=entry['classification'],
+                    form=entry['form'],
+                    reason=entry['reason'],
+                    confidence=entry.get('confidence', 0.0)
+                ), vendor)
+                stats['cache_hits'] += 1
+            else:
+                misses.setdefault(key, []).append(vendor)
+
+        # 2-3. Classify one representative per key with the model
+        ai_results: Dict[str, VendorClassificationResult] = {}
+        if misses and use_ai and self.backend:
+            representatives = [(key, group[0]) for key, group in misses.items()]
+            batches = [representatives[i:i + self.batch_size]
+                       for i in range(0, len(representatives), self.batch_size)]
+            stats['batches'] = len(batches)
+
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+                futures = {executor.submit(self._classify_batch, [v for _, v in batch]): batch
+                           for batch in batches}
+
+                for future in as_completed(futures):
+                    batch = futures[future]
+                    try:
+                        batch_results = future.result()
+                    except Exception as e:
+                        logger.warning(f"Batch of {len(batch)} vendors failed after retries: {e}")
+                        stats['failed_batches'] += 1
+                        continue
+
+                    # Reasons are shared across the key, so the representative's
+                    # amount becomes a placeholder filled in per vendor
+                    for position, (key, vendor) in enumerate(batch):
+                        if position in batch_results:
+                            result = batch_results[position]
+                            ai_results[key] = result.model_copy(
+                                update={'reason': amount_template(result.reason, vendor.get('total_paid'))}
+                            )
+
+            if self.cache and ai_results:
+                self.cache.put_many([
+                    {
+                        'cache_key': key,
+                        'classification': result.classification,
+                        'form': result.form,
+                        'reason': result.reason,
+                        'confidence': result.confidence,
+                        'source': source
+                    }
+                    for key, result in ai_results.items()
+                ])
+
+        # 4. Apply model answers to every vendor sharing the key, rules otherwise
+        for key, group in misses.items():
+            for vendor in group:
+                if key in ai_results:
+                    results[vendor['global_index']] = self._finalize(ai_results[key], vendor)
+                    stats['ai_classified'] += 1
+                else:
+                    fallback_vendors.append(vendor)
+
+        for vendor, result in zip(fallback_vendors, classify_vendor_records(fallback_vendors)):
+            results[vendor['global_index']] = result
+        stats['fallback_classified'] = len(fallback_vendors)
+
+        stats['time_seconds'] = time.time() - start
+        logger.info(
+            f"Batch classification: {stats['cache_hits']} cached, {stats['ai_classified']} AI, "
+            f"{stats['fallback_classified']} rules in {stats['time_seconds']:.2f}s"
+        )
+        return results, stats
+
+    def _classify_batch(self, vendors: List[Dict[str, Any]]) -> Dict[int, VendorClassificationResult]:
+        """Send one batch to the model with rate limiting and retry/backoff"""
+        prompt = build_batch_prompt(vendors)
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return parse_batch_response(self.backend.generate(prompt))
+            except Exception as e:
+                last_error = e
+                if attempt < self.max_retries:
+                    delay = self.backoff_base * (2 ** attempt) + random.uniform(0, self.backoff_base)
+                    logger.debug(f"Batch attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s")
+                    time.sleep(delay)
+
+        raise last_error
+
+    @staticmethod
+    def _finalize(result: VendorClassificationResult, vendor: Dict[str, Any]) -> VendorClassificationResult:
+        """Fill in this vendor's own amount and apply the Tax ID policy against its ID and amount"""
+        total_paid = parse_amount(vendor.get('total_paid', 0) or 0)
+        if AMOUNT_PLACEHOLDER in result.reason:
+            result = result.model_copy(update={'reason': result.reason.replace(AMOUNT_PLACEHOLDER, f"${total_paid:,.2f}")})
+        return enforce_tax_id_policy(result, vendor.get('vendor_id', ''), total_paid)
+
+
+def amount_template(reason: str, total_paid: Any) -> str:
+    """Replace a vendor's dollar amount in a model reason with AMOUNT_PLACEHOLDER"""
+    amount = parse_amount(total_paid or 0)
+    formats = sorted({f"${amount:,.2f}", f"${amount:.2f}"}, key=len, reverse=True)
+
+    # Never the start of a longer number ($1,000.00 in $1,000.001)
+    pattern = '|'.join(re.escape(text) for text in formats)
+    return re.sub(f"(?:{pattern})(?!\\d)", AMOUNT_PLACEHOLDER, reason)
+
+
+# ============================================================================
+# FAKE MODEL SERVER (local testing)
+# ============================================================================
+
+class FakeModelHandler(BaseHTTPRequestHandler):
+    """Ollama-compatible /api/generate stand-in answering with the rule engine"""
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        prompt = body.get('prompt', '')
+
+        vendors = json.loads(prompt.split(VENDORS_MARKER, 1)[1]) if VENDORS_MARKER in prompt else []
+        results = []
+        for item in vendors:
+            result = classify_vendor_fallback(
+                item.get('vendor_name', ''),
+                item.get('tax_id', ''),
+                item.get('total_paid', 0),
+                item.get('accounts', '')
+            )
+            results.append({'index': item['index'], **result.model_dump()})
+
+        payload = json.dumps({'model': body.get('model'), 'response': json.dumps({'results': results}), 'done': True})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(payload.encode('utf-8'))
+
+    def log_message(self, format, *args):
+        logger.debug("Fake model server: " + format % args)
+
+
+def start_fake_model_server(host: str = '127.0.0.1', port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the fake model server in a daemon thread
+
+    Returns the server (call shutdown() when done) and its /api/generate URL,
+    suitable for HTTPBatchBackend or the CLASSIFIER_ENDPOINT variable.
+    """
+    server = ThreadingHTTPServer((host, port), FakeModelHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/api/generate"
+
+
+if __name__ == '__main__':
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    server_port = int(sys.argv[1]) if len(sys.argv) > 1 else 11435
+    fake_server, url = start_fake_model_server(port=server_port)
+    print(f"Fake model server listening at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fake_server.shutdown()
@@ -0,0 +1,280 @@
+"""
+Micro-benchmark: compiled rule engine vs the original per-vendor fallback logic
+
+Usage:
+    python benchmark_rule_engine.py [vendor_count]
+"""
+import random
+import sys
+import time
+
+import pandas as pd
+
+from gemini_ai import VendorClassificationResult
+from rule_engine import classify_vendor_table, text_groups
+
+NAME_PARTS = [
+    'Acme', 'Smith', 'Johnson & Sons', 'Blue Sky', 'Northside', 'Metro', 'Greenleaf', 'Summit',
+    'Pinnacle', 'Riverside', 'Oak Street', 'Harbor', 'Lakeview', 'Keystone', 'Evergreen',
+]
+NAME_SUFFIXES = [
+    'LLC', 'Inc', 'Corp', 'Consulting', 'Law Firm', 'Attorney at Law', 'Bank', 'Insurance', 'Electric',
+    'Property Management', 'Supplies', 'Equipment Rental', 'Marketing Services', 'Repair', '', 'Esq',
+]
+ACCOUNTS = [
+    'Professional Fees', 'Office Supplies', 'Rent Expense', 'Repairs & Maintenance', 'Advertising',
+    'Utilities', 'Legal Fees', 'Inventory Purchases', 'Contract Labor', 'Insurance Expense', '',
+]
+TAX_IDS = ['12-3456789', '', '-', 'N/A', '123-45-6789', 'None']
+
+
+def reference_classify_vendor(vendor_name: str, vendor_id: str, total_paid: float, accounts: str) -> VendorClassificationResult:
+    """Frozen copy of the original per-vendor gemini_ai.classify_vendor_fallback
+
+    classify_vendor_fallback now delegates to the rule engine, so the engine is
+    measured and checked against this copy instead. Do not update it with the
+    rule table.
+    """
+    vendor_lower = vendor_name.lower()
+    accounts_lower = accounts.lower()
+    
+    # FIRST CHECK: SSN/EIN/Tax ID requirement for 1099-eligible
+    has_tax_id = bool(vendor_id and vendor_id.strip() and vendor_id.strip() not in ['', '-', 'N/A', 'n/a', 'None', 'none'])
+    
+    # SECOND CHECK: Check for goods/products (exclude from 1099-eligible)
+    goods_keywords = ['inventory', 'equipment', 'supplies', 'materials', 'merchandise', 'products', 'parts', 'tools', 'furniture', 'software license', 'hardware', 'computers', 'machinery', 'vehicles', 'purchase', 'procurement', 'asset']
+    is_goods = any(keyword in accounts_lower or keyword in vendor_lower for keyword in goods_keywords)
+    
+    # THIRD CHECK: Check for services
+    service_keywords = ['consulting', 'professional', 'maintenance', 'repair', 'legal', 'accounting', 'marketing', 'advertising', 'contractor', 'freelance', 'services', 'consulting', 'consultant']
+    is_service = any(keyword in accounts_lower or keyword in vendor_lower for keyword in service_keywords)
+    
+    # If it's clearly goods/products, not 1099-eligible regardless of amount or tax ID
+    if is_goods:
+        return VendorClassificationResult(
+            classification="Non-Reportable",
+            form="Not Required",
+            reason=f"Goods/products purchase: ${total_paid:,.2f} - equipment/supplies not subject to 1099 reporting",
+            confidence=0.8
+        )
+    
+    # Check for attorney/law firm exception (always 1099 eligible if has tax ID and ≥$600)
+    if any(keyword in vendor_lower for keyword in ['attorney', 'law firm', 'legal', 'lawyer', 'esquire', 'esq']):
+        if has_tax_id and total_paid >= 600:
+            return VendorClassificationResult(
+                classification="1099-Eligible",
+                form="1099-NEC",
+                reason=f"Attorney/legal services with Tax ID: ${total_paid:,.2f} ≥ $600 threshold (IRS exception - always reportable)",
+                confidence=0.8
+            )
+        elif not has_tax_id and total_paid >= 600:
+            return VendorClassificationResult(
+                classification="W-9 Required",
+                form="W-9 Needed",
+                reason=f"Attorney/legal services: ${total_paid:,.2f} ≥ $600 but missing Tax ID/SSN - need W-9 to collect tax information for 1099 reporting",
+                confidence=0.7
+            )
+        else:
+            return VendorClassificationResult(
+                classification="Non-Reportable",
+                form="Not Required",
+                reason=f"Attorney/legal services: ${total_paid:,.2f} < $600 threshold",
+                confidence=0.8
+            )
+    
+    # Check for clearly non-reportable categories - EXPANDED LIST
+    non_reportable_keywords = [
+        # Government
+        'eftps', 'irs', 'treasury', 'government', 'federal', 'state', 'county', 'city', 'municipal',
+        # Payroll services
+        'quickbooks payroll', 'qb payroll', 'adp', 'paychex', 'gusto', 'payroll service',
+        # Banks and financial
+        'pnc bank', 'pnc', 'chase', 'bank of america', 'wells fargo', 'citibank', 'us bank', 'capital one',
+        'bank', 'credit union', 'federal credit union',
+        # Insurance
+        'insurance', 'assurance',
+        # Utilities
+        'electric', 'gas', 'water', 'utilities', 'telecom', 'telephone', 'internet service',
+        # Credit card processors
+        'visa', 'mastercard', 'american express', 'amex', 'discover', 'square', 'stripe', 'paypal merchant'
+    ]
+    
+    if any(keyword in vendor_lower for keyword in non_reportable_keywords):
+        return VendorClassificationResult(
+            classification="Non-Reportable",
+            form="Not Required",
+            reason="Government entity, bank, payroll service, insurance, or utility - not subject to 1099 reporting",
+            confidence=0.9
+        )
+    
+    # Check for rent payments (1099-MISC if has tax ID and ≥ $600)
+    if any(keyword in vendor_lower for keyword in ['rent', 'lease', 'property', 'landlord']):
+        if has_tax_id and total_paid >= 600:
+            return VendorClassificationResult(
+                classification="1099-Eligible",
+                form="1099-MISC",
+                reason=f"Rent payments with Tax ID: ${total_paid:,.2f} ≥ $600 threshold",
+                confidence=0.7
+            )
+        elif not has_tax_id and total_paid >= 600:
+            return VendorClassificationResult(
+                classification="Non-Reportable",
+                form="Not Required",
+                reason=f"Rent payments: ${total_paid:,.2f} ≥ $600 but missing Tax ID/SSN - cannot issue 1099",
+                confidence=0.6
+            )
+        else:
+            return VendorClassificationResult(
+                classification="Non-Reportable",
+                form="Not Required",
+                reason=f"Rent payments: ${total_paid:,.2f} < $600 threshold",
+                confidence=0.7
+            )
+    
+    # Check for corporations (generally not reportable except attorneys)
+    if any(keyword in vendor_lower for keyword in ['corp', 'corporation', 'inc', 'incorporated']):
+        return VendorClassificationResult(
+            classification="Non-Reportable",
+            form="Not Required",
+            reason="Corporation - not subject to 1099 reporting (except attorney fees)",
+            confidence=0.6
+        )
+    
+    # Check for service providers - STRICT requirements: must have tax ID, $600+, and be services
+    if is_service:
+        if has_tax_id and total_paid >= 600:
+            return VendorClassificationResult(
+                classification="1099-Eligible",
+                form="1099-NEC",
+                reason=f"Service provider with Tax ID: ${total_paid:,.2f} ≥ $600 threshold",
+                confidence=0.6
+            )
+        elif not has_tax_id and total_paid >= 600:
+            return VendorClassificationResult(
+                classification="Non-Reportable",
+                form="Not Required",
+                reason=f"Service provider: ${total_paid:,.2f} ≥ $600 but missing Tax ID/SSN - cannot issue 1099",
+                confidence=0.5
+            )
+        else:
+            return VendorClassificationResult(
+                classification="Non-Reportable",
+                form="Not Required",
+                reason=f"Service provider: ${total_paid:,.2f} < $600 threshold",
+                confidence=0.6
+            )
+    
+    # Check for LLCs - if they have Tax ID, classify directly (no W-9 needed)
+    if 'llc' in vendor_lower:
+        if has_tax_id and total_paid >= 600 and is_service:
+            return VendorClassificationResult(
+                classification="1099-Eligible",
+                form="1099-NEC",
+                reason=f"LLC service provider with Tax ID: ${total_paid:,.2f} ≥ $600 threshold (single-member LLCs are reportable)",
+                confidence=0.7
+            )
+        elif has_tax_id and total_paid >= 600:
+            # Has Tax ID but unclear on service type - default to 1099-Eligible (user can transfer if needed)
+            return VendorClassificationResult(
+                classification="1099-Eligible",
+                form="1099-NEC",
+                reason=f"LLC with Tax ID: ${total_paid:,.2f} ≥ $600 threshold - likely reportable (review and transfer to Non-Reportable if corporation/multi-member)",
+                confidence=0.5
+            )
+        elif not has_tax_id and total_paid >= 600:
+            return VendorClassificationResult(
+                classification="W-9 Required",
+                form="W-9 Needed",
+                reason=f"LLC entity: ${total_paid:,.2f} ≥ $600 but missing Tax ID - need W-9 to collect tax information",
+                confidence=0.6
+            )
+        else:
+            return VendorClassificationResult(
+                classification="Non-Reportable",
+                form="Not Required",
+                reason=f"LLC entity: ${total_paid:,.2f} < $600 threshold",
+                confidence=0.7
+            )
+    
+    # Default case - if has Tax ID, classify directly; only ask W-9 if missing Tax ID
+    if has_tax_id and total_paid >= 600:
+        # Has Tax ID and over $600 - classify as 1099-Eligible (user can transfer if needed)
+        return VendorClassificationResult(
+            classification="1099-Eligible",
+            form="1099-NEC",
+            reason=f"Has Tax ID: ${total_paid:,.2f} ≥ $600 threshold - likely reportable (review and transfer to Non-Reportable if corporation/exempt entity)",
+            confidence=0.5
+        )
+    elif not has_tax_id and total_paid >= 600:
+        # No Tax ID and over $600 - need W-9 to get tax info
+        return VendorClassificationResult(
+            classification="W-9 Required",
+            form="W-9 Needed",
+            reason=f"${total_paid:,.2f} ≥ $600 threshold but missing Tax ID/SSN - need W-9 to collect tax information for 1099 reporting",
+            confidence=0.6
+        )
+    else:
+        return VendorClassificationResult(
+            classification="Non-Reportable",
+            form="Not Required",
+            reason=f"${total_paid:,.2f} < $600 threshold - below IRS reporting requirements",
+            confidence=0.8
+        )
+
+
+def build_vendors(count: int, seed: int = 1099) -> pd.DataFrame:
+    """Generate a synthetic vendor table with realistic name/account mixes"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        rows.append({
+            'vendor_name': f"{rng.choice(NAME_PARTS)} {rng.choice(NAME_SUFFIXES)} {i % 500}".strip(),
+            'vendor_id': rng.choice(TAX_IDS),
+            'total_paid': round(rng.uniform(5, 25000), 2),
+            'accounts': rng.choice(ACCOUNTS),
+        })
+    return pd.DataFrame(rows)
+
+
+def run_per_vendor(df: pd.DataFrame) -> list:
+    return [
+        reference_classify_vendor(row.vendor_name, row.vendor_id, row.total_paid, row.accounts)
+        for row in df.itertuples(index=False)
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    df = build_vendors(count)
+
+    start = time.perf_counter()
+    per_vendor = run_per_vendor(df)
+    per_vendor_seconds = time.perf_counter() - start
+
+    text_groups.cache_clear()
+    start = time.perf_counter()
+    table = classify_vendor_table(df)
+    cold_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    classify_vendor_table(df)
+    warm_seconds = time.perf_counter() - start
+
+    mismatches = sum(
+        1 for expected, (classification, form, reason, confidence)
+        in zip(per_vendor, table.itertuples(index=False, name=None))
+        if (expected.classification, expected.form, expected.reason, expected.confidence)
+        != (classification, form, reason, confidence)
+    )
+
+    print(f"Vendors:                {count:,}")
+    print(f"Original per-vendor:    {per_vendor_seconds:.3f}s")
+    print(f"Rule engine (cold):     {cold_seconds:.3f}s  ({per_vendor_seconds / cold_seconds:.1f}x)")
+    print(f"Rule engine (memoized): {warm_seconds:.3f}s  ({per_vendor_seconds / warm_seconds:.1f}x)")
+    print(f"Mismatched results:     {mismatches}")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
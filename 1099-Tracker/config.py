@@ -24,6 +24,15 @@ class Config:
     UPLOAD_FOLDER = 'uploads'
     ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
     
+    # Results page size (vendors per category tab page)
+    RESULTS_PAGE_SIZE = int(os.environ.get('RESULTS_PAGE_SIZE', 100))
+    
+    # AI batch classification
+    AI_BATCH_SIZE = int(os.environ.get('AI_BATCH_SIZE', 25))  # Vendors packed into one prompt
+    AI_MAX_WORKERS = int(os.environ.get('AI_MAX_WORKERS', 4))  # Concurrent batch requests
+    AI_REQUESTS_PER_MINUTE = float(os.environ.get('AI_REQUESTS_PER_MINUTE', 30))
+    AI_MAX_RETRIES = int(os.environ.get('AI_MAX_RETRIES', 3))
+    
     # Session configuration
     SESSION_TIMEOUT_HOURS = 24  # Auto-cleanup old sessions after 24 hours
     
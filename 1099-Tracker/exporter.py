@@ -0,0 +1,213 @@
+import csv
+import glob
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Dict, Any, List, Tuple
+
+import xlsxwriter
+
+from models import Vendor, CATEGORY_NAMES, annotate_for_category
+
+logger = logging.getLogger(__name__)
+
+EXPORT_HEADERS = ['Vendor Name', 'SSN/EIN No.', 'Total Paid', 'Transaction Count',
+                  'Classification', 'Likely 1099 Form', 'AI Reason', 'Accounts', 'Memo', 'Manual Notes']
+
+EXPORT_FIELDS = ['vendor_name', 'vendor_id', 'total_paid', 'transaction_count',
+                 'classification', 'form', 'reason', 'accounts', 'memo', 'notes']
+
+# Fixed column widths (constant_memory mode cannot autosize after writing)
+EXPORT_COLUMN_WIDTHS = [32, 16, 14, 12, 16, 16, 60, 30, 40, 30]
+
+
+def category_sheet_name(category_name: str) -> str:
+    """Excel-safe sheet name for a category"""
+    return category_name.replace('/', '_').replace(' ', '_').replace('-', '_')[:31]
+
+
+def _vendor_row(vendor: Dict[str, Any]) -> List[Any]:
+    row = [vendor.get(field, '') for field in EXPORT_FIELDS]
+    row[2] = vendor.get('total_paid', 0) or 0
+    row[3] = vendor.get('transaction_count', 1) or 1
+    return row
+
+
+class CategorizedExporter:
+    """Streaming CSV/Excel export of a session's categorized vendors
+
+    Vendors are read once through a Mongo cursor sorted by category, rows are
+    written as they arrive and per-category totals are accumulated in the
+    same pass. Finished artifacts are cached on disk per session and reused
+    until the session's vendor data version changes.
+    """
+
+    def __init__(self, vendor_model: Vendor, export_folder: str):
+        self.vendor_model = vendor_model
+        self.export_folder = export_folder
+        os.makedirs(export_folder, exist_ok=True)
+
+    def get_export(self, session_id: str, format_type: str) -> Tuple[str, Dict[str, Any]]:
+        """Return (path, summary) for a session export, building it if stale
+
+        Args:
+            format_type: 'csv' or 'excel'
+
+        The summary has 'total_vendors', 'total_amount' and 'categories'
+        (name -> {'count', 'total_amount'}).
+        """
+        if format_type not in ('csv', 'excel'):
+            raise ValueError(f"Unsupported export format: {format_type}")
+
+        extension = 'csv' if format_type == 'csv' else 'xlsx'
+        version = self.vendor_model.get_data_version(session_id)
+        path = os.path.join(self.export_folder, f"{session_id}_v{version}.{extension}")
+        summary_path = os.path.join(self.export_folder, f"{session_id}_v{version}.json")
+
+        if os.path.exists(path) and os.path.exists(summary_path):
+            logger.info(f"Using cached {format_type} export for session {session_id[:8]} (v{version})")
+            with open(summary_path) as f:
+                return path, json.load(f)
+
+        self._remove_stale(session_id, version)
+
+        # Write to a temp file first so a half-written export is never served
+        fd, temp_path = tempfile.mkstemp(suffix=f'.{extension}', dir=self.export_folder)
+        os.close(fd)
+        try:
+            if format_type == 'csv':
+                summary = self._write_csv(session_id, temp_path)
+            else:
+                summary = self._write_excel(session_id, temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        with open(summary_path, 'w') as f:
+            json.dump(summary, f)
+
+        logger.info(f"Exported {summary['total_vendors']} vendors to {format_type} for session {session_id[:8]} (v{version})")
+        return path, summary
+
+    def invalidate(self, session_id: str):
+        """Remove every cached export for a session"""
+        self._remove_stale(session_id, keep_version=None)
+
+    def _remove_stale(self, session_id: str, keep_version=None):
+        for cached in glob.glob(os.path.join(self.export_folder, f"{session_id}_v*")):
+            if keep_version is not None and os.path.basename(cached).startswith(f"{session_id}_v{keep_version}."):
+                continue
+            try:
+                os.remove(cached)
+            except OSError as e:
+                logger.warning(f"Could not remove cached export {cached}: {e}")
+
+    def _iter_rows(self, session_id: str, summary: Dict[str, Any]):
+        """Yield (category, vendor) pairs while accumulating summary totals"""
+        for category, vendor in self.vendor_model.iter_vendors_by_category(session_id):
+            amount = vendor.get('total_paid', 0) or 0
+
+            # Each vendor is counted once overall, on its first category
+            if vendor.get('category_position', 0) == 0:
+                summary['total_vendors'] += 1
+                summary['total_amount'] += amount
+
+            category_totals = summary['categories'][category]
+            category_totals['count'] += 1
+            category_totals['total_amount'] += amount
+
+            yield category, annotate_for_category(vendor, category)
+
+    @staticmethod
+    def _new_summary() -> Dict[str, Any]:
+        return {
+            'total_vendors': 0,
+            'total_amount': 0.0,
+            'categories': {name: {'count': 0, 'total_amount': 0.0} for name in CATEGORY_NAMES}
+        }
+
+    @staticmethod
+    def _summary_rows(summary: Dict[str, Any]) -> List[List[Any]]:
+        total_vendors = summary['total_vendors']
+        rows = [['OVERALL TOTAL', total_vendors, summary['total_amount'], '100.0%']]
+        for category_name in CATEGORY_NAMES:
+            category = summary['categories'][category_name]
+            percentage = f"{(category['count'] / total_vendors * 100):.1f}%" if total_vendors > 0 else "0.0%"
+            rows.append([category_name, category['count'], category['total_amount'], percentage])
+        return rows
+
+    def _write_csv(self, session_id: str, path: str) -> Dict[str, Any]:
+        """CSV with the summary section first, then one section per category
+
+        Category sections are streamed to a spool file while totals accumulate,
+        then appended after the summary.
+        """
+        summary = self._new_summary()
+
+        with tempfile.TemporaryFile('w+', newline='', encoding='utf-8') as body:
+            writer = csv.writer(body)
+            current_category = None
+
+            for category, vendor in self._iter_rows(session_id, summary):
+                if category != current_category:
+                    body.write('\n')
+                    body.write(f'=== {category.upper()} ===\n')
+                    writer.writerow(EXPORT_HEADERS)
+                    current_category = category
+                writer.writerow(_vendor_row(vendor))
+
+            with open(path, 'w', newline='', encoding='utf-8') as output:
+                summary_writer = csv.writer(output)
+                output.write('VENDOR CLASSIFICATION SUMMARY\n')
+                summary_writer.writerow(['Category', 'Vendor Count', 'Total Amount ($)', 'Percentage'])
+                for name, count, amount, percentage in self._summary_rows(summary):
+                    summary_writer.writerow([name, count, f'{amount:.2f}', percentage])
+                output.write('\n')
+
+                body.seek(0)
+                shutil.copyfileobj(body, output)
+
+        return summary
+
+    def _write_excel(self, session_id: str, path: str) -> Dict[str, Any]:
+        """Workbook with the Summary tab first and one sheet per category
+
+        Uses xlsxwriter constant_memory mode: rows are flushed as they are
+        written, and the Summary sheet is filled last once totals are known.
+        """
+        summary = self._new_summary()
+
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        try:
+            header_format = workbook.add_format({'bold': True})
+            money_format = workbook.add_format({'num_format': '$#,##0.00'})
+
+            summary_sheet = workbook.add_worksheet('Summary')
+            category_sheets = {}
+            next_rows = {}
+            for category_name in CATEGORY_NAMES:
+                sheet = workbook.add_worksheet(category_sheet_name(category_name))
+                sheet.write_row(0, 0, EXPORT_HEADERS, header_format)
+                for column, width in enumerate(EXPORT_COLUMN_WIDTHS):
+                    sheet.set_column(column, column, width, money_format if column == 2 else None)
+                category_sheets[category_name] = sheet
+                next_rows[category_name] = 1
+
+            for category, vendor in self._iter_rows(session_id, summary):
+                category_sheets[category].write_row(next_rows[category], 0, _vendor_row(vendor))
+                next_rows[category] += 1
+
+            summary_sheet.set_column(0, 0, 20)
+            summary_sheet.set_column(1, 3, 18)
+            summary_sheet.write_row(0, 0, ['Category', 'Vendor Count', 'Total Amount ($)', 'Percentage'], header_format)
+            for row_index, (name, count, amount, percentage) in enumerate(self._summary_rows(summary), start=1):
+                summary_sheet.write_row(row_index, 0, [name, count])
+                summary_sheet.write_number(row_index, 2, amount, money_format)
+                summary_sheet.write_string(row_index, 3, percentage)
+        finally:
+            workbook.close()
+
+        return summary
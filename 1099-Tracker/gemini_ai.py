@@ -8,6 +8,8 @@ from google import genai
 from google.genai import types
 from pydantic import BaseModel
 
+from vendor_keys import has_tax_id
+
 
 # IMPORTANT: KEEP THIS COMMENT
 # Follow these instructions when using this blueprint:
@@ -235,192 +237,15 @@ def classify_vendor_with_ollama(vendor_name: str, vendor_id: str, total_paid: fl
 
 
 def classify_vendor_fallback(vendor_name: str, vendor_id: str, total_paid: float, accounts: str) -> VendorClassificationResult:
-    """Fallback classification using 2024 IRS rule-based logic with STRICT requirements"""
-    vendor_lower = vendor_name.lower()
-    accounts_lower = accounts.lower()
-    
-    # FIRST CHECK: SSN/EIN/Tax ID requirement for 1099-eligible
-    has_tax_id = bool(vendor_id and vendor_id.strip() and vendor_id.strip() not in ['', '-', 'N/A', 'n/a', 'None', 'none'])
-    
-    # SECOND CHECK: Check for goods/products (exclude from 1099-eligible)
-    goods_keywords = ['inventory', 'equipment', 'supplies', 'materials', 'merchandise', 'products', 'parts', 'tools', 'furniture', 'software license', 'hardware', 'computers', 'machinery', 'vehicles', 'purchase', 'procurement', 'asset']
-    is_goods = any(keyword in accounts_lower or keyword in vendor_lower for keyword in goods_keywords)
-    
-    # THIRD CHECK: Check for services
-    service_keywords = ['consulting', 'professional', 'maintenance', 'repair', 'legal', 'accounting', 'marketing', 'advertising', 'contractor', 'freelance', 'services', 'consulting', 'consultant']
-    is_service = any(keyword in accounts_lower or keyword in vendor_lower for keyword in service_keywords)
-    
-    # If it's clearly goods/products, not 1099-eligible regardless of amount or tax ID
-    if is_goods:
-        return VendorClassificationResult(
-            classification="Non-Reportable",
-            form="Not Required",
-            reason=f"Goods/products purchase: ${total_paid:,.2f} - equipment/supplies not subject to 1099 reporting",
-            confidence=0.8
-        )
-    
-    # Check for attorney/law firm exception (always 1099 eligible if has tax ID and ≥$600)
-    if any(keyword in vendor_lower for keyword in ['attorney', 'law firm', 'legal', 'lawyer', 'esquire', 'esq']):
-        if has_tax_id and total_paid >= 600:
-            return VendorClassificationResult(
-                classification="1099-Eligible",
-                form="1099-NEC",
-                reason=f"Attorney/legal services with Tax ID: ${total_paid:,.2f} ≥ $600 threshold (IRS exception - always reportable)",
-                confidence=0.8
-            )
-        elif not has_tax_id and total_paid >= 600:
-            return VendorClassificationResult(
-                classification="W-9 Required",
-                form="W-9 Needed",
-                reason=f"Attorney/legal services: ${total_paid:,.2f} ≥ $600 but missing Tax ID/SSN - need W-9 to collect tax information for 1099 reporting",
-                confidence=0.7
-            )
-        else:
-            return VendorClassificationResult(
-                classification="Non-Reportable",
-                form="Not Required",
-                reason=f"Attorney/legal services: ${total_paid:,.2f} < $600 threshold",
-                confidence=0.8
-            )
-    
-    # Check for clearly non-reportable categories - EXPANDED LIST
-    non_reportable_keywords = [
-        # Government
-        'eftps', 'irs', 'treasury', 'government', 'federal', 'state', 'county', 'city', 'municipal',
-        # Payroll services
-        'quickbooks payroll', 'qb payroll', 'adp', 'paychex', 'gusto', 'payroll service',
-        # Banks and financial
-        'pnc bank', 'pnc', 'chase', 'bank of america', 'wells fargo', 'citibank', 'us bank', 'capital one',
-        'bank', 'credit union', 'federal credit union',
-        # Insurance
-        'insurance', 'assurance',
-        # Utilities
-        'electric', 'gas', 'water', 'utilities', 'telecom', 'telephone', 'internet service',
-        # Credit card processors
-        'visa', 'mastercard', 'american express', 'amex', 'discover', 'square', 'stripe', 'paypal merchant'
-    ]
-    
-    if any(keyword in vendor_lower for keyword in non_reportable_keywords):
-        return VendorClassificationResult(
-            classification="Non-Reportable",
-            form="Not Required",
-            reason="Government entity, bank, payroll service, insurance, or utility - not subject to 1099 reporting",
-            confidence=0.9
-        )
-    
-    # Check for rent payments (1099-MISC if has tax ID and ≥ $600)
-    if any(keyword in vendor_lower for keyword in ['rent', 'lease', 'property', 'landlord']):
-        if has_tax_id and total_paid >= 600:
-            return VendorClassificationResult(
-                classification="1099-Eligible",
-                form="1099-MISC",
-                reason=f"Rent payments with Tax ID: ${total_paid:,.2f} ≥ $600 threshold",
-                confidence=0.7
-            )
-        elif not has_tax_id and total_paid >= 600:
-            return VendorClassificationResult(
-                classification="Non-Reportable",
-                form="Not Required",
-                reason=f"Rent payments: ${total_paid:,.2f} ≥ $600 but missing Tax ID/SSN - cannot issue 1099",
-                confidence=0.6
-            )
-        else:
-            return VendorClassificationResult(
-                classification="Non-Reportable",
-                form="Not Required",
-                reason=f"Rent payments: ${total_paid:,.2f} < $600 threshold",
-                confidence=0.7
-            )
-    
-    # Check for corporations (generally not reportable except attorneys)
-    if any(keyword in vendor_lower for keyword in ['corp', 'corporation', 'inc', 'incorporated']):
-        return VendorClassificationResult(
-            classification="Non-Reportable",
-            form="Not Required",
-            reason="Corporation - not subject to 1099 reporting (except attorney fees)",
-            confidence=0.6
-        )
-    
-    # Check for service providers - STRICT requirements: must have tax ID, $600+, and be services
-    if is_service:
-        if has_tax_id and total_paid >= 600:
-            return VendorClassificationResult(
-                classification="1099-Eligible",
-                form="1099-NEC",
-                reason=f"Service provider with Tax ID: ${total_paid:,.2f} ≥ $600 threshold",
-                confidence=0.6
-            )
-        elif not has_tax_id and total_paid >= 600:
-            return VendorClassificationResult(
-                classification="Non-Reportable",
-                form="Not Required",
-                reason=f"Service provider: ${total_paid:,.2f} ≥ $600 but missing Tax ID/SSN - cannot issue 1099",
-                confidence=0.5
-            )
-        else:
-            return VendorClassificationResult(
-                classification="Non-Reportable",
-                form="Not Required",
-                reason=f"Service provider: ${total_paid:,.2f} < $600 threshold",
-                confidence=0.6
-            )
-    
-    # Check for LLCs - if they have Tax ID, classify directly (no W-9 needed)
-    if 'llc' in vendor_lower:
-        if has_tax_id and total_paid >= 600 and is_service:
-            return VendorClassificationResult(
-                classification="1099-Eligible",
-                form="1099-NEC",
-                reason=f"LLC service provider with Tax ID: ${total_paid:,.2f} ≥ $600 threshold (single-member LLCs are reportable)",
-                confidence=0.7
-            )
-        elif has_tax_id and total_paid >= 600:
-            # Has Tax ID but unclear on service type - default to 1099-Eligible (user can transfer if needed)
-            return VendorClassificationResult(
-                classification="1099-Eligible",
-                form="1099-NEC",
-                reason=f"LLC with Tax ID: ${total_paid:,.2f} ≥ $600 threshold - likely reportable (review and transfer to Non-Reportable if corporation/multi-member)",
-                confidence=0.5
-            )
-        elif not has_tax_id and total_paid >= 600:
-            return VendorClassificationResult(
-                classification="W-9 Required",
-                form="W-9 Needed",
-                reason=f"LLC entity: ${total_paid:,.2f} ≥ $600 but missing Tax ID - need W-9 to collect tax information",
-                confidence=0.6
-            )
-        else:
-            return VendorClassificationResult(
-                classification="Non-Reportable",
-                form="Not Required",
-                reason=f"LLC entity: ${total_paid:,.2f} < $600 threshold",
-                confidence=0.7
-            )
-    
-    # Default case - if has Tax ID, classify directly; only ask W-9 if missing Tax ID
-    if has_tax_id and total_paid >= 600:
-        # Has Tax ID and over $600 - classify as 1099-Eligible (user can transfer if needed)
-        return VendorClassificationResult(
-            classification="1099-Eligible",
-            form="1099-NEC",
-            reason=f"Has Tax ID: ${total_paid:,.2f} ≥ $600 threshold - likely reportable (review and transfer to Non-Reportable if corporation/exempt entity)",
-            confidence=0.5
-        )
-    elif not has_tax_id and total_paid >= 600:
-        # No Tax ID and over $600 - need W-9 to get tax info
-        return VendorClassificationResult(
-            classification="W-9 Required",
-            form="W-9 Needed",
-            reason=f"${total_paid:,.2f} ≥ $600 threshold but missing Tax ID/SSN - need W-9 to collect tax information for 1099 reporting",
-            confidence=0.6
-        )
-    else:
-        return VendorClassificationResult(
-            classification="Non-Reportable",
-            form="Not Required",
-            reason=f"${total_paid:,.2f} < $600 threshold - below IRS reporting requirements",
-            confidence=0.8
-        )
+    """Fallback classification using 2024 IRS rule-based logic with STRICT requirements
+
+    The keyword groups and rule order live in rule_engine, shared with the
+    vectorized classify_vendor_table.
+    """
+    # Imported here: rule_engine imports VendorClassificationResult from this module
+    from rule_engine import classify_vendor_rules
+
+    return classify_vendor_rules(vendor_name, vendor_id, total_paid, accounts)
 
 
 def classify_vendor(vendor_name: str, vendor_id: str, total_paid: float, accounts: str) -> VendorClassificationResult:
@@ -446,10 +271,8 @@ def classify_vendor(vendor_name: str, vendor_id: str, total_paid: float, account
 
 def enforce_tax_id_policy(result: VendorClassificationResult, vendor_id: str, total_paid: float) -> VendorClassificationResult:
     """Enforce policy: Never ask for W-9 if Tax ID exists"""
-    has_tax_id = bool(vendor_id and vendor_id.strip() and vendor_id != '-')
-    
     # If result is W-9 Required but vendor has Tax ID, override it
-    if result.classification == "W-9 Required" and has_tax_id:
+    if result.classification == "W-9 Required" and has_tax_id(vendor_id):
         if total_paid >= 600:
             # Has Tax ID and over $600 - default to 1099-Eligible (user can transfer if needed)
             return VendorClassificationResult(
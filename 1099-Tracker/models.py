@@ -2,9 +2,81 @@ from pymongo import MongoClient, ASCENDING, DESCENDING
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 import logging
+import re
+
+from vendor_keys import normalize_vendor_name, has_tax_id, EMPTY_TAX_ID_VALUES, NO_TAX_ID_PHRASES
 
 logger = logging.getLogger(__name__)
 
+CATEGORY_NAMES = ['1099-Eligible', 'Non-Reportable', 'W-9 Required']
+
+# Fields the paginated vendor listing may sort on
+VENDOR_SORT_FIELDS = ['global_index', 'vendor_name', 'total_paid', 'transaction_count', 'classification', 'form']
+
+
+def _has_tax_id_expr() -> Dict[str, Any]:
+    """Aggregation expression for tax-ID presence
+    
+    Uses the stored has_tax_id flag, deriving it (same rules as
+    vendor_keys.has_tax_id) for documents written before the flag existed.
+    """
+    tax_id = {'$toLower': {'$trim': {'input': {'$toString': {'$ifNull': ['$vendor_id', '']}}}}}
+    derived = {'$and': [
+        {'$not': [{'$in': [tax_id, sorted(EMPTY_TAX_ID_VALUES)]}]},
+        {'$not': [{'$regexMatch': {
+            'input': tax_id,
+            'regex': '|'.join(re.escape(phrase) for phrase in NO_TAX_ID_PHRASES)
+        }}]}
+    ]}
+    return {'$ifNull': ['$has_tax_id', derived]}
+
+
+def _categories_expr() -> Dict[str, Any]:
+    """Aggregation expression listing every category tab a vendor appears in
+    
+    Mirrors categorize_vendors in app.py:
+    - 1099-Eligible without a tax ID also appears under W-9 Required
+    - W-9 Required with $600+ also appears under 1099-Eligible
+    - Unclassified vendors with $600+ appear in both, otherwise Non-Reportable
+    """
+    classification = {'$ifNull': ['$classification', '']}
+    over_600 = {'$gte': [{'$ifNull': ['$total_paid', 0]}, 600]}
+    
+    return {'$switch': {
+        'branches': [
+            {'case': {'$eq': [classification, '1099-Eligible']},
+             'then': {'$cond': [_has_tax_id_expr(), ['1099-Eligible'], ['1099-Eligible', 'W-9 Required']]}},
+            {'case': {'$eq': [classification, 'W-9 Required']},
+             'then': {'$cond': [over_600, ['W-9 Required', '1099-Eligible'], ['W-9 Required']]}},
+            {'case': {'$eq': [classification, 'Non-Reportable']},
+             'then': ['Non-Reportable']},
+            {'case': {'$eq': [classification, '']},
+             'then': {'$cond': [over_600, ['W-9 Required', '1099-Eligible'], ['Non-Reportable']]}},
+        ],
+        'default': ['W-9 Required']
+    }}
+
+def annotate_for_category(vendor: Dict[str, Any], category: str) -> Dict[str, Any]:
+    """Return the vendor as shown under a category tab
+    
+    Vendors pending a W-9 that also appear under 1099-Eligible get a note (and
+    unclassified ones a W-9 Required label), matching categorize_vendors.
+    """
+    if category != '1099-Eligible':
+        return vendor
+    
+    classification = vendor.get('classification', '')
+    if classification == 'W-9 Required':
+        vendor = vendor.copy()
+        vendor['notes'] = (vendor.get('notes', '') + ' [Pending W-9 - will need 1099 once tax ID collected]').strip()
+    elif not classification:
+        vendor = vendor.copy()
+        vendor['classification'] = 'W-9 Required'
+        vendor['notes'] = (vendor.get('notes', '') + ' [Pending W-9]').strip()
+    
+    return vendor
+
+
 class Database:
     """MongoDB database manager"""
     
@@ -15,6 +87,7 @@ class Database:
         # Collections
         self.sessions = self.db.sessions
         self.vendors = self.db.vendors
+        self.classification_cache = self.db.classification_cache
         
         # Create indexes for performance
         self._create_indexes()
@@ -37,6 +110,10 @@ class Database:
             # Compound index for session + global_index (for fast lookups)
             self.vendors.create_index([("session_id", ASCENDING), ("global_index", ASCENDING)])
             
+            # Classification cache indexes (shared across sessions and tax years)
+            self.classification_cache.create_index([("cache_key", ASCENDING)], unique=True)
+            self.classification_cache.create_index([("updated_at", DESCENDING)])
+            
             logger.info("Database indexes created successfully")
         except Exception as e:
             logger.warning(f"Index creation warning (may already exist): {e}")
@@ -82,6 +159,15 @@ class VendorSession:
         )
         return result.modified_count > 0
     
+    def increment_totals(self, session_id: str, count_delta: int, amount_delta: float) -> bool:
+        """Adjust session vendor_count/total_amount in place with $inc"""
+        result = self.collection.update_one(
+            {"session_id": session_id},
+            {"$inc": {"vendor_count": count_delta, "total_amount": amount_delta},
+             "$set": {"updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count > 0
+    
     def delete_session(self, session_id: str) -> bool:
         """Delete a session and all its vendors"""
         # Delete all vendors for this session
@@ -117,11 +203,22 @@ class Vendor:
         self.db = db
         self.collection = db.vendors
     
-    def create_vendor(self, session_id: str, vendor_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Create a new vendor"""
-        vendor_doc = {
+    def _bump_data_version(self, session_id: str):
+        """Mark a session's vendor data as changed (invalidates cached exports)"""
+        self.db.sessions.update_one({"session_id": session_id}, {"$inc": {"data_version": 1}})
+    
+    def get_data_version(self, session_id: str) -> int:
+        """Current vendor data version for a session"""
+        session_doc = self.db.sessions.find_one({"session_id": session_id}, {"data_version": 1})
+        return (session_doc or {}).get('data_version', 0)
+    
+    @staticmethod
+    def _build_vendor_doc(session_id: str, vendor_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a vendor document from processed vendor data"""
+        return {
             "session_id": session_id,
             "vendor_name": vendor_data.get('vendor_name', ''),
+            "vendor_key": normalize_vendor_name(vendor_data.get('vendor_name', '')),
             "vendor_id": vendor_data.get('vendor_id', ''),
             "total_paid": vendor_data.get('total_paid', 0.0),
             "transaction_count": vendor_data.get('transaction_count', 1),
@@ -132,12 +229,18 @@ class Vendor:
             "reason": vendor_data.get('reason', ''),
             "notes": vendor_data.get('notes', ''),
             "global_index": vendor_data.get('global_index', 0),
+            "has_tax_id": has_tax_id(vendor_data.get('vendor_id', '')),
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
+    
+    def create_vendor(self, session_id: str, vendor_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new vendor"""
+        vendor_doc = self._build_vendor_doc(session_id, vendor_data)
         
         result = self.collection.insert_one(vendor_doc)
         vendor_doc['_id'] = result.inserted_id
+        self._bump_data_version(session_id)
         return vendor_doc
     
     def bulk_create_vendors(self, session_id: str, vendors_data: List[Dict[str, Any]]) -> bool:
@@ -145,28 +248,11 @@ class Vendor:
         if not vendors_data:
             return True
         
-        vendor_docs = []
-        for vendor_data in vendors_data:
-            vendor_doc = {
-                "session_id": session_id,
-                "vendor_name": vendor_data.get('vendor_name', ''),
-                "vendor_id": vendor_data.get('vendor_id', ''),
-                "total_paid": vendor_data.get('total_paid', 0.0),
-                "transaction_count": vendor_data.get('transaction_count', 1),
-                "accounts": vendor_data.get('accounts', ''),
-                "memo": vendor_data.get('memo', ''),
-                "classification": vendor_data.get('classification', ''),
-                "form": vendor_data.get('form', ''),
-                "reason": vendor_data.get('reason', ''),
-                "notes": vendor_data.get('notes', ''),
-                "global_index": vendor_data.get('global_index', 0),
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
-            vendor_docs.append(vendor_doc)
+        vendor_docs = [self._build_vendor_doc(session_id, vendor_data) for vendor_data in vendors_data]
         
         try:
             self.collection.insert_many(vendor_docs)
+            self._bump_data_version(session_id)
             return True
         except Exception as e:
             logger.error(f"Error bulk creating vendors: {e}")
@@ -205,11 +291,16 @@ class Vendor:
             {"$set": update_data}
         )
         
-        return result.modified_count > 0
+        if result.modified_count > 0:
+            self._bump_data_version(session_id)
+            return True
+        return False
     
     def delete_by_session(self, session_id: str) -> int:
         """Delete all vendors for a session"""
         result = self.collection.delete_many({"session_id": session_id})
+        if result.deleted_count:
+            self._bump_data_version(session_id)
         return result.deleted_count
     
     def get_vendor_count(self, session_id: str) -> int:
@@ -226,6 +317,142 @@ class Vendor:
         result = list(self.collection.aggregate(pipeline))
         return result[0]['total'] if result else 0.0
     
+    def get_session_summary(self, session_id: str) -> Dict[str, Any]:
+        """Compute totals, category, form and threshold statistics in one aggregation
+        
+        Returns:
+            Dict with 'totals', 'categories' and 'forms'; categories and forms map
+            a name to {'count', 'total_amount'}
+        """
+        amount = {'$ifNull': ['$total_paid', 0]}
+        pipeline = [
+            {"$match": {"session_id": session_id}},
+            {"$facet": {
+                "totals": [
+                    {"$group": {
+                        "_id": None,
+                        "total_vendors": {"$sum": 1},
+                        "total_amount": {"$sum": amount},
+                        "total_transactions": {"$sum": {"$ifNull": ["$transaction_count", 1]}},
+                        "over_600_count": {"$sum": {"$cond": [{"$gte": [amount, 600]}, 1, 0]}},
+                        "over_600_amount": {"$sum": {"$cond": [{"$gte": [amount, 600]}, amount, 0]}},
+                        "classified_count": {"$sum": {"$cond": [
+                            {"$ne": [{"$ifNull": ["$classification", ""]}, ""]}, 1, 0
+                        ]}}
+                    }}
+                ],
+                "categories": [
+                    {"$project": {"total_paid": amount, "categories": _categories_expr()}},
+                    {"$unwind": "$categories"},
+                    {"$group": {"_id": "$categories", "count": {"$sum": 1}, "total_amount": {"$sum": "$total_paid"}}}
+                ],
+                "forms": [
+                    {"$group": {
+                        "_id": {"$ifNull": ["$form", "Unclassified"]},
+                        "count": {"$sum": 1},
+                        "total_amount": {"$sum": amount}
+                    }}
+                ]
+            }}
+        ]
+        
+        result = list(self.collection.aggregate(pipeline))
+        facets = result[0] if result else {"totals": [], "categories": [], "forms": []}
+        
+        totals = facets['totals'][0] if facets['totals'] else {}
+        totals.pop('_id', None)
+        
+        return {
+            'totals': totals,
+            'categories': {item['_id']: {'count': item['count'], 'total_amount': item['total_amount']}
+                           for item in facets['categories']},
+            'forms': {item['_id']: {'count': item['count'], 'total_amount': item['total_amount']}
+                      for item in facets['forms']}
+        }
+    
+    def get_vendors_page(self, session_id: str, category: Optional[str] = None, page: int = 1,
+                         per_page: int = 100, sort_field: str = 'global_index', sort_direction: int = ASCENDING,
+                         search: Optional[str] = None, form: Optional[str] = None,
+                         min_amount: Optional[float] = None, max_amount: Optional[float] = None) -> Dict[str, Any]:
+        """Get one page of vendors for a session, optionally within a category tab
+        
+        Sorting on global_index (the default) is served by the
+        (session_id, global_index) index; the category filter is applied after
+        the sort so the index is still used.
+        
+        Returns:
+            Dict with 'vendors', 'total', 'page', 'per_page' and 'pages'
+        """
+        if sort_field not in VENDOR_SORT_FIELDS:
+            sort_field = 'global_index'
+        page = max(1, page)
+        per_page = max(1, min(per_page, 1000))
+        
+        match: Dict[str, Any] = {"session_id": session_id}
+        if search:
+            match["vendor_name"] = {"$regex": re.escape(search), "$options": "i"}
+        if form:
+            match["form"] = form
+        if min_amount is not None or max_amount is not None:
+            match["total_paid"] = {}
+            if min_amount is not None:
+                match["total_paid"]["$gte"] = min_amount
+            if max_amount is not None:
+                match["total_paid"]["$lte"] = max_amount
+        
+        sort = {sort_field: sort_direction}
+        if sort_field != 'global_index':
+            sort['global_index'] = ASCENDING  # Stable ordering across pages
+        
+        pipeline: List[Dict[str, Any]] = [{"$match": match}, {"$sort": sort}]
+        if category in CATEGORY_NAMES:
+            pipeline.append({"$match": {"$expr": {"$in": [category, _categories_expr()]}}})
+        pipeline.append({"$facet": {
+            "vendors": [{"$skip": (page - 1) * per_page}, {"$limit": per_page}],
+            "total": [{"$count": "count"}]
+        }})
+        
+        result = list(self.collection.aggregate(pipeline))
+        facets = result[0] if result else {"vendors": [], "total": []}
+        
+        vendors = facets['vendors']
+        for vendor in vendors:
+            vendor['_id'] = str(vendor['_id'])
+        
+        total = facets['total'][0]['count'] if facets['total'] else 0
+        
+        return {
+            'vendors': vendors,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'pages': max(1, -(-total // per_page))
+        }
+    
+    def iter_vendors_by_category(self, session_id: str):
+        """Stream (category, vendor) pairs sorted by category tab, then global_index
+        
+        Vendors listed under two tabs (see _categories_expr) are yielded once per
+        tab. Reads through a server-side cursor so exports never hold the whole
+        session in memory.
+        """
+        category_order = {'$switch': {
+            'branches': [{'case': {'$eq': ['$category', name]}, 'then': position}
+                         for position, name in enumerate(CATEGORY_NAMES)],
+            'default': len(CATEGORY_NAMES)
+        }}
+        pipeline = [
+            {"$match": {"session_id": session_id}},
+            {"$addFields": {"category": _categories_expr()}},
+            {"$unwind": {"path": "$category", "includeArrayIndex": "category_position"}},
+            {"$addFields": {"category_order": category_order}},
+            {"$sort": {"category_order": ASCENDING, "global_index": ASCENDING}},
+            {"$project": {"_id": 0, "created_at": 0, "updated_at": 0}}
+        ]
+        
+        for vendor in self.collection.aggregate(pipeline, allowDiskUse=True, batchSize=1000):
+            yield vendor.pop('category'), vendor
+    
     def replace_all_vendors(self, session_id: str, vendors_data: List[Dict[str, Any]]) -> bool:
         """Replace all vendors for a session (used during file upload)"""
         try:
@@ -241,6 +468,102 @@ class Vendor:
             logger.error(f"Error replacing vendors: {e}")
             return False
         
+    def merge_vendors(self, session_id: str, vendors_data: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Incrementally merge a new upload into a session's stored vendors
+        
+        Vendors are matched by normalized name. Matched vendors keep their notes
+        and any manual classification; automatic classifications are kept only
+        when tax ID, amount and accounts are unchanged (otherwise they are cleared
+        for reclassification). Unmatched stored vendors are deleted. All changes
+        go out in a single unordered bulk_write.
+        
+        Returns:
+            Dict with 'inserted', 'updated', 'unchanged', 'deleted', 'count_delta'
+            and 'amount_delta' (for $inc on the session totals), or None on error
+        """
+        try:
+            from pymongo import InsertOne, UpdateOne, DeleteOne
+            
+            existing_cursor = self.collection.find(
+                {"session_id": session_id},
+                {"vendor_key": 1, "vendor_name": 1, "vendor_id": 1, "total_paid": 1, "transaction_count": 1,
+                 "accounts": 1, "memo": 1, "global_index": 1, "manually_classified": 1}
+            )
+            existing: Dict[str, Dict[str, Any]] = {}
+            bulk_operations = []
+            stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0,
+                     'count_delta': 0, 'amount_delta': 0.0}
+            
+            for doc in existing_cursor:
+                key = doc.get('vendor_key') or normalize_vendor_name(doc.get('vendor_name', ''))
+                if key in existing:
+                    # Duplicate key from an older upload - keep the first one only
+                    bulk_operations.append(DeleteOne({"_id": doc['_id']}))
+                    stats['deleted'] += 1
+                    stats['count_delta'] -= 1
+                    stats['amount_delta'] -= doc.get('total_paid', 0) or 0
+                    continue
+                existing[key] = doc
+            
+            update_time = datetime.utcnow()
+            seen_keys = set()
+            
+            for vendor_data in vendors_data:
+                new_doc = self._build_vendor_doc(session_id, vendor_data)
+                key = new_doc['vendor_key']
+                seen_keys.add(key)
+                old_doc = existing.get(key)
+                
+                if old_doc is None:
+                    bulk_operations.append(InsertOne(new_doc))
+                    stats['inserted'] += 1
+                    stats['count_delta'] += 1
+                    stats['amount_delta'] += new_doc['total_paid']
+                    continue
+                
+                data_fields = ['vendor_name', 'vendor_id', 'total_paid', 'transaction_count',
+                               'accounts', 'memo', 'global_index']
+                changes = {field: new_doc[field] for field in data_fields if old_doc.get(field) != new_doc[field]}
+                if old_doc.get('vendor_key') != key:
+                    changes['vendor_key'] = key
+                
+                if not changes:
+                    stats['unchanged'] += 1
+                    continue
+                
+                changes['has_tax_id'] = new_doc['has_tax_id']
+                changes['updated_at'] = update_time
+                
+                # Inputs to classification changed - clear automatic classifications
+                classification_inputs = {'vendor_id', 'total_paid', 'accounts'}
+                if classification_inputs & changes.keys() and not old_doc.get('manually_classified'):
+                    changes.update({'classification': '', 'form': '', 'reason': ''})
+                
+                bulk_operations.append(UpdateOne({"_id": old_doc['_id']}, {"$set": changes}))
+                stats['updated'] += 1
+                stats['amount_delta'] += new_doc['total_paid'] - (old_doc.get('total_paid', 0) or 0)
+            
+            for key, old_doc in existing.items():
+                if key not in seen_keys:
+                    bulk_operations.append(DeleteOne({"_id": old_doc['_id']}))
+                    stats['deleted'] += 1
+                    stats['count_delta'] -= 1
+                    stats['amount_delta'] -= old_doc.get('total_paid', 0) or 0
+            
+            if bulk_operations:
+                self.collection.bulk_write(bulk_operations, ordered=False)
+                self._bump_data_version(session_id)
+            
+            logger.info(
+                f"Merged vendors for session {session_id[:8]}: {stats['inserted']} inserted, "
+                f"{stats['updated']} updated, {stats['unchanged']} unchanged, {stats['deleted']} deleted"
+            )
+            return stats
+            
+        except Exception as e:
+            logger.error(f"Error merging vendors: {e}")
+            return None
+    
     def bulk_update_vendors(self, session_id: str, updates: List[Dict[str, Any]]) -> bool:
         """Bulk update multiple vendors efficiently
         
@@ -269,6 +592,7 @@ class Vendor:
             
             if bulk_operations:
                 result = self.collection.bulk_write(bulk_operations, ordered=False)
+                self._bump_data_version(session_id)
                 logger.info(f"Bulk updated {result.modified_count} vendors")
                 return True
             
@@ -276,4 +600,69 @@ class Vendor:
             
         except Exception as e:
             logger.error(f"Error in bulk update: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+class ClassificationCache:
+    """Persistent cache of AI vendor classifications
+
+    Entries are keyed by the backend that answered (its cache_source) plus
+    normalized vendor name + tax-ID presence + amount bucket (see
+    vendor_keys.vendor_cache_key) and are not tied to a session,
+    so re-uploads and year-over-year runs reuse prior classifications.
+    """
+    
+    def __init__(self, db: Database):
+        self.db = db
+        self.collection = db.classification_cache
+    
+    def get_many(self, cache_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up cached classifications for a list of keys in one query"""
+        if not cache_keys:
+            return {}
+        
+        try:
+            cursor = self.collection.find(
+                {"cache_key": {"$in": list(set(cache_keys))}},
+                {"_id": 0}
+            )
+            return {doc['cache_key']: doc for doc in cursor}
+        except Exception as e:
+            logger.error(f"Error reading classification cache: {e}")
+            return {}
+    
+    def put_many(self, entries: List[Dict[str, Any]]) -> bool:
+        """Upsert classification results
+        
+        Args:
+            entries: List of dicts with 'cache_key', 'classification', 'form',
+                'reason', 'confidence' and 'source'
+        """
+        if not entries:
+            return True
+        
+        try:
+            from pymongo import UpdateOne
+            
+            update_time = datetime.utcnow()
+            bulk_operations = []
+            
+            for entry in entries:
+                fields = {k: v for k, v in entry.items() if k != 'cache_key'}
+                fields['updated_at'] = update_time
+                bulk_operations.append(UpdateOne(
+                    {'cache_key': entry['cache_key']},
+                    {'$set': fields, '$setOnInsert': {'created_at': update_time}},
+                    upsert=True
+                ))
+            
+            self.collection.bulk_write(bulk_operations, ordered=False)
+            return True
+        except Exception as e:
+            logger.error(f"Error writing classification cache: {e}")
+            return False
+    
+    def clear(self) -> int:
+        """Remove all cached classifications"""
+        result = self.collection.delete_many({})
+        return result.deleted_count
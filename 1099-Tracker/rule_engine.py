@@ -0,0 +1,258 @@
+import re
+from functools import lru_cache
+from typing import Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+from gemini_ai import VendorClassificationResult
+from vendor_keys import has_tax_id
+
+# Keyword groups for rule-based vendor classification, compiled once at import.
+# Matching is plain substring matching on the lowercased text.
+GOODS = 1
+SERVICE = 2
+ATTORNEY = 4
+NON_REPORTABLE = 8
+RENT = 16
+CORPORATION = 32
+LLC = 64
+
+KEYWORD_GROUPS = {
+    GOODS: ['inventory', 'equipment', 'supplies', 'materials', 'merchandise', 'products', 'parts', 'tools',
+            'furniture', 'software license', 'hardware', 'computers', 'machinery', 'vehicles', 'purchase',
+            'procurement', 'asset'],
+    SERVICE: ['consulting', 'professional', 'maintenance', 'repair', 'legal', 'accounting', 'marketing',
+              'advertising', 'contractor', 'freelance', 'services', 'consultant'],
+    ATTORNEY: ['attorney', 'law firm', 'legal', 'lawyer', 'esquire', 'esq'],
+    NON_REPORTABLE: [
+        # Government
+        'eftps', 'irs', 'treasury', 'government', 'federal', 'state', 'county', 'city', 'municipal',
+        # Payroll services
+        'quickbooks payroll', 'qb payroll', 'adp', 'paychex', 'gusto', 'payroll service',
+        # Banks and financial
+        'pnc bank', 'pnc', 'chase', 'bank of america', 'wells fargo', 'citibank', 'us bank', 'capital one',
+        'bank', 'credit union', 'federal credit union',
+        # Insurance
+        'insurance', 'assurance',
+        # Utilities
+        'electric', 'gas', 'water', 'utilities', 'telecom', 'telephone', 'internet service',
+        # Credit card processors
+        'visa', 'mastercard', 'american express', 'amex', 'discover', 'square', 'stripe', 'paypal merchant'
+    ],
+    RENT: ['rent', 'lease', 'property', 'landlord'],
+    CORPORATION: ['corp', 'corporation', 'inc', 'incorporated'],
+    LLC: ['llc'],
+}
+
+# Groups checked against both the vendor name and the accounts text; the
+# others are matched on the vendor name only
+NAME_OR_ACCOUNT_GROUPS = GOODS | SERVICE
+
+# Amount/tax ID conditions a rule can require (None: any vendor in the group)
+WITH_TAX_ID_OVER_600 = 'with_tax_id_over_600'
+WITHOUT_TAX_ID_OVER_600 = 'without_tax_id_over_600'
+
+# Fallback rules in priority order; the first match wins:
+# (keyword group or None for any vendor, amount condition, classification, form,
+#  reason template, confidence)
+RULES = [
+    (GOODS, None, "Non-Reportable", "Not Required",
+     "Goods/products purchase: {amount} - equipment/supplies not subject to 1099 reporting", 0.8),
+
+    (ATTORNEY, WITH_TAX_ID_OVER_600, "1099-Eligible", "1099-NEC",
+     "Attorney/legal services with Tax ID: {amount} ≥ $600 threshold (IRS exception - always reportable)", 0.8),
+    (ATTORNEY, WITHOUT_TAX_ID_OVER_600, "W-9 Required", "W-9 Needed",
+     "Attorney/legal services: {amount} ≥ $600 but missing Tax ID/SSN - need W-9 to collect tax information for 1099 reporting", 0.7),
+    (ATTORNEY, None, "Non-Reportable", "Not Required",
+     "Attorney/legal services: {amount} < $600 threshold", 0.8),
+
+    (NON_REPORTABLE, None, "Non-Reportable", "Not Required",
+     "Government entity, bank, payroll service, insurance, or utility - not subject to 1099 reporting", 0.9),
+
+    (RENT, WITH_TAX_ID_OVER_600, "1099-Eligible", "1099-MISC",
+     "Rent payments with Tax ID: {amount} ≥ $600 threshold", 0.7),
+    (RENT, WITHOUT_TAX_ID_OVER_600, "Non-Reportable", "Not Required",
+     "Rent payments: {amount} ≥ $600 but missing Tax ID/SSN - cannot issue 1099", 0.6),
+    (RENT, None, "Non-Reportable", "Not Required",
+     "Rent payments: {amount} < $600 threshold", 0.7),
+
+    (CORPORATION, None, "Non-Reportable", "Not Required",
+     "Corporation - not subject to 1099 reporting (except attorney fees)", 0.6),
+
+    (SERVICE, WITH_TAX_ID_OVER_600, "1099-Eligible", "1099-NEC",
+     "Service provider with Tax ID: {amount} ≥ $600 threshold", 0.6),
+    (SERVICE, WITHOUT_TAX_ID_OVER_600, "Non-Reportable", "Not Required",
+     "Service provider: {amount} ≥ $600 but missing Tax ID/SSN - cannot issue 1099", 0.5),
+    (SERVICE, None, "Non-Reportable", "Not Required",
+     "Service provider: {amount} < $600 threshold", 0.6),
+
+    (LLC, WITH_TAX_ID_OVER_600, "1099-Eligible", "1099-NEC",
+     "LLC with Tax ID: {amount} ≥ $600 threshold - likely reportable (review and transfer to Non-Reportable if corporation/multi-member)", 0.5),
+    (LLC, WITHOUT_TAX_ID_OVER_600, "W-9 Required", "W-9 Needed",
+     "LLC entity: {amount} ≥ $600 but missing Tax ID - need W-9 to collect tax information", 0.6),
+    (LLC, None, "Non-Reportable", "Not Required",
+     "LLC entity: {amount} < $600 threshold", 0.7),
+
+    (None, WITH_TAX_ID_OVER_600, "1099-Eligible", "1099-NEC",
+     "Has Tax ID: {amount} ≥ $600 threshold - likely reportable (review and transfer to Non-Reportable if corporation/exempt entity)", 0.5),
+    (None, WITHOUT_TAX_ID_OVER_600, "W-9 Required", "W-9 Needed",
+     "{amount} ≥ $600 threshold but missing Tax ID/SSN - need W-9 to collect tax information for 1099 reporting", 0.6),
+]
+DEFAULT_RULE = (None, None, "Non-Reportable", "Not Required",
+                "{amount} < $600 threshold - below IRS reporting requirements", 0.8)
+
+
+def _compile_matcher():
+    """Build one regex for every keyword plus a keyword -> group bitmask map
+
+    The pattern is a zero-width lookahead so matches may overlap, and
+    alternatives are ordered longest first. At any position the longest
+    matching keyword is found, and every shorter keyword matching at the same
+    position is a prefix of it, so its mask includes the groups of all of its
+    keyword prefixes.
+    """
+    keyword_groups: Dict[str, int] = {}
+    for group, keywords in KEYWORD_GROUPS.items():
+        for keyword in keywords:
+            keyword_groups[keyword] = keyword_groups.get(keyword, 0) | group
+
+    keyword_masks = {}
+    for keyword in keyword_groups:
+        mask = 0
+        for other, group in keyword_groups.items():
+            if keyword.startswith(other):
+                mask |= group
+        keyword_masks[keyword] = mask
+
+    alternatives = sorted(keyword_groups, key=len, reverse=True)
+    pattern = re.compile('(?=(' + '|'.join(re.escape(k) for k in alternatives) + '))')
+    return pattern, keyword_masks
+
+
+KEYWORD_PATTERN, KEYWORD_MASKS = _compile_matcher()
+
+
+@lru_cache(maxsize=100000)
+def text_groups(text: str) -> int:
+    """Bitmask of keyword groups found in a lowercased text (memoized per text)"""
+    mask = 0
+    for keyword in KEYWORD_PATTERN.findall(text):
+        mask |= KEYWORD_MASKS[keyword]
+    return mask
+
+
+def _group_masks(texts: pd.Series) -> np.ndarray:
+    """Evaluate the matcher once per distinct text and broadcast to the column"""
+    codes, uniques = pd.factorize(texts, sort=False)
+    unique_masks = np.fromiter((text_groups(text) for text in uniques), dtype=np.int64, count=len(uniques))
+    return unique_masks[codes]
+
+
+def _reason(template: str, amounts: pd.Series) -> np.ndarray:
+    """Render a '{amount}' reason template for every row"""
+    if '{amount}' not in template:
+        return np.full(len(amounts), template, dtype=object)
+    prefix, suffix = template.split('{amount}', 1)
+    return (prefix + amounts + suffix).to_numpy(dtype=object)
+
+
+def classify_vendor_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Classify a whole vendor table with the rule-based logic in one pass
+
+    Args:
+        df: Frame with 'vendor_name', 'vendor_id', 'total_paid' and 'accounts'
+
+    Returns:
+        Frame (same index) with 'classification', 'form', 'reason' and
+        'confidence' columns, identical to calling classify_vendor_rules
+        on each row.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=['classification', 'form', 'reason', 'confidence'], index=df.index)
+
+    names = df['vendor_name'].fillna('').astype(str).str.lower()
+    accounts = df['accounts'].fillna('').astype(str).str.lower()
+    total_paid = pd.to_numeric(df['total_paid'], errors='coerce').fillna(0.0).astype(float)
+
+    vendor_has_tax_id = df['vendor_id'].fillna('').astype(str).map(has_tax_id).to_numpy(dtype=bool)
+
+    name_mask = _group_masks(names)
+    account_mask = _group_masks(accounts) & NAME_OR_ACCOUNT_GROUPS
+    combined_mask = name_mask | account_mask
+
+    over_600 = (total_paid >= 600).to_numpy()
+    amount_conditions = {
+        None: np.ones(len(df), dtype=bool),
+        WITH_TAX_ID_OVER_600: vendor_has_tax_id & over_600,
+        WITHOUT_TAX_ID_OVER_600: ~vendor_has_tax_id & over_600,
+    }
+
+    amounts = total_paid.map('${:,.2f}'.format)
+
+    conditions = [
+        ((combined_mask & group) > 0 if group else True) & amount_conditions[amount_rule]
+        for group, amount_rule, *_ in RULES
+    ]
+    all_rules = RULES + [DEFAULT_RULE]
+
+    # Pick the first matching rule per row, then build each column only from
+    # the rules actually selected
+    rule_index = np.select(conditions, np.arange(len(RULES)), default=len(RULES))
+
+    classification = np.empty(len(df), dtype=object)
+    form = np.empty(len(df), dtype=object)
+    reason = np.empty(len(df), dtype=object)
+    confidence = np.empty(len(df), dtype=float)
+
+    for idx in np.unique(rule_index):
+        _, _, rule_classification, rule_form, template, rule_confidence = all_rules[idx]
+        rows = rule_index == idx
+        classification[rows] = rule_classification
+        form[rows] = rule_form
+        reason[rows] = _reason(template, amounts[rows])
+        confidence[rows] = rule_confidence
+
+    return pd.DataFrame({
+        'classification': classification,
+        'form': form,
+        'reason': reason,
+        'confidence': confidence
+    }, index=df.index)
+
+
+def classify_vendor_rules(vendor_name: str, vendor_id: str, total_paid: float,
+                          accounts: str) -> VendorClassificationResult:
+    """Rule-based classification of a single vendor (same rules as classify_vendor_table)"""
+    mask = text_groups((vendor_name or '').lower()) | (text_groups((accounts or '').lower()) & NAME_OR_ACCOUNT_GROUPS)
+
+    vendor_has_tax_id = has_tax_id(vendor_id)
+    over_600 = total_paid >= 600
+    amount_conditions = {
+        None: True,
+        WITH_TAX_ID_OVER_600: vendor_has_tax_id and over_600,
+        WITHOUT_TAX_ID_OVER_600: not vendor_has_tax_id and over_600,
+    }
+
+    for group, amount_rule, classification, form, template, confidence in RULES + [DEFAULT_RULE]:
+        if (group is None or mask & group) and amount_conditions[amount_rule]:
+            return VendorClassificationResult(
+                classification=classification,
+                form=form,
+                reason=template.replace('{amount}', f"${total_paid:,.2f}"),
+                confidence=confidence
+            )
+
+
+def classify_vendor_records(vendors: List[Dict[str, Any]]) -> List[VendorClassificationResult]:
+    """Rule-based classification for a list of vendor dicts, in input order"""
+    if not vendors:
+        return []
+
+    df = pd.DataFrame(vendors, columns=['vendor_name', 'vendor_id', 'total_paid', 'accounts'])
+    table = classify_vendor_table(df)
+
+    return [
+        VendorClassificationResult(classification=row[0], form=row[1], reason=row[2], confidence=row[3])
+        for row in table.itertuples(index=False, name=None)
+    ]
@@ -237,6 +237,12 @@ function showCategory(categoryName, buttonElement) {
         tab.classList.remove('active');
     });
     
+    // Search/sort form applies to the visible tab
+    const filterCategory = document.getElementById('filter-category');
+    if (filterCategory) {
+        filterCategory.value = categoryName;
+    }
+    
     // Show selected category with fade-in animation
     const selectedCategory = document.getElementById(`category-${categoryName}`);
     if (selectedCategory) {
@@ -0,0 +1,93 @@
+import math
+import re
+from functools import lru_cache
+from typing import Any, Optional
+
+# Values that mean "no tax ID on file" in uploaded vendor lists. 'nan'/'null'/
+# 'none' are what stringified empty spreadsheet cells and JSON nulls turn into.
+EMPTY_TAX_ID_VALUES = {'', '-', 'n/a', 'na', 'none', 'null', 'nan'}
+NO_TAX_ID_PHRASES = ['no tax id', 'no ssn', 'no ein', 'missing', 'not provided', 'n/a']
+
+# Amount bucket edges (lower bounds). $10 is the royalty threshold, $600 the
+# standard 1099 threshold; the upper buckets separate routine from large payees.
+AMOUNT_BUCKETS = [
+    (0, 'under_10'),
+    (10, '10_to_600'),
+    (600, '600_to_5k'),
+    (5000, '5k_to_50k'),
+    (50000, '50k_plus'),
+]
+
+
+def normalize_vendor_name(vendor_name: str) -> str:
+    """Normalize vendor name for deduplication"""
+    # Convert to lowercase and remove common variations
+    normalized = vendor_name.lower().strip()
+
+    # Remove common suffixes and prefixes
+    suffixes = ['inc', 'inc.', 'corp', 'corp.', 'llc', 'ltd', 'ltd.', 'co', 'co.', 'company']
+    for suffix in suffixes:
+        if normalized.endswith(' ' + suffix):
+            normalized = normalized[:-len(suffix)-1].strip()
+
+    # Remove special characters and extra spaces
+    normalized = re.sub(r'[^\w\s]', '', normalized)
+    normalized = re.sub(r'\s+', ' ', normalized).strip()
+
+    return normalized
+
+
+def has_tax_id(vendor_id: Any) -> bool:
+    """Check whether a vendor ID value is a usable SSN/EIN"""
+    if vendor_id is None:
+        return False
+
+    return _has_tax_id(str(vendor_id))
+
+
+@lru_cache(maxsize=100000)
+def _has_tax_id(vendor_id: str) -> bool:
+    value = vendor_id.strip().lower()
+    if value in EMPTY_TAX_ID_VALUES:
+        return False
+
+    return not any(phrase in value for phrase in NO_TAX_ID_PHRASES)
+
+
+def parse_amount(total_paid: Any) -> Optional[float]:
+    """Payment total as a float ('$1,234.50' strings included), or None if it is not a number"""
+    if isinstance(total_paid, str):
+        total_paid = total_paid.replace('$', '').replace(',', '').strip()
+    try:
+        amount = float(total_paid)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(amount) else amount
+
+
+def amount_bucket(total_paid: Any) -> Optional[str]:
+    """Map a payment total to its reporting bucket (None when it is not a number)"""
+    amount = parse_amount(total_paid)
+    if amount is None:
+        return None
+
+    bucket = AMOUNT_BUCKETS[0][1]
+    for lower_bound, name in AMOUNT_BUCKETS:
+        if amount >= lower_bound:
+            bucket = name
+    return bucket
+
+
+def vendor_cache_key(vendor_name: str, vendor_id: Any, total_paid: Any) -> Optional[str]:
+    """Build the classification cache key for a vendor
+
+    Vendors with the same normalized name, tax-ID presence and amount bucket
+    classify the same way, so the key deliberately ignores the exact amount.
+    Returns None (do not cache) when the amount is not a number.
+    """
+    bucket = amount_bucket(total_paid or 0)
+    if bucket is None:
+        return None
+
+    tax_id_flag = 'tin' if has_tax_id(vendor_id) else 'no_tin'
+    return f"{normalize_vendor_name(vendor_name)}|{tax_id_flag}|{bucket}"
@@ -1,13 +1,12 @@
 import streamlit as st
 import pandas as pd
 import io
-import zipfile
 import requests
 import base64
 from PIL import Image
 from io import BytesIO
-from excel_processor import ExcelProcessor
-from file_utils import increment_year_in_filename, validate_excel_file
+from job_runner import run_processing_job
+from reporting import StreamlitReporter
 from datetime import datetime
 from config import config
 from mongo_utils import get_db_manager
@@ -393,11 +392,15 @@ def initialize_mongodb():
     
 #     st.markdown(status_html, unsafe_allow_html=True)
 
+@st.cache_data(ttl=config.ANALYTICS_CACHE_SECONDS, show_spinner=False)
+def load_analytics_summary(days=30):
+    """Analytics summary shared by all sessions, refreshed every ANALYTICS_CACHE_SECONDS"""
+    return get_db_manager().get_analytics_summary(days=days)
+
 def get_stats_from_db():
     """Get statistics from MongoDB or use session state"""
     if st.session_state.get('db_connected', False):
-        db_manager = st.session_state.db_manager
-        analytics = db_manager.get_analytics_summary(days=30)
+        analytics = load_analytics_summary(days=30)
         
         return {
             'total_files': analytics.get('total_files_processed', 0),
@@ -575,136 +578,68 @@ def main():
 def process_files(input_files, template_file):
     """Process all input files using the single template and provide ZIP download"""
     
-    processor = ExcelProcessor()
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+    reporter = StreamlitReporter(show_progress=True)
     
     processed_files = []
     total_files = len(input_files)
     
-    # Create processing job in MongoDB if connected
-    job_id = None
-    if st.session_state.get('db_connected', False):
-        db_manager = st.session_state.db_manager
-        job_id = db_manager.create_processing_job(
-            session_id=st.session_state.session_id,
-            input_files=[f.name for f in input_files],
-            template_file=template_file.name,
-            metadata={'total_files': total_files}
-        )
-        
-        db_manager.log_action(
-            'processing_started',
-            {'job_id': job_id, 'total_files': total_files},
-            st.session_state.session_id
-        )
-    
-    # Validate template file first
-    if not validate_excel_file(template_file):
-        st.error(f"Invalid template file: {template_file.name}")
+    def on_result(result, completed, total):
+        """Collect successful outputs for the download listing"""
+        if result['success']:
+            processed_files.append({
+                'name': result['output_name'],
+                'original_input': result['input_name'],
+                'template_used': template_file.name,
+                'seconds': result['seconds'],
+                'cached': result['cached']
+            })
+    
+    # Validation, parallel processing, file store/memo and job history
+    zip_buffer = io.BytesIO()
+    db_manager = st.session_state.db_manager if st.session_state.get('db_connected', False) else None
+    batch_summary = run_processing_job(
+        inputs=[(f.name, f.getvalue()) for f in input_files],
+        template_name=template_file.name,
+        template_bytes=template_file.getvalue(),
+        reporter=reporter,
+        zip_target=zip_buffer,
+        db_manager=db_manager,
+        session_id=st.session_state.get('session_id'),
+        max_workers=config.BATCH_MAX_WORKERS or None,
+        on_result=on_result
+    )
+    if db_manager is not None:
+        load_analytics_summary.clear()  # Show this job in the header stats
+    if batch_summary is None:
         return
     
-    for i, input_file in enumerate(input_files):
-        try:
-            # Update progress
-            progress = (i + 1) / total_files
-            progress_bar.progress(progress)
-            status_text.text(f"Processing {input_file.name}... ({i+1}/{total_files})")
-            
-            # Validate input file
-            if not validate_excel_file(input_file):
-                st.error(f"Invalid input file: {input_file.name}")
-                continue
-            
-            # Store file metadata in MongoDB if connected
-            if st.session_state.get('db_connected', False):
-                db_manager.store_file_metadata(
-                    filename=input_file.name,
-                    file_content=input_file.getvalue(),
-                    file_type='input',
-                    metadata={'job_id': job_id}
-                )
-            
-            # Process the file pair
-            output_buffer = processor.process_file_pair(input_file, template_file)
-            
-            if output_buffer:
-                # Generate output filename with incremented year
-                output_filename = increment_year_in_filename(input_file.name)
-                
-                processed_files.append({
-                    'name': output_filename,
-                    'buffer': output_buffer,
-                    'original_input': input_file.name,
-                    'template_used': template_file.name
-                })
-                
-                # Store output file metadata
-                if st.session_state.get('db_connected', False):
-                    db_manager.store_file_metadata(
-                        filename=output_filename,
-                        file_content=output_buffer.getvalue(),
-                        file_type='output',
-                        metadata={'job_id': job_id, 'source': input_file.name}
-                    )
-                
-                st.success(f"Successfully processed: {input_file.name}")
-            else:
-                st.error(f"Failed to process: {input_file.name}")
-                
-        except Exception as e:
-            st.error(f"Error processing {input_file.name}: {str(e)}")
-            continue
-    
     # Complete progress
-    progress_bar.progress(1.0)
-    status_text.text("Processing complete!")
+    reporter.progress(1, 1, "Processing complete!")
     
     # Update stats
     st.session_state.stats['processed'] = len(processed_files)
     st.session_state.stats['success_rate'] = int((len(processed_files) / total_files) * 100) if total_files > 0 else 0
     
-    # Complete processing job in MongoDB
-    if job_id and st.session_state.get('db_connected', False):
-        db_manager.complete_processing_job(
-            job_id=job_id,
-            processed_count=len(processed_files),
-            failed_count=total_files - len(processed_files),
-            output_files=[f['name'] for f in processed_files]
-        )
-        
-        # Update analytics
-        db_manager.update_daily_analytics('files_processed', len(processed_files))
-        db_manager.update_daily_analytics('jobs_completed', 1)
-        
-        db_manager.log_action(
-            'processing_completed',
-            {
-                'job_id': job_id,
-                'processed': len(processed_files),
-                'failed': total_files - len(processed_files)
-            },
-            st.session_state.session_id
-        )
-    
     # Display results and download ZIP
     if processed_files:
         st.markdown('<div class="section-card">', unsafe_allow_html=True)
         st.markdown('<h2 class="section-title">📥 Download Results</h2>', unsafe_allow_html=True)
         
-        # Create ZIP file with all processed files
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for file_info in processed_files:
-                zip_file.writestr(file_info['name'], file_info['buffer'].getvalue())
-        
         zip_buffer.seek(0)
         
         # Display file list
         with st.expander("📋 Files in ZIP Package", expanded=True):
             for file_info in processed_files:
                 st.write(f"**{file_info['name']}**")
-                st.caption(f"Source: {file_info['original_input']} | Template: {file_info['template_used']}")
+                st.caption(
+                    f"Source: {file_info['original_input']} | Template: {file_info['template_used']} "
+                    + ("| reused previous output" if file_info['cached'] else f"| {file_info['seconds']:.2f}s")
+                )
+            if batch_summary['workers']:
+                st.caption(
+                    f"Total time: {batch_summary['total_seconds']:.2f}s using {batch_summary['workers']} worker(s) "
+                    f"(template parsed once in {batch_summary['template_seconds']:.2f}s)"
+                )
         
         # Single download button for ZIP
         current_date = datetime.now().strftime("%Y%m%d")
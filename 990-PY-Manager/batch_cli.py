@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Headless Batch Processing CLI for 990 PY Manager
+Runs the same processing as the Streamlit app without a browser session
+
+Usage:
+    python batch_cli.py --input-dir prior_year/ --template blank.xlsx --output-dir out/
+    python batch_cli.py --input-dir prior_year/ --template blank.xlsx --output-dir out/ --workers 8
+    python batch_cli.py ... --progress-log progress.jsonl --zip Processed_Excel_Files.zip
+    python batch_cli.py ... --no-db
+"""
+
+import argparse
+import os
+import sys
+import uuid
+
+from config import config
+from job_runner import run_processing_job
+from mongo_utils import MongoDBManager
+from reporting import JsonLinesReporter
+
+
+def collect_inputs(input_dir):
+    """Read every Excel workbook in a directory as (filename, bytes), sorted by name"""
+    inputs = []
+    for filename in sorted(os.listdir(input_dir)):
+        path = os.path.join(input_dir, filename)
+        if not os.path.isfile(path) or filename.startswith('~$'):
+            continue  # Skip folders and Excel lock files
+        if not any(filename.lower().endswith(ext) for ext in config.ALLOWED_EXTENSIONS):
+            continue
+        with open(path, 'rb') as f:
+            inputs.append((filename, f.read()))
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Headless batch processing for 990 PY Manager',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+
+    parser.add_argument('--input-dir', required=True,
+                       help='Directory of prior year workbooks')
+
+    parser.add_argument('--template', required=True,
+                       help='Blank template workbook used for every input')
+
+    parser.add_argument('--output-dir', required=True,
+                       help='Directory to write processed workbooks to')
+
+    parser.add_argument('--workers', type=int, default=config.BATCH_MAX_WORKERS,
+                       help='Worker processes (default: BATCH_MAX_WORKERS, 0 = one per CPU)')
+
+    parser.add_argument('--progress-log', type=str, metavar='FILE',
+                       help='Append JSON progress lines to FILE (default: stdout)')
+
+    parser.add_argument('--zip', type=str, metavar='NAME',
+                       help='Also write all outputs to a ZIP archive in the output directory')
+
+    parser.add_argument('--no-db', action='store_true',
+                       help='Do not record the job in MongoDB or reuse memoized outputs')
+
+    parser.add_argument('--session-id', type=str, default=None,
+                       help='Session ID recorded on the job (default: cli-<random>)')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"Input directory not found: {args.input_dir}")
+    if not os.path.isfile(args.template):
+        parser.error(f"Template file not found: {args.template}")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    progress_stream = open(args.progress_log, 'a') if args.progress_log else sys.stdout
+    try:
+        reporter = JsonLinesReporter(progress_stream)
+
+        db_manager = None
+        if config.MONGODB_ENABLED and not args.no_db:
+            db_manager = MongoDBManager(config.MONGODB_URI, reporter=reporter)
+            if not db_manager.connect(config.MONGODB_DB_NAME):
+                reporter.warning("MongoDB unavailable - running without job history")
+                db_manager = None
+
+        session_id = args.session_id or f"cli-{uuid.uuid4().hex[:12]}"
+
+        inputs = collect_inputs(args.input_dir)
+        if not inputs:
+            reporter.error(f"No Excel workbooks found in {args.input_dir}")
+            return 1
+
+        with open(args.template, 'rb') as f:
+            template_bytes = f.read()
+
+        def write_output(result, completed, total):
+            """Write each processed workbook as soon as it is ready"""
+            if result['success']:
+                with open(os.path.join(args.output_dir, result['output_name']), 'wb') as f:
+                    f.write(result['output_bytes'])
+
+        zip_target = os.path.join(args.output_dir, args.zip) if args.zip else None
+
+        summary = run_processing_job(
+            inputs=inputs,
+            template_name=os.path.basename(args.template),
+            template_bytes=template_bytes,
+            reporter=reporter,
+            zip_target=zip_target,
+            db_manager=db_manager,
+            session_id=session_id,
+            max_workers=args.workers or None,
+            on_result=write_output
+        )
+
+        if db_manager:
+            db_manager.disconnect()
+
+        if summary is None or summary['failed_files'] > 0:
+            return 1
+        return 0
+    finally:
+        if progress_stream is not sys.stdout:
+            progress_stream.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Batch Processing Module for 990 PY Manager
+Processes many prior-year workbooks against a single template in parallel
+"""
+
+import io
+import multiprocessing
+import os
+import pickle
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+import openpyxl
+
+from excel_processor import ExcelProcessor
+from reporting import CollectingReporter
+from file_utils import increment_year_in_filename
+
+
+# Pristine template snapshot, set once per worker process by _init_worker
+_template_snapshot: Optional[bytes] = None
+
+
+def snapshot_template(template_bytes: bytes) -> bytes:
+    """
+    Parse the template workbook once and serialize the in-memory workbook
+
+    Unpickling the snapshot is several times cheaper than re-parsing the
+    template XML, and every unpickled copy is independent, so each input
+    gets a pristine template without touching the original.
+    """
+    template_wb = openpyxl.load_workbook(io.BytesIO(template_bytes))
+    return pickle.dumps(template_wb, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _available_cpus() -> int:
+    """CPUs this process may run on (respects container/affinity limits)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def _init_worker(template_snapshot: bytes):
+    """Process pool initializer: keep the template snapshot in the worker"""
+    global _template_snapshot
+    _template_snapshot = template_snapshot
+
+
+def _process_one(input_name: str, input_bytes: bytes) -> Dict:
+    """
+    Process one input workbook against a fresh copy of the template
+
+    Returns:
+        Dictionary with input/output names, output bytes, success flag,
+        error message, processor messages and elapsed seconds
+    """
+    start = time.perf_counter()
+    reporter = CollectingReporter()
+    result = {
+        'input_name': input_name,
+        'output_name': None,
+        'output_bytes': None,
+        'success': False,
+        'cached': False,
+        'error': None,
+        'messages': reporter.messages,
+        'seconds': 0.0
+    }
+
+    try:
+        template_wb = pickle.loads(_template_snapshot)
+        output_buffer = ExcelProcessor(reporter).process_with_template(io.BytesIO(input_bytes), template_wb)
+
+        if output_buffer:
+            result['output_name'] = increment_year_in_filename(input_name)
+            result['output_bytes'] = output_buffer.getvalue()
+            result['success'] = True
+        else:
+            result['error'] = 'Processing returned no output'
+    except Exception as e:
+        result['error'] = str(e)
+
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+class BatchProcessor:
+    """Fan input workbooks out to a process pool and stream outputs into a ZIP"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Initialize batch processor
+
+        Args:
+            max_workers: Worker processes to use (defaults to the CPUs available
+                to this process); 1 processes everything in the current process
+        """
+        self.max_workers = max_workers or _available_cpus()
+
+    def process(self, inputs: List[Tuple[str, bytes]], template_bytes: bytes, zip_target=None,
+                on_result: Optional[Callable[[Dict, int, int], None]] = None,
+                cached_outputs: Optional[List[Tuple[str, str, bytes]]] = None) -> Dict:
+        """
+        Process all inputs against one template, writing outputs to a ZIP
+
+        Args:
+            inputs: List of (filename, file bytes) tuples
+            template_bytes: Template workbook bytes
+            zip_target: Path or writable binary file object for the ZIP archive
+                (None to skip the archive and only hand outputs to on_result)
+            on_result: Optional callback(result, completed_count, total) called
+                in the parent process as each file finishes, before its output
+                bytes are released
+            cached_outputs: Optional list of (input name, output name, output
+                bytes) for inputs whose output is already known; these are
+                written to the ZIP without being processed
+
+        Returns:
+            Dictionary with per-file results (without output bytes) and timings
+        """
+        batch_start = time.perf_counter()
+
+        cached_outputs = cached_outputs or []
+        total = len(inputs) + len(cached_outputs)
+        workers = max(1, min(self.max_workers, len(inputs)))
+        results = []
+
+        template_seconds = 0.0
+        template_snapshot = None
+        if inputs:
+            template_start = time.perf_counter()
+            template_snapshot = snapshot_template(template_bytes)
+            template_seconds = round(time.perf_counter() - template_start, 3)
+
+        zip_file = zipfile.ZipFile(zip_target, 'w', zipfile.ZIP_DEFLATED) if zip_target is not None else None
+        try:
+            for completed, result in enumerate(self._run(inputs, template_snapshot, workers, cached_outputs), start=1):
+                if result['success'] and zip_file is not None:
+                    zip_file.writestr(result['output_name'], result['output_bytes'])
+
+                if on_result:
+                    on_result(result, completed, total)
+
+                # Output is already handed off; don't hold every workbook in memory
+                result['output_bytes'] = None
+                results.append(result)
+        finally:
+            if zip_file is not None:
+                zip_file.close()
+
+        processed = sum(1 for r in results if r['success'])
+
+        return {
+            'results': results,
+            'total_files': total,
+            'processed_files': processed,
+            'failed_files': total - processed,
+            'cached_files': len(cached_outputs),
+            'workers': workers,
+            'template_seconds': template_seconds,
+            'total_seconds': round(time.perf_counter() - batch_start, 3)
+        }
+
+    def _run(self, inputs: List[Tuple[str, bytes]], template_snapshot: Optional[bytes], workers: int,
+             cached_outputs: List[Tuple[str, str, bytes]]):
+        """Yield per-file results in completion order, cached outputs first"""
+        for input_name, output_name, output_bytes in cached_outputs:
+            yield {
+                'input_name': input_name,
+                'output_name': output_name,
+                'output_bytes': output_bytes,
+                'success': True,
+                'cached': True,
+                'error': None,
+                'messages': [],
+                'seconds': 0.0
+            }
+
+        if not inputs:
+            return
+
+        if workers == 1:
+            _init_worker(template_snapshot)
+            for input_name, input_bytes in inputs:
+                yield _process_one(input_name, input_bytes)
+            return
+
+        # Spawn (not fork) so workers start clean even when the parent is a
+        # multi-threaded Streamlit server
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(template_snapshot,)) as executor:
+            futures = {
+                executor.submit(_process_one, input_name, input_bytes): input_name
+                for input_name, input_bytes in inputs
+            }
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    # Worker process died (e.g. out of memory) - report and keep going
+                    yield {
+                        'input_name': futures[future],
+                        'output_name': None,
+                        'output_bytes': None,
+                        'success': False,
+                        'cached': False,
+                        'error': str(e),
+                        'messages': [],
+                        'seconds': 0.0
+                    }
@@ -26,11 +26,19 @@ class Config:
     MAX_FILE_SIZE_MB = int(os.getenv('MAX_FILE_SIZE_MB', '50'))
     ALLOWED_EXTENSIONS = ['.xlsx', '.xls']
     
+    # Batch Processing Settings (0 = one worker per CPU)
+    BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', '0'))
+    
     # Session Settings
     SESSION_TIMEOUT_MINUTES = int(os.getenv('SESSION_TIMEOUT_MINUTES', '60'))
     
+    # Retention Settings (enforced by MongoDB TTL indexes, 0 = keep forever)
+    SESSION_RETENTION_DAYS = int(os.getenv('SESSION_RETENTION_DAYS', '30'))
+    AUDIT_LOG_RETENTION_DAYS = int(os.getenv('AUDIT_LOG_RETENTION_DAYS', '30'))
+    
     # Analytics Settings
     ANALYTICS_RETENTION_DAYS = int(os.getenv('ANALYTICS_RETENTION_DAYS', '90'))
+    ANALYTICS_CACHE_SECONDS = int(os.getenv('ANALYTICS_CACHE_SECONDS', '60'))
     
     # Debug Mode
     DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'
@@ -45,8 +53,12 @@ class Config:
             'app_name': cls.APP_NAME,
             'app_version': cls.APP_VERSION,
             'max_file_size_mb': cls.MAX_FILE_SIZE_MB,
+            'batch_max_workers': cls.BATCH_MAX_WORKERS,
             'session_timeout_minutes': cls.SESSION_TIMEOUT_MINUTES,
+            'session_retention_days': cls.SESSION_RETENTION_DAYS,
+            'audit_log_retention_days': cls.AUDIT_LOG_RETENTION_DAYS,
             'analytics_retention_days': cls.ANALYTICS_RETENTION_DAYS,
+            'analytics_cache_seconds': cls.ANALYTICS_CACHE_SECONDS,
             'debug': cls.DEBUG
         }
     
@@ -71,10 +83,18 @@ class Config:
         if cls.MAX_FILE_SIZE_MB <= 0:
             errors.append("MAX_FILE_SIZE_MB must be greater than 0")
         
+        # Check batch worker count
+        if cls.BATCH_MAX_WORKERS < 0:
+            errors.append("BATCH_MAX_WORKERS must be 0 (auto) or greater")
+        
         # Check session timeout
         if cls.SESSION_TIMEOUT_MINUTES <= 0:
             errors.append("SESSION_TIMEOUT_MINUTES must be greater than 0")
         
+        # Check retention periods
+        if cls.SESSION_RETENTION_DAYS < 0 or cls.AUDIT_LOG_RETENTION_DAYS < 0:
+            errors.append("SESSION_RETENTION_DAYS and AUDIT_LOG_RETENTION_DAYS must be 0 (keep forever) or greater")
+        
         return (len(errors) == 0, errors)
 
 
@@ -8,6 +8,7 @@ Usage:
     python db_manager.py --status
     python db_manager.py --stats
     python db_manager.py --clear-logs
+    python db_manager.py --rebuild-analytics
     python db_manager.py --export-jobs output.json
 """
 
@@ -95,6 +96,21 @@ class DatabaseManager:
             print(f"  Files Processed: {analytics.get('total_files_processed', 0)}")
             print(f"  Average Success Rate: {analytics.get('average_success_rate', 0):.2f}%")
         
+        print("\n" + "=" * 60)
+        print("WEEKLY TREND")
+        print("=" * 60)
+        
+        weeks = self.db_manager.get_analytics_rollups(period='week', limit=8)
+        
+        if weeks:
+            for week in weeks:
+                print(f"  Week of {week['bucket_start'].strftime('%Y-%m-%d')}: "
+                      f"{week.get('jobs_completed', 0)} jobs, "
+                      f"{week.get('files_processed', 0)} files processed, "
+                      f"{week.get('files_failed', 0)} failed")
+        else:
+            print("\nNo analytics recorded yet.")
+        
         print("\n" + "=" * 60)
         print("RECENT ACTIVITY")
         print("=" * 60)
@@ -114,7 +130,12 @@ class DatabaseManager:
         print()
     
     def clear_old_logs(self, days=30):
-        """Clear audit logs older than specified days"""
+        """
+        Clear audit logs older than specified days
+        
+        MongoDB already expires logs after AUDIT_LOG_RETENTION_DAYS through a
+        TTL index; use this to trim further ahead of that.
+        """
         if not self.connect():
             return
         
@@ -133,6 +154,16 @@ class DatabaseManager:
         except Exception as e:
             print(f"❌ Error clearing logs: {str(e)}\n")
     
+    def rebuild_analytics(self):
+        """Recompute the daily/weekly analytics rollups from job history"""
+        if not self.connect():
+            return
+        
+        print("Rebuilding analytics rollups from processing jobs...")
+        
+        job_count = self.db_manager.rebuild_analytics_rollups()
+        print(f"✅ Counted {job_count} jobs into analytics rollups\n")
+    
     def export_jobs(self, output_file, days=30):
         """Export processing jobs to JSON file"""
         if not self.connect():
@@ -260,6 +291,9 @@ def main():
                        help='Clear audit logs older than DAYS (default: 30)',
                        nargs='?', const=30)
     
+    parser.add_argument('--rebuild-analytics', action='store_true',
+                       help='Recompute analytics rollups from processing job history')
+    
     parser.add_argument('--export-jobs', type=str, metavar='FILE',
                        help='Export processing jobs to JSON file')
     
@@ -297,6 +331,9 @@ def main():
     if args.clear_logs is not None:
         manager.clear_old_logs(days=args.clear_logs)
     
+    if args.rebuild_analytics:
+        manager.rebuild_analytics()
+    
     if args.export_jobs:
         manager.export_jobs(args.export_jobs, days=args.days)
     
@@ -5,11 +5,94 @@ from openpyxl.utils.cell import coordinate_to_tuple
 from openpyxl.styles import Font, PatternFill, Border, Side, Alignment, NamedStyle
 from openpyxl.styles.colors import Color
 import io
-import streamlit as st
+from reporting import ProgressReporter, StreamlitReporter
+
+# Version of the output-producing logic. Bump whenever a change alters the
+# generated workbooks so memoized outputs from older versions are not reused.
+PROCESSOR_VERSION = '2.1.0'
+
+# Font colors treated as "red text" (rows excluded from border blocks)
+RED_RGB_VALUES = ['FFFF0000', 'FF0000']
+
+
+def _is_red_font(cell):
+    """Check if a cell's font color is red (various ways red can be represented)"""
+    if cell.font and cell.font.color:
+        color = cell.font.color
+        if hasattr(color, 'rgb') and color.rgb:
+            return str(color.rgb).upper() in RED_RGB_VALUES
+        elif hasattr(color, 'theme') and color.theme == 2:  # Theme red
+            return True
+        elif hasattr(color, 'indexed') and color.indexed == 10:  # Indexed red
+            return True
+    return False
+
+
+class SheetIndex:
+    """Facts about a worksheet gathered in a single iter_rows pass
+
+    Built once per sheet state and consulted by the formatting passes instead
+    of each pass rescanning the sheet with sheet.cell() calls. Rebuild it after
+    the sheet's values or fonts change.
+    """
+
+    # Existing border style is sampled from the first rows only
+    BORDER_SAMPLE_ROWS = 19
+
+    def __init__(self, sheet, header_row=3):
+        self.max_row = sheet.max_row
+        self.max_column = sheet.max_column
+        self.headers = {}
+        self.first_total_row = None
+        self.last_data_column = 1
+        self.content_rows = set()
+        self._first_red_column = {}
+        self._border_samples = []
+
+        for row_cells in sheet.iter_rows(min_row=1, max_row=self.max_row, max_col=self.max_column):
+            for cell in row_cells:
+                row, col, value = cell.row, cell.column, cell.value
+
+                if value is not None:
+                    self.last_data_column = max(self.last_data_column, col)
+                    if str(value).strip() != "":
+                        self.content_rows.add(row)
+
+                    if row == header_row and value:
+                        self.headers[str(value).strip()] = col
+
+                    if (col == 1 and self.first_total_row is None and value
+                            and str(value).strip().upper().startswith('TOTAL')):
+                        self.first_total_row = row
+
+                if row not in self._first_red_column and _is_red_font(cell):
+                    self._first_red_column[row] = col
+
+                if row <= self.BORDER_SAMPLE_ROWS and cell.border and cell.border.left and cell.border.left.style:
+                    self._border_samples.append((col, cell.border.left.style))
+
+    def is_red_text_row(self, row_num):
+        """Check if any cell up to the last data column has red text"""
+        first_red = self._first_red_column.get(row_num)
+        return first_red is not None and first_red <= self.last_data_column
+
+    def is_empty_row(self, row_num):
+        """Check if every cell in the row is None or blank"""
+        return row_num not in self.content_rows
+
+    def existing_border_style(self):
+        """First left-border style found in the sampled rows, or None"""
+        for col, style in self._border_samples:
+            if col <= self.last_data_column:
+                return style
+        return None
+
 
 class ExcelProcessor:
-    def __init__(self):
+    def __init__(self, reporter: ProgressReporter = None):
         self.required_sheets = ['SOR', 'SOFE', 'SOFP']
+        # Where warnings/errors go (the Streamlit page unless running headless)
+        self.reporter = reporter or StreamlitReporter()
     
     def _apply_number_formatting(self, cell, value, is_mapping_column=False):
         """Apply comma-style number formatting for numerical values, except for 990 Mapping columns"""
@@ -24,10 +107,22 @@ class ExcelProcessor:
     def process_file_pair(self, input_file, template_file):
         """Process a single input file with its corresponding template"""
         try:
-            # Load both files
-            input_wb = openpyxl.load_workbook(input_file, data_only=True)
             template_wb = openpyxl.load_workbook(template_file)
-            
+        except Exception as e:
+            self.reporter.error(f"Error processing files: {str(e)}")
+            return None
+
+        return self.process_with_template(input_file, template_wb)
+
+    def process_with_template(self, input_file, template_wb):
+        """Process a single input file into an already-loaded template workbook
+
+        The template workbook is modified in place, so callers processing
+        several inputs must pass a fresh copy each time.
+        """
+        try:
+            input_wb = openpyxl.load_workbook(input_file, data_only=True)
+
             # Validate that both files have required sheets
             if not self._validate_sheets(input_wb, template_wb):
                 return None
@@ -40,7 +135,7 @@ class ExcelProcessor:
                     sheet_name
                 )
                 if not success:
-                    st.warning(f"⚠️ Issues encountered processing {sheet_name} sheet")
+                    self.reporter.warning(f"⚠️ Issues encountered processing {sheet_name} sheet")
             
             # Save to buffer
             output_buffer = io.BytesIO()
@@ -50,7 +145,7 @@ class ExcelProcessor:
             return output_buffer
             
         except Exception as e:
-            st.error(f"Error processing files: {str(e)}")
+            self.reporter.error(f"Error processing files: {str(e)}")
             return None
     
     def _validate_sheets(self, input_wb, template_wb):
@@ -61,20 +156,20 @@ class ExcelProcessor:
         
         if not required_sheets_set.issubset(input_sheets):
             missing = required_sheets_set - input_sheets
-            st.error(f"Input file missing sheets: {', '.join(missing)}")
+            self.reporter.error(f"Input file missing sheets: {', '.join(missing)}")
             return False
         
         if not required_sheets_set.issubset(template_sheets):
             missing = required_sheets_set - template_sheets
-            st.error(f"Template file missing sheets: {', '.join(missing)}")
+            self.reporter.error(f"Template file missing sheets: {', '.join(missing)}")
             return False
         
         return True
     
-    def _apply_accounting_format_to_total_columns(self, sheet, sheet_name):
+    def _apply_accounting_format_to_total_columns(self, sheet, sheet_name, index=None):
         """Apply accounting format to TOTAL(CY) and TOTAL(LY) columns"""
         # Get headers from row 3
-        headers = self._get_headers_from_row(sheet, 3)
+        headers = index.headers if index else self._get_headers_from_row(sheet, 3)
         if not headers:
             return
         
@@ -99,69 +194,32 @@ class ExcelProcessor:
         
         # Apply accounting format to all cells in these columns (starting from row 4)
         for col in total_columns:
-            for row in range(4, sheet.max_row + 1):
-                cell = sheet.cell(row=row, column=col)
+            for (cell,) in sheet.iter_rows(min_row=4, max_row=sheet.max_row, min_col=col, max_col=col):
                 if cell.value is not None and isinstance(cell.value, (int, float)) and not isinstance(cell.value, bool):
                     # Use proper accounting format
                     cell.number_format = '_-* #,##0.00_-;-* #,##0.00_-;_-* "-"??_-;_-@_-'
 
-    def _find_first_total_row(self, sheet):
-        """Find the first row that contains a value starting with 'Total' in the first column (Particulars)"""
-        for row in range(1, sheet.max_row + 1):
-            # Only check the first column (column A - Particulars column)
-            cell_value = sheet.cell(row=row, column=1).value
-            if cell_value and str(cell_value).strip().upper().startswith('TOTAL'):
-                return row
-        return None
-
-    def _get_last_data_column(self, sheet):
-        """Find the last column that contains data in the sheet"""
-        last_col = 1
-        for row in range(1, sheet.max_row + 1):
-            for col in range(1, sheet.max_column + 1):
-                if sheet.cell(row=row, column=col).value is not None:
-                    last_col = max(last_col, col)
-        return last_col
-
-    def _is_red_text_row(self, sheet, row_num, last_col):
-        """Check if any cell in the row has red text color"""
-        for col in range(1, last_col + 1):
-            cell = sheet.cell(row=row_num, column=col)
-            if cell.font and cell.font.color:
-                # Check if color is red (various ways red can be represented)
-                color = cell.font.color
-                if hasattr(color, 'rgb') and color.rgb:
-                    rgb_value = str(color.rgb).upper()
-                    # Common red color values
-                    if rgb_value in ['FFFF0000', 'FF0000', 'FFFF0000']:
-                        return True
-                elif hasattr(color, 'theme') and color.theme == 2:  # Theme red
-                    return True
-                elif hasattr(color, 'indexed') and color.indexed == 10:  # Indexed red
-                    return True
-        return False
-
-    def _find_ranges_for_borders(self, sheet):
+    def _find_ranges_for_borders(self, sheet, index=None):
         """Find non-empty row blocks in a sheet after the first 'Total' row and return the corresponding ranges."""
         ranges = []
         start_row = None
+        index = index or SheetIndex(sheet)
         
         # Find the first row containing "Total"
-        first_total_row = self._find_first_total_row(sheet)
+        first_total_row = index.first_total_row
         if first_total_row is None:
             return ranges  # No "Total" row found, return empty ranges
         
         # Get the last column with data dynamically
-        last_data_col = self._get_last_data_column(sheet)
-        last_col_letter = get_column_letter(last_data_col)
+        last_col_letter = get_column_letter(index.last_data_column)
         
         # Start checking from the row after the first "Total" row
         start_check_row = first_total_row + 1
         
         # Iterate through rows to find non-empty rows after the "Total" row
-        for row in range(start_check_row, sheet.max_row + 1):
+        for row in range(start_check_row, index.max_row + 1):
             # Skip rows with red text
-            if self._is_red_text_row(sheet, row, last_data_col):
+            if index.is_red_text_row(row):
                 if start_row is not None:
                     # End current block before the red text row
                     end_row = row - 1
@@ -169,14 +227,7 @@ class ExcelProcessor:
                     start_row = None
                 continue
             
-            # Check if row is empty (all cells in the row are None or empty)
-            is_empty = all([
-                sheet.cell(row=row, column=col).value is None or 
-                str(sheet.cell(row=row, column=col).value).strip() == ""
-                for col in range(1, last_data_col + 1)  # Check up to last data column
-            ])
-            
-            if not is_empty:
+            if not index.is_empty_row(row):
                 if start_row is None:
                     start_row = row  # Start a new block
             else:
@@ -188,30 +239,22 @@ class ExcelProcessor:
                 
         # Handle case where the last block extends to the end of the sheet
         if start_row is not None:
-            end_row = sheet.max_row
+            end_row = index.max_row
             ranges.append(f"A{start_row}:{last_col_letter}{end_row}")
         
         return ranges
 
-    def _get_existing_border_style(self, sheet):
+    def _get_existing_border_style(self, sheet, index=None):
         """Get the existing border style from the sheet by sampling existing borders"""
-        # Get the last data column for dynamic checking
-        last_data_col = self._get_last_data_column(sheet)
-        
-        # Sample some cells to find existing border style
-        for row in range(1, min(20, sheet.max_row + 1)):
-            for col in range(1, min(last_data_col + 1, sheet.max_column + 1)):
-                cell = sheet.cell(row=row, column=col)
-                if cell.border and cell.border.left and cell.border.left.style:
-                    return cell.border.left.style
+        index = index or SheetIndex(sheet)
         
         # Default to thin if no existing borders found
-        return 'thin'
+        return index.existing_border_style() or 'thin'
 
-    def _apply_matching_outside_borders(self, sheet, ranges):
+    def _apply_matching_outside_borders(self, sheet, ranges, index=None):
         """Apply borders matching existing border thickness only to the outside edges of given ranges."""
         # Get the existing border style from the sheet
-        border_style = self._get_existing_border_style(sheet)
+        border_style = self._get_existing_border_style(sheet, index)
         matching_side = Side(style=border_style)
         
         for range_str in ranges:
@@ -248,9 +291,7 @@ class ExcelProcessor:
 
     def _shift_column_c_border_to_d(self, sheet):
         """Shift the right border from column C to column D, and extend top/bottom borders to both columns"""
-        for row in range(4, sheet.max_row + 1):
-            cell_c = sheet.cell(row=row, column=3)  # Column C
-            cell_d = sheet.cell(row=row, column=4)  # Column D
+        for cell_c, cell_d in sheet.iter_rows(min_row=4, max_row=sheet.max_row, min_col=3, max_col=4):  # Columns C, D
             
             # Check if column C has borders
             has_right_border = cell_c.border and cell_c.border.right and cell_c.border.right.style
@@ -300,7 +341,7 @@ class ExcelProcessor:
                 return self._process_sofp_sheet(input_sheet, template_sheet)
             return False
         except Exception as e:
-            st.error(f"Error processing {sheet_name} sheet: {str(e)}")
+            self.reporter.error(f"Error processing {sheet_name} sheet: {str(e)}")
             return False
     
     def _process_sor_sheet(self, input_sheet, template_sheet):
@@ -310,7 +351,7 @@ class ExcelProcessor:
         template_headers = self._get_headers_from_row(template_sheet, 3)
         
         if not input_headers or not template_headers:
-            st.error("Could not find headers in SOR sheet row 3")
+            self.reporter.error("Could not find headers in SOR sheet row 3")
             return False
         
         # Find column indices
@@ -318,7 +359,7 @@ class ExcelProcessor:
         template_cols = self._find_column_indices(template_headers, ['Particulars', 'Amount (LY)', '990 Mapping (LY)'])
         
         if not all(col is not None for col in input_cols.values()) or not all(col is not None for col in template_cols.values()):
-            st.warning("Some required columns not found in SOR sheet")
+            self.reporter.warning("Some required columns not found in SOR sheet")
             return False
         
         # Find the "TOTAL (As Per Audit Report)" boundary in both sheets
@@ -346,12 +387,15 @@ class ExcelProcessor:
                 input_total_row, template_total_row
             )
         
+        # Index the populated template once for all formatting passes
+        template_index = SheetIndex(template_sheet)
+        
         # Apply accounting format to TOTAL columns
-        self._apply_accounting_format_to_total_columns(template_sheet, 'SOR')
+        self._apply_accounting_format_to_total_columns(template_sheet, 'SOR', template_index)
         
         # Apply matching outside borders to non-empty row blocks after first "Total" row
-        border_ranges = self._find_ranges_for_borders(template_sheet)
-        self._apply_matching_outside_borders(template_sheet, border_ranges)
+        border_ranges = self._find_ranges_for_borders(template_sheet, template_index)
+        self._apply_matching_outside_borders(template_sheet, border_ranges, template_index)
         
         return True
     
@@ -362,7 +406,7 @@ class ExcelProcessor:
         template_headers = self._get_headers_from_row(template_sheet, 3)
         
         if not input_headers or not template_headers:
-            st.error("Could not find headers in SOFE sheet")
+            self.reporter.error("Could not find headers in SOFE sheet")
             return False
         
         # Find column indices
@@ -370,7 +414,7 @@ class ExcelProcessor:
         template_cols = self._find_column_indices(template_headers, ['Particulars', 'Total (LY)', '990 Mapping (LY)'])
         
         if not all(col is not None for col in input_cols.values()) or not all(col is not None for col in template_cols.values()):
-            st.warning("Some required columns not found in SOFE sheet")
+            self.reporter.warning("Some required columns not found in SOFE sheet")
             return False
         
         # Find the "TOTAL (As Per Audit Report)" boundary in both sheets
@@ -398,12 +442,15 @@ class ExcelProcessor:
                 input_total_row, template_total_row
             )
         
+        # Index the populated template once for all formatting passes
+        template_index = SheetIndex(template_sheet)
+        
         # Apply accounting format to TOTAL columns
-        self._apply_accounting_format_to_total_columns(template_sheet, 'SOFE')
+        self._apply_accounting_format_to_total_columns(template_sheet, 'SOFE', template_index)
         
         # Apply matching outside borders to non-empty row blocks after first "Total" row
-        border_ranges = self._find_ranges_for_borders(template_sheet)
-        self._apply_matching_outside_borders(template_sheet, border_ranges)
+        border_ranges = self._find_ranges_for_borders(template_sheet, template_index)
+        self._apply_matching_outside_borders(template_sheet, border_ranges, template_index)
         
         return True
     
@@ -414,7 +461,7 @@ class ExcelProcessor:
         template_headers = self._get_headers_from_row(template_sheet, 3)
         
         if not input_headers or not template_headers:
-            st.error("Could not find headers in SOFP sheet")
+            self.reporter.error("Could not find headers in SOFP sheet")
             return False
         
         # Find Particulars column
@@ -422,7 +469,7 @@ class ExcelProcessor:
         template_particulars_col = self._find_column_index(template_headers, 'Particulars')
         
         if input_particulars_col is None or template_particulars_col is None:
-            st.error("Could not find Particulars column in SOFP sheet")
+            self.reporter.error("Could not find Particulars column in SOFP sheet")
             return False
         
         # Find 990 Mapping columns
@@ -485,17 +532,27 @@ class ExcelProcessor:
     
     def _copy_data_rows(self, input_sheet, template_sheet, start_row, column_mapping):
         """Copy data rows based on column mapping - including blank rows with full formatting"""
+        mapping_columns = self._get_mapping_columns(template_sheet)
         for row in range(start_row, input_sheet.max_row + 1):
             # Copy all rows (including blank ones) to maintain spacing
-            self._copy_single_row_with_formatting(input_sheet, template_sheet, row, row, column_mapping)
+            self._copy_single_row_with_formatting(input_sheet, template_sheet, row, row, column_mapping, mapping_columns)
+    
+    def _get_mapping_columns(self, template_sheet):
+        """Template columns holding 990 Mapping values (kept in General format)"""
+        headers = self._get_headers_from_row(template_sheet, 3)
+        return [col for col in [
+            self._find_column_index(headers, '990 Mapping (CY)'),
+            self._find_column_index(headers, '990 Mapping (LY)')
+        ] if col is not None]
     
     def _find_total_audit_row(self, sheet, particulars_col):
         """Find the row containing 'TOTAL (As Per Audit Report)' in the Particulars column"""
         if particulars_col is None:
             return None
         
-        for row in range(4, sheet.max_row + 1):
-            cell_value = sheet.cell(row=row, column=particulars_col).value
+        for row, (cell_value,) in enumerate(
+                sheet.iter_rows(min_row=4, max_row=sheet.max_row, min_col=particulars_col,
+                                max_col=particulars_col, values_only=True), start=4):
             if cell_value and 'TOTAL' in str(cell_value).upper() and 'AUDIT REPORT' in str(cell_value).upper():
                 return row
         return None
@@ -508,9 +565,11 @@ class ExcelProcessor:
             self._copy_data_rows(input_sheet, template_sheet, start_row, column_mapping)
             return
         
+        mapping_columns = self._get_mapping_columns(template_sheet)
+        
         # Copy data above the boundary (before TOTAL line) - including blank rows
         for row in range(start_row, input_total_row):
-            self._copy_single_row_with_formatting(input_sheet, template_sheet, row, row, column_mapping)
+            self._copy_single_row_with_formatting(input_sheet, template_sheet, row, row, column_mapping, mapping_columns)
         
         # Copy data below the boundary (after TOTAL line) - including all rows even blank ones
         input_after_total = input_total_row + 1
@@ -519,10 +578,13 @@ class ExcelProcessor:
         # Copy all rows after TOTAL line to maintain spacing and formatting
         for i, input_row in enumerate(range(input_after_total, input_sheet.max_row + 1)):
             template_row = template_after_total + i
-            self._copy_single_row_with_formatting(input_sheet, template_sheet, input_row, template_row, column_mapping)
+            self._copy_single_row_with_formatting(input_sheet, template_sheet, input_row, template_row, column_mapping, mapping_columns)
     
-    def _copy_single_row(self, input_sheet, template_sheet, input_row, template_row, column_mapping):
+    def _copy_single_row(self, input_sheet, template_sheet, input_row, template_row, column_mapping, mapping_columns=None):
         """Copy a single row from input to template"""
+        if mapping_columns is None:
+            mapping_columns = self._get_mapping_columns(template_sheet)
+        
         for input_col, template_col in column_mapping.items():
             if input_col is not None and template_col is not None:
                 input_cell = input_sheet.cell(row=input_row, column=input_col)
@@ -532,10 +594,7 @@ class ExcelProcessor:
                 template_cell.value = input_cell.value
                 
                 # Check if this is a mapping column
-                is_mapping = template_col in [col for col in [
-                    self._find_column_index(self._get_headers_from_row(template_sheet, 3), '990 Mapping (CY)'),
-                    self._find_column_index(self._get_headers_from_row(template_sheet, 3), '990 Mapping (LY)')
-                ] if col is not None]
+                is_mapping = template_col in mapping_columns
                 
                 # Apply number formatting for numerical values
                 self._apply_number_formatting(template_cell, input_cell.value, is_mapping)
@@ -550,8 +609,11 @@ class ExcelProcessor:
                 else:
                     template_cell.font = Font(name='Calibri', size=11)
     
-    def _copy_single_row_with_formatting(self, input_sheet, template_sheet, input_row, template_row, column_mapping):
+    def _copy_single_row_with_formatting(self, input_sheet, template_sheet, input_row, template_row, column_mapping, mapping_columns=None):
         """Copy a single row from input to template with complete formatting preservation"""
+        if mapping_columns is None:
+            mapping_columns = self._get_mapping_columns(template_sheet)
+        
         for input_col, template_col in column_mapping.items():
             if input_col is not None and template_col is not None:
                 input_cell = input_sheet.cell(row=input_row, column=input_col)
@@ -561,10 +623,7 @@ class ExcelProcessor:
                 template_cell.value = input_cell.value
                 
                 # Check if this is a mapping column
-                is_mapping = template_col in [col for col in [
-                    self._find_column_index(self._get_headers_from_row(template_sheet, 3), '990 Mapping (CY)'),
-                    self._find_column_index(self._get_headers_from_row(template_sheet, 3), '990 Mapping (LY)')
-                ] if col is not None]
+                is_mapping = template_col in mapping_columns
                 
                 # Apply number formatting for numerical values
                 self._apply_number_formatting(template_cell, input_cell.value, is_mapping)
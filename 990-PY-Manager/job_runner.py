@@ -0,0 +1,225 @@
+"""
+Processing Job Module for 990 PY Manager
+Runs one batch job end to end, shared by the Streamlit app and the headless CLI
+"""
+
+import io
+from typing import Callable, Dict, List, Optional, Tuple
+
+from batch_processor import BatchProcessor
+from excel_processor import PROCESSOR_VERSION
+from file_utils import increment_year_in_filename, validate_excel_file
+from mongo_utils import MongoDBManager
+from reporting import ProgressReporter, replay_messages
+
+
+def _named_buffer(name: str, data: bytes) -> io.BytesIO:
+    """In-memory file object with a name, as validate_excel_file expects"""
+    buffer = io.BytesIO(data)
+    buffer.name = name
+    return buffer
+
+
+def run_processing_job(inputs: List[Tuple[str, bytes]], template_name: str, template_bytes: bytes,
+                       reporter: ProgressReporter, zip_target=None,
+                       db_manager: Optional[MongoDBManager] = None, session_id: Optional[str] = None,
+                       max_workers: Optional[int] = None,
+                       on_result: Optional[Callable[[Dict, int, int], None]] = None) -> Optional[Dict]:
+    """
+    Validate, process and record a batch of prior-year workbooks
+
+    Args:
+        inputs: List of (filename, file bytes) tuples
+        template_name: Template filename
+        template_bytes: Template workbook bytes
+        reporter: Receives messages, progress updates and job/file events
+        zip_target: Optional path or binary file object for a ZIP of all outputs
+        db_manager: Connected MongoDBManager for job history, file store and
+            output memo (None to run without a database)
+        session_id: Session ID recorded on the job
+        max_workers: Worker processes (None = one per available CPU)
+        on_result: Optional callback(result, completed, total) called as each
+            file finishes, while result['output_bytes'] is still available
+
+    Returns:
+        Dictionary with job_id, batch timings and per-file results, or None
+        if the template is invalid
+    """
+    db_connected = db_manager is not None and db_manager.is_connected()
+    total_files = len(inputs)
+
+    # Create processing job in MongoDB if connected
+    job_id = None
+    if db_connected:
+        job_id = db_manager.create_processing_job(
+            session_id=session_id,
+            input_files=[name for name, _ in inputs],
+            template_file=template_name,
+            metadata={'total_files': total_files}
+        )
+
+        db_manager.log_action(
+            'processing_started',
+            {'job_id': job_id, 'total_files': total_files},
+            session_id
+        )
+
+    reporter.event('job_started', job_id=job_id, total_files=total_files, template=template_name)
+
+    # Validate template file first
+    if not validate_excel_file(_named_buffer(template_name, template_bytes)):
+        reporter.error(f"Invalid template file: {template_name}")
+        if job_id:
+            db_manager.update_processing_job(job_id, {'status': 'failed', 'error': 'Invalid template file'})
+            db_manager.record_job_analytics('failed', failed_count=total_files)
+        reporter.event('job_failed', job_id=job_id, error='Invalid template file')
+        return None
+
+    # Store the template content once (hash-first, deduplicated)
+    template_hash = None
+    if db_connected:
+        template_hash = db_manager.store_file(
+            filename=template_name,
+            file_content=template_bytes,
+            file_type='template',
+            metadata={'job_id': job_id}
+        )
+
+    # Validate inputs up front; only valid workbooks without a memoized
+    # output are sent to the workers
+    batch_inputs = []
+    cached_outputs = []
+    input_hashes = {}
+    for input_name, input_bytes in inputs:
+        if not validate_excel_file(_named_buffer(input_name, input_bytes)):
+            reporter.error(f"Invalid input file: {input_name}")
+            reporter.event('file_completed', input=input_name, success=False, error='Invalid input file')
+            continue
+
+        # Store file content in MongoDB if connected
+        if db_connected:
+            input_hash = db_manager.store_file(
+                filename=input_name,
+                file_content=input_bytes,
+                file_type='input',
+                metadata={'job_id': job_id}
+            )
+            input_hashes[input_name] = input_hash
+
+            # Unchanged workbook + template + processor: reuse the prior output
+            if input_hash and template_hash:
+                memo = db_manager.get_memoized_output(input_hash, template_hash, PROCESSOR_VERSION)
+                if memo:
+                    # Named after this upload, not the one that produced the memo
+                    cached_outputs.append((input_name, increment_year_in_filename(input_name), memo['content']))
+                    continue
+
+        batch_inputs.append((input_name, input_bytes))
+
+    def handle_result(result, completed, total):
+        """Report and record each file as soon as it finishes"""
+        replay_messages(result['messages'], reporter)
+        reporter.progress(completed, total, f"Processed {result['input_name']}... ({completed}/{total})")
+
+        if result['success'] and not result['cached'] and db_connected:
+            # Store output content and remember it for this input/template/processor
+            output_hash = db_manager.store_file(
+                filename=result['output_name'],
+                file_content=result['output_bytes'],
+                file_type='output',
+                metadata={'job_id': job_id, 'source': result['input_name'], 'seconds': result['seconds']}
+            )
+            input_hash = input_hashes.get(result['input_name'])
+            if output_hash and input_hash and template_hash:
+                db_manager.memoize_output(
+                    input_hash, template_hash, PROCESSOR_VERSION, output_hash
+                )
+
+        if result['cached']:
+            reporter.success(f"Reused previous output: {result['input_name']} (unchanged since last run)")
+        elif result['success']:
+            reporter.success(f"Successfully processed: {result['input_name']} ({result['seconds']:.2f}s)")
+        else:
+            reporter.error(f"Failed to process: {result['input_name']} - {result['error']}")
+
+        reporter.event(
+            'file_completed',
+            input=result['input_name'],
+            output=result['output_name'],
+            success=result['success'],
+            cached=result['cached'],
+            seconds=result['seconds'],
+            error=result['error']
+        )
+
+        if on_result:
+            on_result(result, completed, total)
+
+    # Parse the template once, fan inputs out to worker processes and
+    # stream each finished workbook to the ZIP / callback
+    batch_summary = None
+    if batch_inputs or cached_outputs:
+        reporter.progress(0, len(batch_inputs) + len(cached_outputs), f"Processing {len(batch_inputs)} file(s)...")
+        batch_processor = BatchProcessor(max_workers=max_workers)
+        try:
+            batch_summary = batch_processor.process(
+                batch_inputs, template_bytes, zip_target,
+                on_result=handle_result, cached_outputs=cached_outputs
+            )
+        except Exception as e:
+            reporter.error(f"Error processing files: {str(e)}")
+
+    results = batch_summary['results'] if batch_summary else []
+    processed_count = sum(1 for r in results if r['success'])
+    failed_count = total_files - processed_count
+
+    # Complete processing job in MongoDB
+    if job_id and db_connected:
+        if batch_summary:
+            db_manager.update_processing_job(job_id, {
+                'timings': {
+                    'workers': batch_summary['workers'],
+                    'template_seconds': batch_summary['template_seconds'],
+                    'total_seconds': batch_summary['total_seconds'],
+                    'cached_files': batch_summary['cached_files'],
+                    'files': [
+                        {'input': r['input_name'], 'seconds': r['seconds'], 'cached': r['cached']}
+                        for r in results
+                    ]
+                }
+            })
+
+        db_manager.complete_processing_job(
+            job_id=job_id,
+            processed_count=processed_count,
+            failed_count=failed_count,
+            output_files=[r['output_name'] for r in results if r['success']]
+        )
+
+        # Update the daily/weekly analytics rollups
+        db_manager.record_job_analytics('completed', processed_count, failed_count)
+
+        db_manager.log_action(
+            'processing_completed',
+            {
+                'job_id': job_id,
+                'processed': processed_count,
+                'failed': failed_count
+            },
+            session_id
+        )
+
+    job_summary = {
+        'job_id': job_id,
+        'total_files': total_files,
+        'processed_files': processed_count,
+        'failed_files': failed_count,
+        'cached_files': batch_summary['cached_files'] if batch_summary else 0,
+        'workers': batch_summary['workers'] if batch_summary else 0,
+        'template_seconds': batch_summary['template_seconds'] if batch_summary else 0.0,
+        'total_seconds': batch_summary['total_seconds'] if batch_summary else 0.0,
+        'results': results
+    }
+
+    reporter.event('job_completed', **{k: v for k, v in job_summary.items() if k != 'results'})
+    return job_summary
@@ -3,29 +3,65 @@ MongoDB Utility Module for 990 PY Manager
 Handles all database operations including connection, CRUD operations, and analytics
 """
 
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError, DuplicateKeyError
+from gridfs import GridFSBucket
+from gridfs.errors import FileExists, NoFile
 from datetime import datetime, timedelta
-import streamlit as st
-from typing import Optional, Dict, List, Any
+from config import config
+from reporting import ProgressReporter, StreamlitReporter
+from typing import Optional, Dict, List, Tuple, Union, BinaryIO
 import os
+import io
 from bson import ObjectId
 import hashlib
 
 
+# Read size for streamed hashing and GridFS uploads
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def calculate_file_hash(source: Union[bytes, BinaryIO]) -> Tuple[str, int]:
+    """
+    Calculate the SHA256 hash of file content without holding a second copy
+
+    Args:
+        source: Bytes or a seekable binary file object (read in chunks and
+            rewound afterwards)
+
+    Returns:
+        Tuple of (hex digest, size in bytes)
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest(), len(source)
+    
+    digest = hashlib.sha256()
+    size = 0
+    source.seek(0)
+    for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    source.seek(0)
+    return digest.hexdigest(), size
+
+
 class MongoDBManager:
     """Manager class for MongoDB operations"""
     
-    def __init__(self, connection_string: Optional[str] = None):
+    def __init__(self, connection_string: Optional[str] = None,
+                 reporter: Optional[ProgressReporter] = None):
         """
         Initialize MongoDB connection
         
         Args:
             connection_string: MongoDB connection string (defaults to env variable)
+            reporter: Where warnings/errors go (defaults to the Streamlit page)
         """
+        self.reporter = reporter or StreamlitReporter()
         self.connection_string = connection_string or os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
         self.client = None
         self.db = None
+        self.file_bucket = None
         self.connected = False
         
         # Collection names
@@ -33,7 +69,12 @@ class MongoDBManager:
         self.FILE_METADATA = 'file_metadata'
         self.USER_SESSIONS = 'user_sessions'
         self.ANALYTICS = 'analytics'
+        self.ANALYTICS_ROLLUPS = 'analytics_rollups'
         self.AUDIT_LOGS = 'audit_logs'
+        self.OUTPUT_MEMO = 'output_memo'
+        
+        # GridFS bucket for file content, keyed by SHA256
+        self.FILE_STORE = 'file_store'
     
     def connect(self, db_name: str = '990_py_manager_db') -> bool:
         """
@@ -54,15 +95,17 @@ class MongoDBManager:
             # Test connection
             self.client.admin.command('ping')
             self.db = self.client[db_name]
+            self.file_bucket = GridFSBucket(self.db, bucket_name=self.FILE_STORE)
             self.connected = True
             self._create_indexes()
+            self._backfill_analytics_rollups()
             return True
         except (ConnectionFailure, ServerSelectionTimeoutError) as e:
-            st.warning(f"Could not connect to MongoDB: {str(e)}")
+            self.reporter.warning(f"Could not connect to MongoDB: {str(e)}")
             self.connected = False
             return False
         except Exception as e:
-            st.error(f"Unexpected error connecting to MongoDB: {str(e)}")
+            self.reporter.error(f"Unexpected error connecting to MongoDB: {str(e)}")
             self.connected = False
             return False
     
@@ -81,20 +124,74 @@ class MongoDBManager:
             self.db[self.FILE_METADATA].create_index([('file_hash', ASCENDING)], unique=True)
             self.db[self.FILE_METADATA].create_index([('upload_date', DESCENDING)])
             
-            # User sessions indexes
+            # Output memo: one cached output per (input, template, processor version)
+            self.db[self.OUTPUT_MEMO].create_index(
+                [('input_hash', ASCENDING), ('template_hash', ASCENDING), ('processor_version', ASCENDING)],
+                unique=True
+            )
+            
+            # User sessions indexes (idle sessions expire via TTL)
             self.db[self.USER_SESSIONS].create_index([('session_id', ASCENDING)], unique=True)
             self.db[self.USER_SESSIONS].create_index([('created_at', DESCENDING)])
+            self._ensure_ttl_index(self.USER_SESSIONS, 'last_activity', config.SESSION_RETENTION_DAYS)
             
             # Analytics indexes
             self.db[self.ANALYTICS].create_index([('date', DESCENDING)])
             self.db[self.ANALYTICS].create_index([('metric_type', ASCENDING)])
             
-            # Audit logs indexes
-            self.db[self.AUDIT_LOGS].create_index([('timestamp', DESCENDING)])
+            # Analytics rollups: one document per (period, bucket start)
+            self.db[self.ANALYTICS_ROLLUPS].create_index(
+                [('period', ASCENDING), ('bucket_start', DESCENDING)],
+                unique=True
+            )
+            
+            # Audit logs indexes (old entries expire via TTL)
+            self._ensure_ttl_index(self.AUDIT_LOGS, 'timestamp', config.AUDIT_LOG_RETENTION_DAYS)
             self.db[self.AUDIT_LOGS].create_index([('action', ASCENDING)])
             
         except Exception as e:
-            st.warning(f"Could not create indexes: {str(e)}")
+            self.reporter.warning(f"Could not create indexes: {str(e)}")
+    
+    def _backfill_analytics_rollups(self):
+        """Build the analytics rollups from job history when the collection is still empty"""
+        try:
+            if self.db[self.ANALYTICS_ROLLUPS].find_one({}, {'_id': 1}) is None:
+                self.rebuild_analytics_rollups()
+        except Exception as e:
+            self.reporter.warning(f"Could not backfill analytics rollups: {str(e)}")
+    
+    def _ensure_ttl_index(self, collection: str, field: str, retention_days: int):
+        """
+        Keep a descending index on a date field, expiring documents after N days
+        
+        An existing plain or differently-timed index on the same field is
+        converted in place, so upgrading deployments don't need a migration.
+        
+        Args:
+            collection: Collection name
+            field: Date field the TTL is measured from
+            retention_days: Days to keep documents (0 = plain index, no expiry)
+        """
+        keys = [(field, DESCENDING)]
+        index_name = f"{field}_-1"
+        expire_seconds = retention_days * 86400 if retention_days > 0 else None
+        
+        existing = self.db[collection].index_information().get(index_name)
+        if existing is not None:
+            current_seconds = existing.get('expireAfterSeconds')
+            if current_seconds == expire_seconds:
+                return
+            if current_seconds is not None and expire_seconds is not None:
+                # Only the expiry changed: update it without rebuilding the index
+                self.db.command('collMod', collection,
+                                index={'keyPattern': {field: -1}, 'expireAfterSeconds': expire_seconds})
+                return
+            self.db[collection].drop_index(index_name)
+        
+        if expire_seconds is None:
+            self.db[collection].create_index(keys)
+        else:
+            self.db[collection].create_index(keys, expireAfterSeconds=expire_seconds)
     
     def disconnect(self):
         """Close MongoDB connection"""
@@ -143,7 +240,7 @@ class MongoDBManager:
             result = self.db[self.PROCESSING_JOBS].insert_one(job_doc)
             return str(result.inserted_id)
         except Exception as e:
-            st.warning(f"Could not create processing job: {str(e)}")
+            self.reporter.warning(f"Could not create processing job: {str(e)}")
             return None
     
     def update_processing_job(self, job_id: str, updates: Dict) -> bool:
@@ -168,7 +265,7 @@ class MongoDBManager:
             )
             return result.modified_count > 0
         except Exception as e:
-            st.warning(f"Could not update processing job: {str(e)}")
+            self.reporter.warning(f"Could not update processing job: {str(e)}")
             return False
     
     def complete_processing_job(self, job_id: str, processed_count: int, 
@@ -210,7 +307,7 @@ class MongoDBManager:
         try:
             return self.db[self.PROCESSING_JOBS].find_one({'_id': ObjectId(job_id)})
         except Exception as e:
-            st.warning(f"Could not get processing job: {str(e)}")
+            self.reporter.warning(f"Could not get processing job: {str(e)}")
             return None
     
     def get_recent_jobs(self, limit: int = 10, session_id: Optional[str] = None) -> List[Dict]:
@@ -232,17 +329,18 @@ class MongoDBManager:
             jobs = self.db[self.PROCESSING_JOBS].find(query).sort('created_at', DESCENDING).limit(limit)
             return list(jobs)
         except Exception as e:
-            st.warning(f"Could not get recent jobs: {str(e)}")
+            self.reporter.warning(f"Could not get recent jobs: {str(e)}")
             return []
     
     # ==================== FILE METADATA ====================
     
     def _calculate_file_hash(self, file_content: bytes) -> str:
         """Calculate SHA256 hash of file content"""
-        return hashlib.sha256(file_content).hexdigest()
+        return calculate_file_hash(file_content)[0]
     
     def store_file_metadata(self, filename: str, file_content: bytes, 
-                          file_type: str, metadata: Optional[Dict] = None) -> Optional[str]:
+                          file_type: str, metadata: Optional[Dict] = None,
+                          file_hash: Optional[str] = None) -> Optional[str]:
         """
         Store file metadata (not the actual file, just metadata)
         
@@ -251,6 +349,7 @@ class MongoDBManager:
             file_content: File content (for hash calculation)
             file_type: Type of file (input/template/output)
             metadata: Additional metadata
+            file_hash: Precomputed SHA256 of the content (skips re-hashing)
             
         Returns:
             str: File metadata ID if successful
@@ -259,11 +358,13 @@ class MongoDBManager:
             return None
         
         try:
-            file_hash = self._calculate_file_hash(file_content)
-            file_size = len(file_content)
+            if file_hash:
+                file_size = len(file_content)
+            else:
+                file_hash, file_size = calculate_file_hash(file_content)
             
             # Check if file already exists
-            existing = self.db[self.FILE_METADATA].find_one({'file_hash': file_hash})
+            existing = self.db[self.FILE_METADATA].find_one({'file_hash': file_hash}, {'_id': 1})
             if existing:
                 return str(existing['_id'])
             
@@ -276,12 +377,185 @@ class MongoDBManager:
                 'metadata': metadata or {}
             }
             
-            result = self.db[self.FILE_METADATA].insert_one(file_doc)
-            return str(result.inserted_id)
+            try:
+                result = self.db[self.FILE_METADATA].insert_one(file_doc)
+                return str(result.inserted_id)
+            except DuplicateKeyError:
+                # Same content stored concurrently; the unique index keeps one copy
+                existing = self.db[self.FILE_METADATA].find_one({'file_hash': file_hash}, {'_id': 1})
+                return str(existing['_id']) if existing else None
+        except Exception as e:
+            self.reporter.warning(f"Could not store file metadata: {str(e)}")
+            return None
+    
+    def store_file(self, filename: str, file_content: Union[bytes, BinaryIO],
+                   file_type: str, metadata: Optional[Dict] = None,
+                   file_hash: Optional[str] = None) -> Optional[str]:
+        """
+        Store file content in GridFS, content-addressed by SHA256
+        
+        The hash is looked up first, so content that is already stored is
+        never uploaded again. The GridFS file ID is the hash itself.
+        
+        Args:
+            filename: Name of the file
+            file_content: Bytes or seekable binary file object
+            file_type: Type of file (input/template/output)
+            metadata: Additional metadata (recorded on first store only)
+            file_hash: Precomputed SHA256 of the content (skips re-hashing)
+            
+        Returns:
+            str: File hash if successful, None otherwise
+        """
+        if not self.connected:
+            return None
+        
+        try:
+            source = io.BytesIO(file_content) if isinstance(file_content, (bytes, bytearray)) else file_content
+            if file_hash:
+                source.seek(0, io.SEEK_END)
+                file_size = source.tell()
+            else:
+                file_hash, file_size = calculate_file_hash(source)
+            
+            existing = self.db[self.FILE_METADATA].find_one({'file_hash': file_hash}, {'content_stored': 1})
+            if existing and existing.get('content_stored'):
+                return file_hash
+            
+            source.seek(0)
+            try:
+                self.file_bucket.upload_from_stream_with_id(
+                    file_hash, filename, source,
+                    chunk_size_bytes=HASH_CHUNK_SIZE,
+                    metadata={'file_type': file_type}
+                )
+            except (FileExists, DuplicateKeyError):
+                pass  # Content already in the bucket (concurrent store)
+            finally:
+                source.seek(0)
+            
+            now = datetime.utcnow()
+            try:
+                self.db[self.FILE_METADATA].update_one(
+                    {'file_hash': file_hash},
+                    {
+                        '$set': {'content_stored': True, 'gridfs_id': file_hash},
+                        '$setOnInsert': {
+                            'filename': filename,
+                            'file_size': file_size,
+                            'file_type': file_type,
+                            'upload_date': now,
+                            'metadata': metadata or {}
+                        }
+                    },
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                # Lost an upsert race on the unique file_hash index; the winner's document stands
+                self.db[self.FILE_METADATA].update_one(
+                    {'file_hash': file_hash},
+                    {'$set': {'content_stored': True, 'gridfs_id': file_hash}}
+                )
+            
+            return file_hash
+        except Exception as e:
+            self.reporter.warning(f"Could not store file: {str(e)}")
+            return None
+    
+    def get_file_content(self, file_hash: str) -> Optional[bytes]:
+        """Get stored file content by its SHA256 hash"""
+        if not self.connected:
+            return None
+        
+        try:
+            return self.file_bucket.open_download_stream(file_hash).read()
+        except NoFile:
+            return None
+        except Exception as e:
+            self.reporter.warning(f"Could not read stored file: {str(e)}")
+            return None
+    
+    # ==================== OUTPUT MEMO ====================
+    
+    def get_memoized_output(self, input_hash: str, template_hash: str,
+                            processor_version: str) -> Optional[Dict]:
+        """
+        Look up a previously produced output for the same input, template and processor
+        
+        Args:
+            input_hash: SHA256 of the input workbook
+            template_hash: SHA256 of the template workbook
+            processor_version: ExcelProcessor version that produced the output
+            
+        Returns:
+            Dictionary with 'output_hash' and 'content', or None; the output
+            name is derived from the current input name by the caller
+        """
+        if not self.connected:
+            return None
+        
+        try:
+            memo_key = {
+                'input_hash': input_hash,
+                'template_hash': template_hash,
+                'processor_version': processor_version
+            }
+            memo = self.db[self.OUTPUT_MEMO].find_one_and_update(
+                memo_key,
+                {'$inc': {'hits': 1}, '$set': {'last_used_at': datetime.utcnow()}}
+            )
+            if not memo:
+                return None
+            
+            content = self.get_file_content(memo['output_hash'])
+            if content is None:
+                # Stored output is gone; drop the stale memo so it is rebuilt
+                self.db[self.OUTPUT_MEMO].delete_one(memo_key)
+                return None
+            
+            return {
+                'output_hash': memo['output_hash'],
+                'content': content
+            }
         except Exception as e:
-            st.warning(f"Could not store file metadata: {str(e)}")
+            self.reporter.warning(f"Could not read output memo: {str(e)}")
             return None
     
+    def memoize_output(self, input_hash: str, template_hash: str, processor_version: str,
+                       output_hash: str) -> bool:
+        """
+        Record the stored output produced for an input/template/processor combination
+        
+        Returns:
+            bool: True if successful
+        """
+        if not self.connected:
+            return False
+        
+        try:
+            now = datetime.utcnow()
+            self.db[self.OUTPUT_MEMO].update_one(
+                {
+                    'input_hash': input_hash,
+                    'template_hash': template_hash,
+                    'processor_version': processor_version
+                },
+                {
+                    '$set': {
+                        'output_hash': output_hash,
+                        'last_used_at': now
+                    },
+                    '$setOnInsert': {'created_at': now, 'hits': 0}
+                },
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return True  # Memoized concurrently by another job
+        except Exception as e:
+            self.reporter.warning(f"Could not store output memo: {str(e)}")
+            return False
+    
     def get_file_metadata(self, file_id: str) -> Optional[Dict]:
         """Get file metadata by ID"""
         if not self.connected:
@@ -290,7 +564,7 @@ class MongoDBManager:
         try:
             return self.db[self.FILE_METADATA].find_one({'_id': ObjectId(file_id)})
         except Exception as e:
-            st.warning(f"Could not get file metadata: {str(e)}")
+            self.reporter.warning(f"Could not get file metadata: {str(e)}")
             return None
     
     # ==================== USER SESSIONS ====================
@@ -327,7 +601,7 @@ class MongoDBManager:
             )
             return True
         except Exception as e:
-            st.warning(f"Could not create/update session: {str(e)}")
+            self.reporter.warning(f"Could not create/update session: {str(e)}")
             return False
     
     def get_session(self, session_id: str) -> Optional[Dict]:
@@ -338,44 +612,94 @@ class MongoDBManager:
         try:
             return self.db[self.USER_SESSIONS].find_one({'session_id': session_id})
         except Exception as e:
-            st.warning(f"Could not get session: {str(e)}")
+            self.reporter.warning(f"Could not get session: {str(e)}")
             return None
     
     # ==================== ANALYTICS ====================
     
-    def update_daily_analytics(self, metric_type: str, value: Any, date: Optional[datetime] = None):
+    @staticmethod
+    def _rollup_buckets(when: datetime) -> List[Tuple[str, datetime]]:
+        """Daily and weekly (Monday) bucket starts that a timestamp falls into"""
+        day = when.replace(hour=0, minute=0, second=0, microsecond=0)
+        week = day - timedelta(days=day.weekday())
+        return [('day', day), ('week', week)]
+    
+    def record_job_analytics(self, status: str, processed_count: int = 0, failed_count: int = 0,
+                             when: Optional[datetime] = None) -> bool:
         """
-        Update daily analytics metrics
+        Add a finished job to the daily and weekly analytics rollups
+        
+        Both buckets are updated with $inc in a single bulk write, so the
+        dashboard can read a handful of counters instead of scanning jobs.
         
         Args:
-            metric_type: Type of metric (e.g., 'files_processed', 'jobs_completed')
-            value: Metric value
-            date: Date for the metric (defaults to today)
+            status: Final job status ('completed' or 'failed')
+            processed_count: Number of successfully processed files
+            failed_count: Number of failed files
+            when: Time the job finished (defaults to now)
+            
+        Returns:
+            bool: True if successful
         """
         if not self.connected:
-            return
+            return False
+        
+        now = datetime.utcnow()
+        total = processed_count + failed_count
+        completed = status == 'completed'
+        
+        increments = {
+            'jobs_total': 1,
+            'jobs_completed': 1 if completed else 0,
+            'jobs_failed': 0 if completed else 1,
+            'files_processed': processed_count if completed else 0,
+            'files_failed': failed_count,
+            # Summed per completed job so the average matches job success_rate
+            'success_rate_sum': round(processed_count / total * 100, 2) if completed and total > 0 else 0
+        }
         
         try:
-            target_date = date or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            self.db[self.ANALYTICS_ROLLUPS].bulk_write([
+                UpdateOne(
+                    {'period': period, 'bucket_start': bucket_start},
+                    {'$inc': increments, '$set': {'updated_at': now}},
+                    upsert=True
+                )
+                for period, bucket_start in self._rollup_buckets(when or now)
+            ], ordered=False)
+            return True
+        except Exception as e:
+            self.reporter.warning(f"Could not update analytics: {str(e)}")
+            return False
+    
+    def get_analytics_rollups(self, period: str = 'day', limit: int = 30) -> List[Dict]:
+        """
+        Get the most recent analytics rollup buckets
+        
+        Args:
+            period: 'day' or 'week'
+            limit: Maximum number of buckets to return
             
-            self.db[self.ANALYTICS].update_one(
-                {
-                    'date': target_date,
-                    'metric_type': metric_type
-                },
-                {
-                    '$inc': {'value': value},
-                    '$set': {'updated_at': datetime.utcnow()}
-                },
-                upsert=True
-            )
+        Returns:
+            List of rollup documents, newest first
+        """
+        if not self.connected:
+            return []
+        
+        try:
+            rollups = self.db[self.ANALYTICS_ROLLUPS].find({'period': period}) \
+                .sort('bucket_start', DESCENDING).limit(limit)
+            return list(rollups)
         except Exception as e:
-            st.warning(f"Could not update analytics: {str(e)}")
+            self.reporter.warning(f"Could not get analytics rollups: {str(e)}")
+            return []
     
     def get_analytics_summary(self, days: int = 30) -> Dict:
         """
         Get analytics summary for the last N days
         
+        Reads at most N+1 daily rollup documents rather than the job history.
+        
         Args:
             days: Number of days to look back
             
@@ -386,46 +710,79 @@ class MongoDBManager:
             return {}
         
         try:
-            start_date = datetime.utcnow() - timedelta(days=days)
-            
-            # Get total jobs
-            total_jobs = self.db[self.PROCESSING_JOBS].count_documents({
-                'created_at': {'$gte': start_date}
-            })
-            
-            # Get completed jobs
-            completed_jobs = self.db[self.PROCESSING_JOBS].count_documents({
-                'created_at': {'$gte': start_date},
-                'status': 'completed'
-            })
-            
-            # Get total files processed
-            pipeline = [
-                {'$match': {'created_at': {'$gte': start_date}, 'status': 'completed'}},
-                {'$group': {'_id': None, 'total': {'$sum': '$processed_files'}}}
-            ]
-            files_result = list(self.db[self.PROCESSING_JOBS].aggregate(pipeline))
-            total_files = files_result[0]['total'] if files_result else 0
-            
-            # Get average success rate
-            avg_pipeline = [
-                {'$match': {'created_at': {'$gte': start_date}, 'status': 'completed'}},
-                {'$group': {'_id': None, 'avg_success_rate': {'$avg': '$success_rate'}}}
-            ]
-            avg_result = list(self.db[self.PROCESSING_JOBS].aggregate(avg_pipeline))
-            avg_success_rate = round(avg_result[0]['avg_success_rate'], 2) if avg_result else 0
+            start_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+            
+            totals = {'jobs_total': 0, 'jobs_completed': 0, 'files_processed': 0, 'success_rate_sum': 0}
+            for bucket in self.db[self.ANALYTICS_ROLLUPS].find(
+                {'period': 'day', 'bucket_start': {'$gte': start_date}},
+                {key: 1 for key in totals}
+            ):
+                for key in totals:
+                    totals[key] += bucket.get(key, 0)
+            
+            completed_jobs = totals['jobs_completed']
+            avg_success_rate = round(totals['success_rate_sum'] / completed_jobs, 2) if completed_jobs else 0
             
             return {
-                'total_jobs': total_jobs,
+                'total_jobs': totals['jobs_total'],
                 'completed_jobs': completed_jobs,
-                'total_files_processed': total_files,
+                'total_files_processed': totals['files_processed'],
                 'average_success_rate': avg_success_rate,
                 'period_days': days
             }
         except Exception as e:
-            st.warning(f"Could not get analytics summary: {str(e)}")
+            self.reporter.warning(f"Could not get analytics summary: {str(e)}")
             return {}
     
+    def rebuild_analytics_rollups(self) -> int:
+        """
+        Recompute the analytics rollups from the processing job history
+        
+        Runs on connect while the rollups are empty (first start after
+        upgrading) and can be rerun to repair the counters; normal runs keep
+        them current through record_job_analytics.
+        
+        Returns:
+            int: Number of jobs counted
+        """
+        if not self.connected:
+            return 0
+        
+        try:
+            buckets = {}
+            jobs = self.db[self.PROCESSING_JOBS].find(
+                {'status': {'$in': ['completed', 'failed']}},
+                {'status': 1, 'created_at': 1, 'completed_at': 1,
+                 'processed_files': 1, 'failed_files': 1, 'success_rate': 1}
+            )
+            job_count = 0
+            for job in jobs:
+                job_count += 1
+                completed = job['status'] == 'completed'
+                for key in self._rollup_buckets(job.get('completed_at') or job['created_at']):
+                    bucket = buckets.setdefault(key, {
+                        'jobs_total': 0, 'jobs_completed': 0, 'jobs_failed': 0,
+                        'files_processed': 0, 'files_failed': 0, 'success_rate_sum': 0
+                    })
+                    bucket['jobs_total'] += 1
+                    bucket['jobs_completed' if completed else 'jobs_failed'] += 1
+                    bucket['files_failed'] += job.get('failed_files', 0) or 0
+                    if completed:
+                        bucket['files_processed'] += job.get('processed_files', 0) or 0
+                        bucket['success_rate_sum'] += job.get('success_rate', 0) or 0
+            
+            now = datetime.utcnow()
+            self.db[self.ANALYTICS_ROLLUPS].delete_many({})
+            if buckets:
+                self.db[self.ANALYTICS_ROLLUPS].insert_many([
+                    {'period': period, 'bucket_start': bucket_start, **counters, 'updated_at': now}
+                    for (period, bucket_start), counters in buckets.items()
+                ])
+            return job_count
+        except Exception as e:
+            self.reporter.warning(f"Could not rebuild analytics rollups: {str(e)}")
+            return 0
+    
     # ==================== AUDIT LOGS ====================
     
     def log_action(self, action: str, details: Optional[Dict] = None, 
@@ -451,7 +808,7 @@ class MongoDBManager:
             
             self.db[self.AUDIT_LOGS].insert_one(log_doc)
         except Exception as e:
-            st.warning(f"Could not log action: {str(e)}")
+            self.reporter.warning(f"Could not log action: {str(e)}")
     
     def get_recent_logs(self, limit: int = 50, action_filter: Optional[str] = None) -> List[Dict]:
         """
@@ -472,7 +829,7 @@ class MongoDBManager:
             logs = self.db[self.AUDIT_LOGS].find(query).sort('timestamp', DESCENDING).limit(limit)
             return list(logs)
         except Exception as e:
-            st.warning(f"Could not get recent logs: {str(e)}")
+            self.reporter.warning(f"Could not get recent logs: {str(e)}")
             return []
 
 
@@ -0,0 +1,127 @@
+"""
+Progress Reporting Module for 990 PY Manager
+Decouples processing code from Streamlit so it can also run headless
+"""
+
+import json
+import sys
+from datetime import datetime
+from typing import List, Optional, TextIO, Tuple
+
+
+class ProgressReporter:
+    """Base reporter: receives messages, progress and events and ignores them"""
+
+    def info(self, message: str):
+        pass
+
+    def success(self, message: str):
+        pass
+
+    def warning(self, message: str):
+        pass
+
+    def error(self, message: str):
+        pass
+
+    def progress(self, completed: int, total: int, message: str = ''):
+        pass
+
+    def event(self, name: str, **fields):
+        """Structured event (job_started, file_completed, job_completed, ...)"""
+        pass
+
+
+class StreamlitReporter(ProgressReporter):
+    """Report to the Streamlit page (messages, plus an optional progress bar)"""
+
+    def __init__(self, show_progress: bool = False):
+        """
+        Initialize Streamlit reporter
+
+        Args:
+            show_progress: Create a progress bar and status line on the page
+        """
+        import streamlit as st
+        self.st = st
+        self.progress_bar = st.progress(0) if show_progress else None
+        self.status_text = st.empty() if show_progress else None
+
+    def info(self, message: str):
+        self.st.info(message)
+
+    def success(self, message: str):
+        self.st.success(message)
+
+    def warning(self, message: str):
+        self.st.warning(message)
+
+    def error(self, message: str):
+        self.st.error(message)
+
+    def progress(self, completed: int, total: int, message: str = ''):
+        if self.progress_bar is not None:
+            self.progress_bar.progress(completed / total if total else 1.0)
+        if self.status_text is not None and message:
+            self.status_text.text(message)
+
+
+class CollectingReporter(ProgressReporter):
+    """Keep messages in memory, e.g. inside a worker process, to replay later"""
+
+    def __init__(self):
+        self.messages: List[Tuple[str, str]] = []
+
+    def info(self, message: str):
+        self.messages.append(('info', message))
+
+    def success(self, message: str):
+        self.messages.append(('success', message))
+
+    def warning(self, message: str):
+        self.messages.append(('warning', message))
+
+    def error(self, message: str):
+        self.messages.append(('error', message))
+
+
+def replay_messages(messages: List[Tuple[str, str]], reporter: ProgressReporter):
+    """Send (level, message) pairs collected elsewhere to a reporter"""
+    for level, message in messages or []:
+        getattr(reporter, level)(message)
+
+
+class JsonLinesReporter(ProgressReporter):
+    """Write every message, progress update and event as one JSON line"""
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        """
+        Initialize JSON lines reporter
+
+        Args:
+            stream: Text stream to write to (defaults to stdout)
+        """
+        self.stream = stream or sys.stdout
+
+    def _write(self, record: dict):
+        record = {'timestamp': datetime.utcnow().isoformat(), **record}
+        self.stream.write(json.dumps(record, default=str) + '\n')
+        self.stream.flush()
+
+    def info(self, message: str):
+        self._write({'type': 'message', 'level': 'info', 'message': message})
+
+    def success(self, message: str):
+        self._write({'type': 'message', 'level': 'success', 'message': message})
+
+    def warning(self, message: str):
+        self._write({'type': 'message', 'level': 'warning', 'message': message})
+
+    def error(self, message: str):
+        self._write({'type': 'message', 'level': 'error', 'message': message})
+
+    def progress(self, completed: int, total: int, message: str = ''):
+        self._write({'type': 'progress', 'completed': completed, 'total': total, 'message': message})
+
+    def event(self, name: str, **fields):
+        self._write({'type': 'event', 'event': name, **fields})
@@ -4,7 +4,9 @@ from flask import Flask, request, jsonify, render_template, send_from_directory,
 from werkzeug.utils import secure_filename
 from werkzeug.middleware.proxy_fix import ProxyFix
 import json
-from capex_analyzer import CapExAnalyzer
+from capex_engine import CapExAnalyzer, StageCache
+from ledger_cache import LedgerCache, file_sha256, run_key
+from narrative_service import create_narrative_service
 from flask_pymongo import PyMongo
 from datetime import datetime
 import time
@@ -26,6 +28,19 @@ UPLOAD_FOLDER = './uploads'
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls', 'pdf', 'txt'}
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
 
+# PDF ledgers: page limit (0 = all pages) and table mode ('first', 'continued' or 'all')
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", "0")) or None
+PDF_TABLE_MODE = os.environ.get("PDF_TABLE_MODE", "first")
+
+# Parquet snapshots of parsed ledgers, reused while the upload content is unchanged
+LEDGER_CACHE_FOLDER = os.environ.get("LEDGER_CACHE_FOLDER", "./cache/ledgers")
+
+# Model responses keyed by prompt hash
+NARRATIVE_CACHE_FOLDER = os.environ.get("NARRATIVE_CACHE_FOLDER", "./cache/narratives")
+
+# Analysis stage outputs kept in memory, so reruns only redo stages whose parameters changed
+STAGE_CACHE_ENTRIES = int(os.environ.get("STAGE_CACHE_ENTRIES", "16"))
+
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
@@ -45,6 +60,60 @@ def get_files_collection():
 def get_results_collection():
     return mongo.db.analysis_results
 
+def get_ledger_cache_collection():
+    return mongo.db.ledger_cache
+
+# Parsed ledgers are shared by every run; the Mongo index records what each snapshot holds
+ledger_cache = LedgerCache(LEDGER_CACHE_FOLDER, get_ledger_cache_collection())
+stage_cache = StageCache(STAGE_CACHE_ENTRIES)
+
+# Memo polishing and test narratives run in the background after each analysis
+narrative_service = create_narrative_service(NARRATIVE_CACHE_FOLDER)
+
+def artifact_hashes(filenames):
+    """Content hash of each artifact currently in the upload folder"""
+    hashes = []
+    for filename in filenames:
+        file_path = os.path.join(UPLOAD_FOLDER, filename)
+        if os.path.exists(file_path):
+            hashes.append({'filename': filename, 'sha256': file_sha256(file_path)})
+    return hashes
+
+def start_narrative(analyzer, result_id):
+    """Generate narratives in the background and attach them to the stored result"""
+    def attach(narrative):
+        try:
+            # Written beside the run's artifacts rather than over the draft memo,
+            # which a newer /analyze run may already have replaced
+            polished_memo = f"CapEx_Summary_Memo_{result_id}.md"
+            update = {'narrative': narrative, 'narrative_status': 'completed'}
+            if analyzer.apply_narrative(narrative, polished_memo):
+                update['polished_memo'] = polished_memo
+            get_results_collection().update_one({'_id': result_id}, {'$set': update})
+            logging.info(f"Narrative attached to analysis result {result_id}")
+        except Exception as e:
+            logging.error(f"Narrative attach failed for analysis result {result_id}: {str(e)}")
+            get_results_collection().update_one({'_id': result_id}, {'$set': {'narrative_status': 'failed'}})
+    
+    requests = analyzer.narrative_requests()
+    if not requests or not narrative_service.is_available():
+        return None
+    
+    get_results_collection().update_one({'_id': result_id}, {'$set': {'narrative_status': 'pending'}})
+    narrative_service.start(requests, attach)
+    return 'pending'
+
+def find_reusable_result(key):
+    """Stored result for the same inputs and parameters whose artifacts are still on disk"""
+    stored = get_results_collection().find_one({'run_key': key, 'success': True}, sort=[('run_date', -1)])
+    if not stored or not stored.get('artifact_hashes'):
+        return None
+    
+    # Artifacts are overwritten by every run, so they must still be this run's output
+    if artifact_hashes(stored.get('files_created', [])) != stored['artifact_hashes']:
+        return None
+    return stored
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -140,35 +209,58 @@ def analyze_capex():
         isi_level = float(data.get('isi_level', 10000))
         coverage_target = float(data.get('coverage_target', 0.75))
         materiality = float(data.get('materiality', 50000))
+        sampling_method = data.get('sampling_method', 'coverage')
         
         logging.info(f"Starting analysis with threshold: {cap_threshold}, ISI: {isi_level}")
         
+        parameters = {
+            'cap_threshold': cap_threshold,
+            'isi_level': isi_level,
+            'coverage_target': coverage_target,
+            'materiality': materiality,
+            'sampling_method': sampling_method,
+            'pdf_max_pages': PDF_MAX_PAGES,
+            'pdf_table_mode': PDF_TABLE_MODE
+        }
+        
         # Initialize analyzer
         analyzer = CapExAnalyzer(
             upload_folder=UPLOAD_FOLDER,
             cap_threshold=cap_threshold,
             isi_level=isi_level,
             coverage_target=coverage_target,
-            materiality=materiality
+            materiality=materiality,
+            sampling_method=sampling_method,
+            pdf_max_pages=PDF_MAX_PAGES,
+            pdf_table_mode=PDF_TABLE_MODE,
+            ledger_cache=ledger_cache,
+            stage_cache=stage_cache
         )
         
+        # Identical inputs and parameters: reuse the stored result
+        key = run_key(analyzer.input_fingerprint(), parameters)
+        stored = find_reusable_result(key)
+        if stored:
+            logging.info(f"Reusing analysis result {stored['_id']} for identical inputs and parameters")
+            stored['result_id'] = str(stored.pop('_id'))
+            stored['reused'] = True
+            return jsonify(stored)
+        
         # Run the analysis pipeline
         result = analyzer.run_analysis()
         
         if result['success']:
             # Save the successful result to MongoDB
             result['run_date'] = datetime.utcnow()
-            result['parameters'] = {
-                'cap_threshold': cap_threshold,
-                'isi_level': isi_level,
-                'coverage_target': coverage_target,
-                'materiality': materiality
-            }
+            result['parameters'] = parameters
+            result['run_key'] = key
+            result['artifact_hashes'] = artifact_hashes(result['files_created'])
             
             # Convert any non-serializable objects
             result_copy = result.copy()
             inserted_result = get_results_collection().insert_one(result_copy)
             result['result_id'] = str(inserted_result.inserted_id)
+            result['narrative_status'] = start_narrative(analyzer, inserted_result.inserted_id)
             
             # Update file status in MongoDB
             files_collection = get_files_collection()
@@ -207,7 +299,10 @@ def view_result(result_id):
                              summary=result.get('summary'),
                              metrics=result.get('metrics'),
                              files_created=result.get('files_created', []),
-                             open_requests=result.get('open_requests', []))
+                             open_requests=result.get('open_requests', []),
+                             narrative=result.get('narrative'),
+                             narrative_status=result.get('narrative_status'),
+                             polished_memo=result.get('polished_memo'))
     except Exception as e:
         logging.error(f"Error viewing result: {str(e)}")
         flash('Error loading result', 'error')
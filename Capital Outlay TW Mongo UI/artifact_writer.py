@@ -0,0 +1,62 @@
+"""
+Artifact Writer - Single-pass formatted Excel workbooks
+Writes each workbook once with xlsxwriter, header styling and column widths included
+"""
+
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple, TypeVar, Union
+
+import pandas as pd
+
+# Same look the openpyxl formatting pass used to apply
+HEADER_FORMAT = {
+    'bold': True,
+    'font_color': '#FFFFFF',
+    'bg_color': '#366092',
+    'align': 'center'
+}
+MAX_COLUMN_WIDTH = 50
+
+# Rows per worksheet (header included) in .xlsx
+EXCEL_MAX_ROWS = 1048576
+
+T = TypeVar('T')
+
+
+def column_widths(frame: pd.DataFrame) -> List[int]:
+    """Width per column: longest header or value as text, plus padding, capped"""
+    widths = []
+    for position, name in enumerate(frame.columns):
+        lengths = frame.iloc[:, position].astype(str).str.len().fillna(0)
+        longest = int(lengths.max()) if len(lengths) else 0
+        widths.append(min(max(len(str(name)), longest) + 2, MAX_COLUMN_WIDTH))
+    return widths
+
+
+def write_workbook(filename: Union[str, Path], sheets: List[Tuple[str, pd.DataFrame]]):
+    """
+    Write one or more DataFrames to a formatted workbook in a single pass
+
+    Args:
+        filename: Output .xlsx path
+        sheets: (sheet name, frame) pairs; frames are written without their
+            index, so reset_index() summaries that should keep it
+    """
+    with pd.ExcelWriter(filename, engine='xlsxwriter') as writer:
+        header_format = writer.book.add_format(HEADER_FORMAT)
+
+        for sheet_name, frame in sheets:
+            frame.to_excel(writer, sheet_name=sheet_name, index=False, header=False, startrow=1)
+
+            worksheet = writer.sheets.get(sheet_name) or writer.book.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, [str(name) for name in frame.columns], header_format)
+            for position, width in enumerate(column_widths(frame)):
+                worksheet.set_column(position, position, width)
+
+
+def timed(func: Callable[[], T]) -> Tuple[T, float]:
+    """Call func and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = func()
+    return result, round(time.perf_counter() - start, 3)
@@ -0,0 +1,1103 @@
+"""
+Capital Addition Analysis Engine
+Stage-based CapEx pipeline shared by the UI app and the /api/v1/execute service
+"""
+
+import os
+import time
+import hashlib
+import pandas as pd
+import numpy as np
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from artifact_writer import EXCEL_MAX_ROWS, write_workbook, timed
+from ledger_cache import LedgerCache, file_sha256
+from pdf_tables import read_pdf_table, extract_pdf_tables, combine_tables
+from sampling import SAMPLING_METHODS, select_coverage_samples, select_mus_samples
+import json
+from typing import Dict, List, Optional, Any
+from gemini_integration import memo_prompt, summarize_test_results, test_narrative_prompt
+from narrative_service import NarrativeRequest, describe_test_results
+
+# Extensions _read_file can parse
+READABLE_EXTENSIONS = ('.csv', '.xlsx', '.xls', '.pdf', '.txt')
+
+# Threads used to write artifacts concurrently
+ARTIFACT_WORKERS = 4
+
+# Pipeline stages, in order; each one only reads what earlier stages produced
+STAGES = ('ingest', 'population', 'classify', 'sample', 'testwork', 'artifacts')
+
+# Analyzer attributes each stage produces (what the stage cache stores)
+STAGE_OUTPUTS = {
+    'ingest': ('gl_data', 'tb_data'),
+    'population': ('gl_data', 'population'),
+    'classify': ('population',),
+    'sample': ('sample_selection',),
+    'testwork': ('pbc_requests', 'test_results', 'exceptions', 'proposed_ajes'),
+    'artifacts': ('files_created', 'artifact_timings', 'memo_content')
+}
+
+# Parameters each stage reads, on top of the outputs of earlier stages
+STAGE_PARAMETERS = {
+    'ingest': ('pdf_max_pages', 'pdf_table_mode'),
+    'population': ('cap_threshold', 'isi_level'),
+    'classify': ('isi_level',),
+    'sample': ('coverage_target', 'materiality', 'sampling_method', 'max_additional_samples',
+               'mus_confidence_factor', 'random_seed'),
+    'testwork': ('cap_threshold', 'isi_level'),
+    'artifacts': ()
+}
+
+# Artifacts are files on disk, so that stage always runs
+CACHEABLE_STAGES = STAGES[:-1]
+
+# Error reported when a stage fails
+STAGE_ERRORS = {
+    'ingest': 'Data ingestion failed',
+    'population': 'Population building failed'
+}
+
+# Documents requested for every sample
+PBC_REQUIRED_DOCUMENTATION = [
+    'Vendor invoice/receipt',
+    'Purchase order/requisition',
+    'Management approval',
+    'Asset register entry',
+    'Installation/setup documentation'
+]
+
+# Attribute tests performed on every sample: (test name, initial status, comments)
+ATTRIBUTE_TESTS = [
+    ('Proper_Capitalization', 'Not Performed', 'Invoice vouching required'),
+    ('Depreciation_Calculation', 'Not Performed', 'Asset register verification needed'),
+    ('Asset_Register_Trace', 'Not Performed', 'Asset register comparison required'),
+    ('Supporting_Documentation', 'Not Performed', 'Documentation review pending'),
+    ('Disposal_Authorization', 'N/A', 'No disposals identified'),
+    ('GL_Reconciliation', 'Not Performed', 'GL to asset register reconciliation needed')
+]
+
+# Most samples whose attribute tests (one row per sample and test, plus the
+# header) still fit on one worksheet
+MAX_WORKPAPER_SAMPLES = (EXCEL_MAX_ROWS - 1) // len(ATTRIBUTE_TESTS)
+
+
+def _column_values(frame: pd.DataFrame, column: str, default) -> np.ndarray:
+    """Values of a column, or the default for every row if the column is missing"""
+    if column in frame.columns:
+        return frame[column].to_numpy()
+    return np.full(len(frame), default, dtype=object)
+
+
+class StageCache:
+    """In-memory LRU cache of stage outputs, keyed by stage inputs and parameters (thread-safe)"""
+    
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Copy of the outputs stored under key, or None"""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            outputs = self._entries[key]
+        return _copy_outputs(outputs)
+    
+    def put(self, key: str, outputs: Dict[str, Any]):
+        """Store a copy of a stage's outputs, evicting the least recently used entry"""
+        copied = _copy_outputs(outputs)
+        with self._lock:
+            self._entries[key] = copied
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _copy_outputs(outputs: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy stage outputs so later stages' in-place changes never reach the cache"""
+    copied = {}
+    for name, value in outputs.items():
+        if isinstance(value, pd.DataFrame):
+            copied[name] = value.copy()
+        elif isinstance(value, list):
+            copied[name] = list(value)
+        else:
+            copied[name] = value
+    return copied
+
+
+class CapExAnalyzer:
+    """Capital Addition Sampling & Testwork Agent"""
+    
+    def __init__(self, upload_folder: str, cap_threshold: float = 500, 
+                 isi_level: float = 10000, coverage_target: float = 0.75,
+                 materiality: float = 50000, pdf_max_pages: Optional[int] = None,
+                 pdf_table_mode: str = 'first', sampling_method: str = 'coverage',
+                 max_additional_samples: int = 50, mus_confidence_factor: float = 3.0,
+                 random_seed: Optional[int] = 0, ledger_cache: Optional[LedgerCache] = None,
+                 stage_cache: Optional[StageCache] = None):
+        self.upload_folder = str(upload_folder)
+        self.cap_threshold = cap_threshold
+        self.isi_level = isi_level
+        self.coverage_target = coverage_target
+        self.materiality = materiality
+        
+        # PDF ledgers: pages to scan and which tables to use
+        # ('first' table, 'continued' across pages, or 'all' matching tables)
+        self.pdf_max_pages = pdf_max_pages
+        self.pdf_table_mode = pdf_table_mode
+        
+        # Sampling: 'coverage' (largest items up to the coverage target) or
+        # 'mus' (monetary-unit sampling at materiality / confidence factor)
+        if sampling_method not in SAMPLING_METHODS:
+            raise ValueError(f"Unknown sampling method: {sampling_method}")
+        self.sampling_method = sampling_method
+        self.max_additional_samples = max_additional_samples
+        self.mus_confidence_factor = mus_confidence_factor
+        self.random_seed = random_seed
+        
+        # Parsed ledger snapshots keyed by file content (None = always parse)
+        self.ledger_cache = ledger_cache
+        
+        # Stage outputs keyed by stage inputs and parameters (None = always run)
+        self.stage_cache = stage_cache
+        self.completed_stages = []
+        self.stage_timings = []
+        self.failed_stage = None
+        self._stage_keys = {}
+        self._inputs_injected = False
+        
+        # Initialize data containers
+        self.gl_data = None
+        self.tb_data = None
+        self.policy_data = None
+        self.asset_register = None
+        
+        # Analysis results
+        self.population = None
+        self.sample_selection = None
+        self.pbc_requests = None
+        self.test_results = None
+        self.exceptions = []
+        self.proposed_ajes = []
+        self.artifact_timings = []
+        self.files_created = []
+        self.memo_content = None
+        
+        logging.info(f"CapEx Analyzer initialized with threshold: {cap_threshold}")
+
+    def run_analysis(self) -> Dict:
+        """Execute the complete analysis pipeline"""
+        try:
+            if not self.run_stage('artifacts'):
+                return {'success': False, 'error': STAGE_ERRORS.get(self.failed_stage, 'Analysis failed')}
+            
+            # Generate summary metrics
+            metrics = self._calculate_metrics()
+            metrics['artifact_timings'] = self.artifact_timings
+            metrics['stage_timings'] = self.stage_timings
+            
+            return {
+                'success': True,
+                'summary': self._generate_summary(),
+                'metrics': metrics,
+                'files_created': self.files_created,
+                'open_requests': self._identify_open_requests()
+            }
+            
+        except Exception as e:
+            logging.error(f"Analysis pipeline error: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def run_stage(self, stage: str, inputs: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Run one pipeline stage, first running any earlier stage not yet completed
+        
+        Args:
+            stage: One of STAGES
+            inputs: Outputs of earlier stages to start from (e.g. {'population': frame}
+                for 'sample'); earlier stages are then treated as completed and the
+                stage cache is bypassed
+        
+        Returns:
+            True if the stage (and every stage before it) succeeded
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage: {stage}")
+        
+        position = STAGES.index(stage)
+        if inputs is not None:
+            for name, value in inputs.items():
+                setattr(self, name, value)
+            self.completed_stages = list(STAGES[:position])
+            self._inputs_injected = True
+        
+        for earlier in STAGES[:position]:
+            if earlier not in self.completed_stages and not self.run_stage(earlier):
+                return False
+        
+        start = time.perf_counter()
+        key = self._stage_key(stage)
+        outputs = self.stage_cache.get(key) if key else None
+        
+        if outputs is not None:
+            for name, value in outputs.items():
+                setattr(self, name, value)
+            succeeded = True
+        else:
+            succeeded = self._stage_runners()[stage]()
+            if succeeded and key:
+                self.stage_cache.put(key, {name: getattr(self, name) for name in STAGE_OUTPUTS[stage]})
+        
+        self.stage_timings.append({
+            'stage': stage,
+            'seconds': round(time.perf_counter() - start, 3),
+            'cached': outputs is not None
+        })
+        
+        if not succeeded:
+            self.failed_stage = stage
+            return False
+        
+        if stage not in self.completed_stages:
+            self.completed_stages.append(stage)
+        return True
+
+    def _stage_runners(self) -> Dict:
+        """Stage name -> callable returning whether the stage succeeded"""
+        return {
+            'ingest': self._ingest_data,
+            'population': self._build_population,
+            'classify': lambda: self._classify_transactions() or True,
+            'sample': lambda: self._select_samples() or True,
+            'testwork': self._perform_testwork,
+            'artifacts': self._run_artifacts
+        }
+
+    def _stage_key(self, stage: str) -> Optional[str]:
+        """
+        Cache key for a stage: its parameters chained onto the previous stage's key,
+        starting from the content hashes of the input files
+        """
+        if self.stage_cache is None or stage not in CACHEABLE_STAGES or self._inputs_injected:
+            return None
+        
+        if stage not in self._stage_keys:
+            position = STAGES.index(stage)
+            if position > 0:
+                previous = self._stage_key(STAGES[position - 1])
+            else:
+                # Content only, so the same upload under another name still hits
+                previous = {role: entry['sha256'] for role, entry in self.input_fingerprint().items()}
+            if previous is None:
+                return None
+            
+            payload = json.dumps({
+                'stage': stage,
+                'previous': previous,
+                'parameters': {name: getattr(self, name) for name in STAGE_PARAMETERS[stage]}
+            }, sort_keys=True, default=str)
+            self._stage_keys[stage] = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        
+        return self._stage_keys[stage]
+
+    def _perform_testwork(self) -> bool:
+        """PBC requests, attribute testing and findings for the selected samples"""
+        self._generate_pbc_requests()
+        self._perform_attribute_testing()
+        self._generate_findings()
+        return True
+
+    def _run_artifacts(self) -> bool:
+        """Write the artifact files"""
+        self.files_created = self._produce_artifacts()
+        return True
+
+    def _locate_input_files(self) -> Dict[str, Optional[str]]:
+        """Pick the GL and TB files to ingest from the upload folder"""
+        files = os.listdir(self.upload_folder)
+        
+        # Look for General Ledger data
+        gl_files = [f for f in files if 'gl' in f.lower() or 'general' in f.lower() or 'ledger' in f.lower()]
+        gl_file = gl_files[0] if gl_files and gl_files[0].endswith(READABLE_EXTENSIONS) else None
+        
+        # Look for Trial Balance data
+        tb_files = [f for f in files if 'tb' in f.lower() or 'trial' in f.lower() or 'balance' in f.lower()]
+        tb_file = tb_files[0] if tb_files else None
+        
+        # If no specific GL found, use the largest CSV/Excel file
+        if gl_file is None:
+            excel_files = [f for f in files if f.endswith(('.xlsx', '.xls', '.csv'))]
+            if excel_files:
+                # Sort by file size and take the largest
+                excel_files.sort(key=lambda x: os.path.getsize(os.path.join(self.upload_folder, x)), reverse=True)
+                gl_file = excel_files[0]
+        
+        return {'gl': gl_file, 'tb': tb_file}
+
+    def input_fingerprint(self) -> Dict[str, Dict]:
+        """Filename and content hash of each file the analysis would ingest"""
+        fingerprint = {}
+        for role, filename in self._locate_input_files().items():
+            if filename is None:
+                continue
+            file_path = os.path.join(self.upload_folder, filename)
+            content_hash = (self.ledger_cache.content_hash(file_path) if self.ledger_cache
+                            else file_sha256(file_path))
+            fingerprint[role] = {'filename': filename, 'sha256': content_hash}
+        return fingerprint
+
+    def _ingest_data(self) -> bool:
+        """Ingest and validate uploaded data files"""
+        try:
+            inputs = self._locate_input_files()
+            
+            if inputs['gl']:
+                self.gl_data = self._read_file(inputs['gl'])
+                logging.info(f"Loaded GL data from {inputs['gl']}: {len(self.gl_data)} records")
+            
+            if inputs['tb']:
+                self.tb_data = self._read_file(inputs['tb'])
+                if self.tb_data is not None:
+                    logging.info(f"Loaded TB data: {len(self.tb_data)} records")
+            
+            if self.gl_data is None or len(self.gl_data) == 0:
+                logging.error("No valid GL data found")
+                return False
+            
+            # Standardize column names
+            self._standardize_columns()
+            
+            return True
+            
+        except Exception as e:
+            logging.error(f"Data ingestion error: {str(e)}")
+            return False
+
+    def _read_file(self, filename: str) -> Optional[pd.DataFrame]:
+        """Read a file, reusing its parsed snapshot when the content is unchanged"""
+        if self.ledger_cache is None:
+            return self._parse_file(filename)
+        
+        file_path = os.path.join(self.upload_folder, filename)
+        # PDF parsing depends on the page limit and table mode
+        options = ({'pdf_max_pages': self.pdf_max_pages, 'pdf_table_mode': self.pdf_table_mode}
+                   if filename.endswith('.pdf') else None)
+        
+        data = self.ledger_cache.load(file_path, options)
+        if data is None:
+            data = self._parse_file(filename)
+            if data is not None and len(data) > 0:
+                self.ledger_cache.store(file_path, data, options)
+        return data
+
+    def _parse_file(self, filename: str) -> Optional[pd.DataFrame]:
+        """Read various file formats"""
+        file_path = os.path.join(self.upload_folder, filename)
+        
+        try:
+            if filename.endswith('.csv'):
+                return pd.read_csv(file_path, encoding='utf-8')
+            elif filename.endswith(('.xlsx', '.xls')):
+                return pd.read_excel(file_path)
+            elif filename.endswith('.pdf'):
+                return self._extract_pdf_data(file_path)
+            elif filename.endswith('.txt'):
+                # Try to read as CSV with various delimiters
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                    if '\t' in content:
+                        return pd.read_csv(file_path, sep='\t', encoding='utf-8')
+                    else:
+                        return pd.read_csv(file_path, encoding='utf-8')
+        except Exception as e:
+            logging.error(f"Error reading {filename}: {str(e)}")
+            
+        return pd.DataFrame()
+
+    def _extract_pdf_data(self, file_path: str) -> pd.DataFrame:
+        """Extract tabular data from PDF"""
+        try:
+            if self.pdf_table_mode == 'all':
+                # Full extraction: parse page ranges in parallel
+                table = combine_tables(extract_pdf_tables(file_path, self.pdf_max_pages))
+            else:
+                # Stream pages and stop once the table is found
+                table = read_pdf_table(
+                    file_path, self.pdf_max_pages,
+                    merge_continuations=self.pdf_table_mode == 'continued'
+                )
+            
+            if table and len(table) > 1:
+                return pd.DataFrame(table[1:], columns=table[0])
+        except Exception as e:
+            logging.error(f"PDF extraction error: {str(e)}")
+        
+        return pd.DataFrame()
+
+    def _standardize_columns(self):
+        """Standardize column names for consistent processing"""
+        if self.gl_data is not None:
+            # Common column mappings
+            column_mapping = {
+                'date': ['date', 'transaction_date', 'post_date', 'posting_date'],
+                'amount': ['amount', 'debit', 'credit', 'dr', 'cr', 'value'],
+                'account': ['account', 'account_code', 'gl_account', 'account_number'],
+                'description': ['description', 'desc', 'memo', 'reference', 'narrative'],
+                'document': ['document', 'doc_no', 'doc_number', 'reference', 'voucher'],
+                'vendor': ['vendor', 'supplier', 'payee', 'counterparty']
+            }
+            
+            for standard_name, possible_names in column_mapping.items():
+                for col in self.gl_data.columns:
+                    if col.lower() in [name.lower() for name in possible_names]:
+                        if standard_name not in self.gl_data.columns:
+                            self.gl_data = self.gl_data.rename(columns={col: standard_name})
+                        break
+
+    def _build_population(self) -> bool:
+        """Build and filter the capital addition population"""
+        try:
+            if self.gl_data is None:
+                return False
+            
+            # Ensure amount column exists and is numeric
+            if 'amount' not in self.gl_data.columns:
+                # Look for numeric columns that might be amounts
+                numeric_cols = self.gl_data.select_dtypes(include=[np.number]).columns
+                if len(numeric_cols) > 0:
+                    self.gl_data['amount'] = self.gl_data[numeric_cols[0]]
+                else:
+                    logging.error("No amount column found")
+                    return False
+            
+            # Convert amount to numeric
+            self.gl_data['amount'] = pd.to_numeric(self.gl_data['amount'], errors='coerce')
+            
+            # Filter for capital-related accounts (typically containing keywords)
+            capital_keywords = ['asset', 'equipment', 'building', 'vehicle', 'capital', 'capex', 
+                              'property', 'plant', 'machinery', 'furniture', 'fixture', 'improvement']
+            maintenance_keywords = ['maintenance', 'repair', 'service', 'upkeep']
+            
+            # Create account filter
+            if 'account' in self.gl_data.columns:
+                account_mask = self.gl_data['account'].astype(str).str.lower().str.contains(
+                    '|'.join(capital_keywords + maintenance_keywords), na=False
+                )
+            else:
+                account_mask = pd.Series([True] * len(self.gl_data))
+            
+            # Filter by description if available
+            if 'description' in self.gl_data.columns:
+                desc_mask = self.gl_data['description'].astype(str).str.lower().str.contains(
+                    '|'.join(capital_keywords + maintenance_keywords), na=False
+                )
+                account_mask = account_mask | desc_mask
+            
+            # Apply filters
+            population = self.gl_data[account_mask].copy()
+            
+            # Exclude amounts below threshold (but keep for R&M classification)
+            population = population[abs(population['amount']) >= self.cap_threshold]
+            
+            # Exclude AJEs (adjusting journal entries)
+            if 'document' in population.columns:
+                aje_mask = population['document'].astype(str).str.lower().str.contains(
+                    'aje|adj|adjustment', na=False
+                )
+                population = population[~aje_mask]
+            
+            # Add policy classification fields
+            population['threshold_met'] = abs(population['amount']) >= self.cap_threshold
+            population['isi_item'] = abs(population['amount']) >= self.isi_level
+            population['near_threshold'] = (
+                (abs(population['amount']) >= self.cap_threshold * 0.8) & 
+                (abs(population['amount']) < self.cap_threshold * 1.2)
+            )
+            
+            self.population = population
+            logging.info(f"Built population with {len(population)} items")
+            
+            return True
+            
+        except Exception as e:
+            logging.error(f"Population building error: {str(e)}")
+            return False
+
+    def _classify_transactions(self):
+        """Classify transactions as CapEx vs R&M per policy"""
+        if self.population is None:
+            return
+        
+        try:
+            # Initialize classification
+            self.population['classification'] = 'Undetermined'
+            
+            # Classification rules based on amount and keywords
+            capex_keywords = ['purchase', 'acquisition', 'installation', 'construction', 
+                             'improvement', 'upgrade', 'addition', 'new', 'asset']
+            maintenance_keywords = ['repair', 'maintenance', 'service', 'fix', 'replace', 
+                                  'clean', 'inspect', 'tune']
+            
+            # Apply keyword-based classification
+            if 'description' in self.population.columns:
+                desc_lower = self.population['description'].astype(str).str.lower()
+                
+                capex_mask = desc_lower.str.contains('|'.join(capex_keywords), na=False)
+                maintenance_mask = desc_lower.str.contains('|'.join(maintenance_keywords), na=False)
+                
+                self.population.loc[capex_mask, 'classification'] = 'CapEx'
+                self.population.loc[maintenance_mask, 'classification'] = 'R&M'
+            
+            # Amount-based rules
+            high_value_mask = abs(self.population['amount']) >= self.isi_level
+            self.population.loc[high_value_mask, 'classification'] = 'CapEx'
+            
+            # Default remaining to CapEx if above threshold
+            undetermined_mask = self.population['classification'] == 'Undetermined'
+            self.population.loc[undetermined_mask, 'classification'] = 'CapEx'
+            
+            logging.info(f"Classification complete: {self.population['classification'].value_counts().to_dict()}")
+            
+        except Exception as e:
+            logging.error(f"Classification error: {str(e)}")
+
+    def _select_samples(self):
+        """Select representative samples for testing"""
+        if self.population is None:
+            return
+        
+        try:
+            # Start with ISI items (auto-include)
+            isi_items = self.population[self.population['isi_item'] == True].copy()
+            
+            # Calculate remaining coverage needed
+            total_capex_value = abs(self.population[self.population['classification'] == 'CapEx']['amount']).sum()
+            isi_coverage = abs(isi_items['amount']).sum()
+            target_coverage_value = total_capex_value * self.coverage_target
+            remaining_needed = max(0, target_coverage_value - isi_coverage)
+            
+            # Select additional samples from non-ISI items
+            non_isi_items = self.population[
+                (self.population['isi_item'] == False) &
+                (self.population['classification'] == 'CapEx')
+            ]
+            non_isi_amounts = non_isi_items['amount'].to_numpy()
+            
+            if self.sampling_method == 'mus':
+                # Monetary-unit sampling: interval = tolerable misstatement / confidence factor
+                interval = self.materiality / self.mus_confidence_factor
+                max_samples = max(0, MAX_WORKPAPER_SAMPLES - len(isi_items))
+                positions = select_mus_samples(non_isi_amounts, interval, self.random_seed, max_samples)
+                if np.abs(non_isi_amounts).sum() / interval > max_samples:
+                    logging.warning(f"MUS selection capped at {max_samples} items so the attribute testing "
+                                    f"workpaper stays within Excel's {EXCEL_MAX_ROWS:,} row limit")
+            else:
+                # Largest items first until the coverage target is met
+                positions = select_coverage_samples(non_isi_amounts, remaining_needed, self.max_additional_samples)
+            
+            additional_samples = non_isi_items.iloc[positions] if len(positions) > 0 else pd.DataFrame()
+            
+            # Combine samples
+            self.sample_selection = pd.concat([isi_items, additional_samples], ignore_index=True)
+            
+            # Add sample rationale
+            self.sample_selection['sample_rationale'] = 'MUS Selection' if self.sampling_method == 'mus' else 'Other'
+            self.sample_selection.loc[self.sample_selection['isi_item'] == True, 'sample_rationale'] = 'ISI Item'
+            self.sample_selection.loc[
+                (self.sample_selection['isi_item'] == False) &
+                (abs(self.sample_selection['amount']) >= self.materiality),
+                'sample_rationale'
+            ] = 'High Value'
+            
+            coverage_achieved = abs(self.sample_selection['amount']).sum() / total_capex_value if total_capex_value > 0 else 0
+            
+            logging.info(f"Sample selection ({self.sampling_method}): {len(self.sample_selection)} items, "
+                        f"{coverage_achieved:.1%} coverage")
+            
+        except Exception as e:
+            logging.error(f"Sample selection error: {str(e)}")
+
+    def _generate_pbc_requests(self):
+        """Generate PBC (Prepared by Client) request list"""
+        if self.sample_selection is None:
+            return
+        
+        try:
+            samples = self.sample_selection
+            capex = (samples['classification'] == 'CapEx').to_numpy()
+            isi = (samples['amount'].abs() >= self.isi_level).to_numpy()
+            
+            # Documentation requests depend only on classification and ISI status,
+            # so each row picks one of four precomputed lists
+            capex_requests = 'Useful life determination; Depreciation calculation; Capitalization vs expense justification'
+            additional_requests = np.select(
+                [capex & isi, capex, isi],
+                [capex_requests + '; Board/committee approval', capex_requests, 'Board/committee approval'],
+                default=''
+            )
+            
+            self.pbc_requests = pd.DataFrame({
+                'Item': _column_values(samples, 'description', 'N/A'),
+                'Amount': samples['amount'].to_numpy(),
+                'Date': _column_values(samples, 'date', 'N/A'),
+                'Document_Number': _column_values(samples, 'document', 'N/A'),
+                'Required_Documentation': '; '.join(PBC_REQUIRED_DOCUMENTATION),
+                'Additional_Requests': additional_requests
+            })
+            
+            logging.info(f"Generated PBC requests for {len(self.pbc_requests)} items")
+            
+        except Exception as e:
+            logging.error(f"PBC generation error: {str(e)}")
+
+    def _perform_attribute_testing(self):
+        """Perform attribute testing on selected samples"""
+        if self.sample_selection is None:
+            return
+        
+        try:
+            samples = self.sample_selection
+            sample_count = len(samples)
+            test_count = len(ATTRIBUTE_TESTS)
+            test_names, statuses, comments = zip(*ATTRIBUTE_TESTS)
+            
+            # One row per (sample, test): sample columns repeated, test columns tiled
+            test_results = pd.DataFrame({
+                'Sample_ID': np.repeat(samples.index.to_numpy(), test_count),
+                'Description': np.repeat(_column_values(samples, 'description', 'N/A'), test_count),
+                'Amount': np.repeat(samples['amount'].to_numpy(), test_count),
+                'Classification': np.repeat(_column_values(samples, 'classification', 'N/A'), test_count),
+                'Test_Name': np.tile(test_names, sample_count),
+                'Status': np.tile(statuses, sample_count),
+                'Comments': np.tile(comments, sample_count),
+                'Exception': False
+            })
+            
+            # Simulate some findings for demonstration purposes
+            below_threshold = (
+                (test_results['Test_Name'] == 'Proper_Capitalization') &
+                (test_results['Amount'].abs() < self.cap_threshold)
+            )
+            test_results.loc[below_threshold, 'Status'] = 'Exception'
+            test_results.loc[below_threshold, 'Exception'] = True
+            test_results.loc[below_threshold, 'Comments'] = 'Amount below capitalization threshold'
+            
+            self.test_results = test_results
+            logging.info(f"Attribute testing completed for {sample_count} items")
+            
+        except Exception as e:
+            logging.error(f"Attribute testing error: {str(e)}")
+
+    def _generate_findings(self):
+        """Generate findings and proposed AJEs"""
+        if self.test_results is None or self.test_results.empty:
+            return
+        
+        try:
+            failed = self.test_results[self.test_results['Exception']]
+            
+            exceptions = pd.DataFrame({
+                'Sample_ID': failed['Sample_ID'],
+                'Description': failed['Description'],
+                'Amount': failed['Amount'],
+                'Test_Failed': failed['Test_Name'],
+                'Comments': failed['Comments'],
+                'Proposed_Action': 'Review and reclassify if necessary'
+            })
+            
+            # Generate AJE if needed
+            aje_items = failed[failed['Comments'].str.lower().str.contains('threshold', regex=False)]
+            proposed_ajes = pd.DataFrame({
+                'AJE_Number': [f"AJE-{number:03d}" for number in range(1, len(aje_items) + 1)],
+                'Description': 'Reclassify capitalized amount below threshold',
+                'Debit_Account': 'R&M Expense',
+                'Credit_Account': 'PP&E',
+                'Amount': aje_items['Amount'].abs().to_numpy(),
+                'Rationale': aje_items['Comments'].to_numpy(),
+                'Supporting_Reference': 'Sample ID ' + aje_items['Sample_ID'].astype(str).to_numpy()
+            })
+            
+            self.exceptions = exceptions.to_dict('records')
+            self.proposed_ajes = proposed_ajes.to_dict('records')
+            
+            logging.info(f"Generated {len(self.exceptions)} exceptions and {len(self.proposed_ajes)} proposed AJEs")
+            
+        except Exception as e:
+            logging.error(f"Findings generation error: {str(e)}")
+
+    def _produce_artifacts(self) -> List[str]:
+        """Produce all required audit artifacts"""
+        try:
+            # The artifacts are independent: write them concurrently, then
+            # report in this order
+            artifacts = [
+                ('CapEx_Population.xlsx', self._create_population_workbook),
+                ('CapEx_Sample_Selection.xlsx', self._create_sample_selection_workbook),
+                ('CapEx_PBC_Request_List.xlsx', self._create_pbc_request_workbook),
+                ('CapEx_Test_Workpaper.xlsx', self._create_test_workpaper),
+                ('CapEx_Exceptions_Log.xlsx', self._create_exceptions_log),
+                ('Proposed_AJEs.xlsx', self._create_ajes_workbook),
+                ('CapEx_Summary_Memo.md', self._create_summary_memo)
+            ]
+            
+            with ThreadPoolExecutor(max_workers=ARTIFACT_WORKERS) as executor:
+                futures = [executor.submit(timed, create) for _, create in artifacts]
+                outcomes = [future.result() for future in futures]
+            
+            created_files = []
+            self.artifact_timings = []
+            for (filename, _), (created, seconds) in zip(artifacts, outcomes):
+                self.artifact_timings.append({'artifact': filename, 'created': created, 'seconds': seconds})
+                if created:
+                    created_files.append(filename)
+            
+            logging.info(f"Created {len(created_files)} artifact files")
+            return created_files
+            
+        except Exception as e:
+            logging.error(f"Artifact production error: {str(e)}")
+            return []
+
+    def _create_population_workbook(self) -> bool:
+        """Create the population workbook"""
+        try:
+            if self.population is None:
+                return False
+            
+            filename = os.path.join(self.upload_folder, 'CapEx_Population.xlsx')
+            
+            # Summary by classification
+            summary = self.population.groupby('classification').agg({
+                'amount': ['count', 'sum']
+            }).round(2)
+            summary.columns = ['Count', 'Total_Amount']
+            
+            write_workbook(filename, [
+                ('Population', self.population),
+                ('Classification_Summary', summary.reset_index())
+            ])
+            return True
+            
+        except Exception as e:
+            logging.error(f"Population workbook creation error: {str(e)}")
+            return False
+
+    def _create_sample_selection_workbook(self) -> bool:
+        """Create the sample selection workbook"""
+        try:
+            if self.sample_selection is None:
+                return False
+            
+            filename = os.path.join(self.upload_folder, 'CapEx_Sample_Selection.xlsx')
+            
+            # Sample rationale summary
+            rationale_summary = self.sample_selection.groupby('sample_rationale').agg({
+                'amount': ['count', 'sum']
+            }).round(2)
+            rationale_summary.columns = ['Count', 'Total_Amount']
+            
+            write_workbook(filename, [
+                ('Selected_Samples', self.sample_selection),
+                ('Sample_Rationale', rationale_summary.reset_index())
+            ])
+            return True
+            
+        except Exception as e:
+            logging.error(f"Sample selection workbook creation error: {str(e)}")
+            return False
+
+    def _create_pbc_request_workbook(self) -> bool:
+        """Create the PBC request list workbook"""
+        try:
+            if self.pbc_requests is None or self.pbc_requests.empty:
+                return False
+            
+            filename = os.path.join(self.upload_folder, 'CapEx_PBC_Request_List.xlsx')
+            
+            write_workbook(filename, [('PBC_Requests', self.pbc_requests)])
+            return True
+            
+        except Exception as e:
+            logging.error(f"PBC request workbook creation error: {str(e)}")
+            return False
+
+    def _create_test_workpaper(self) -> bool:
+        """Create the test workpaper"""
+        try:
+            if self.test_results is None or self.test_results.empty:
+                return False
+            
+            filename = os.path.join(self.upload_folder, 'CapEx_Test_Workpaper.xlsx')
+            
+            # Summary of test results
+            summary = self.test_results.groupby(['Test_Name', 'Status']).size().unstack(fill_value=0)
+            summary.columns.name = None
+            
+            write_workbook(filename, [
+                ('Test_Results', self.test_results),
+                ('Test_Summary', summary.reset_index())
+            ])
+            return True
+            
+        except Exception as e:
+            logging.error(f"Test workpaper creation error: {str(e)}")
+            return False
+
+    def _create_exceptions_log(self) -> bool:
+        """Create the exceptions log workbook"""
+        try:
+            if not self.exceptions:
+                return False
+            
+            filename = os.path.join(self.upload_folder, 'CapEx_Exceptions_Log.xlsx')
+            
+            write_workbook(filename, [('Exceptions', pd.DataFrame(self.exceptions))])
+            return True
+            
+        except Exception as e:
+            logging.error(f"Exceptions log creation error: {str(e)}")
+            return False
+
+    def _create_ajes_workbook(self) -> bool:
+        """Create the proposed AJEs workbook"""
+        try:
+            if not self.proposed_ajes:
+                return False
+            
+            filename = os.path.join(self.upload_folder, 'Proposed_AJEs.xlsx')
+            
+            write_workbook(filename, [('Proposed_AJEs', pd.DataFrame(self.proposed_ajes))])
+            return True
+            
+        except Exception as e:
+            logging.error(f"AJEs workbook creation error: {str(e)}")
+            return False
+
+    def _create_summary_memo(self) -> bool:
+        """Create the summary memo (Gemini polishing runs after the artifacts)"""
+        try:
+            filename = os.path.join(self.upload_folder, 'CapEx_Summary_Memo.md')
+            
+            # Prepare data for memo
+            metrics = self._calculate_metrics()
+            
+            memo_content = f"""# Capital Addition Sampling & Testwork Summary
+
+## Executive Summary
+
+**Period:** {datetime.now().strftime('%Y-%m-%d')}  
+**Scope:** Capital expenditure and repairs & maintenance testing  
+
+### Key Metrics
+- **Population Count:** {metrics['population_count']:,} items
+- **Sample Count:** {metrics['sample_count']:,} items  
+- **CapEx Value:** ${metrics['capex_value']:,.2f}
+- **R&M Value:** ${metrics['rnm_value']:,.2f}
+- **Items Flagged:** {metrics['items_flagged']:,}
+- **Exceptions:** {metrics['exceptions']:,}
+
+## Methodology
+
+### Sampling Approach
+- Capitalization threshold: ${self.cap_threshold:,.2f}
+- ISI (Individual Significant Item) level: ${self.isi_level:,.2f}
+- Coverage target: {self.coverage_target:.1%}
+
+### Testing Performed
+1. **Proper Capitalization:** Vouching to invoices and supporting documentation
+2. **Depreciation Calculation:** Verification of methods and rates
+3. **Asset Register Traceability:** Confirmation of property record maintenance
+4. **Supporting Documentation:** Review of approvals and authorizations
+5. **Disposal Authorization:** Verification of proper disposal procedures
+6. **GL Reconciliation:** Tie-out to general ledger accounts
+
+## Key Findings
+
+### Classification Results
+- CapEx items identified based on nature and amount thresholds
+- R&M expenses properly segregated per company policy
+- Near-threshold items flagged for additional review
+
+### Exceptions Identified
+"""
+            
+            if self.exceptions:
+                memo_content += f"- {len(self.exceptions)} exceptions requiring attention\n"
+                if metrics.get('largest_exception'):
+                    largest = metrics['largest_exception']
+                    memo_content += f"- Largest exception: {largest.get('doc_no_or_asset', 'N/A')} (${largest.get('amount', 0):,.2f})\n"
+            else:
+                memo_content += "- No significant exceptions identified\n"
+
+            memo_content += """
+### Proposed Adjusting Journal Entries
+"""
+            
+            if self.proposed_ajes:
+                memo_content += f"- {len(self.proposed_ajes)} AJEs recommended\n"
+                total_aje_amount = sum(aje.get('Amount', 0) for aje in self.proposed_ajes)
+                memo_content += f"- Total adjustment amount: ${total_aje_amount:,.2f}\n"
+            else:
+                memo_content += "- No adjusting journal entries required\n"
+
+            memo_content += """
+## Conclusion
+
+The capital addition testing procedures have been completed in accordance with applicable auditing standards. All significant items have been tested and exceptions have been documented for management review.
+
+## Recommendations
+
+1. Review and approve proposed adjusting journal entries
+2. Strengthen supporting documentation for near-threshold items
+3. Consider updating capitalization policy thresholds based on current materiality levels
+
+---
+*This memo was generated by the Capital Addition Sampling & Testwork Agent*
+"""
+
+            # Polished later by the narrative service (see narrative_requests)
+            self.memo_content = memo_content
+
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(memo_content)
+                
+            return True
+            
+        except Exception as e:
+            logging.error(f"Summary memo creation error: {str(e)}")
+            return False
+
+    def narrative_requests(self) -> Dict[str, NarrativeRequest]:
+        """Narratives to generate once the artifacts exist: polished memo and test narrative"""
+        requests = {}
+        
+        if self.memo_content:
+            requests['memo'] = NarrativeRequest(
+                memo_prompt(self.memo_content),
+                temperature=0.3,  # Lower temperature for more conservative output
+                max_output_tokens=4000,
+                source=self.memo_content
+            )
+        
+        if self.test_results is not None and not self.test_results.empty:
+            test_summary = summarize_test_results(self.test_results.to_dict('records'))
+            requests['test_narrative'] = NarrativeRequest(
+                test_narrative_prompt(test_summary),
+                temperature=0.2,
+                max_output_tokens=1000,
+                source=describe_test_results(test_summary)
+            )
+        
+        return requests
+
+    def apply_narrative(self, narrative: Dict[str, Optional[str]],
+                        memo_filename: str = 'CapEx_Summary_Memo.md') -> bool:
+        """
+        Write the polished summary memo, if one was generated
+        
+        Args:
+            narrative: NarrativeService output
+            memo_filename: File in the upload folder to write; the default
+                replaces the draft memo
+        """
+        polished = narrative.get('memo')
+        if not polished or polished == self.memo_content:
+            return False
+        
+        try:
+            filename = os.path.join(self.upload_folder, memo_filename)
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(polished)
+            return True
+        except Exception as e:
+            logging.error(f"Polished memo write error: {str(e)}")
+            return False
+
+    def _calculate_metrics(self) -> Dict:
+        """Calculate summary metrics for reporting"""
+        metrics = {
+            'population_count': 0,
+            'sample_count': 0,
+            'capex_value': 0.0,
+            'rnm_value': 0.0,
+            'items_flagged': 0,
+            'exceptions': 0,
+            'largest_exception': None
+        }
+        
+        try:
+            if self.population is not None:
+                metrics['population_count'] = len(self.population)
+                
+                capex_items = self.population[self.population['classification'] == 'CapEx']
+                rnm_items = self.population[self.population['classification'] == 'R&M']
+                
+                metrics['capex_value'] = capex_items['amount'].abs().sum()
+                metrics['rnm_value'] = rnm_items['amount'].abs().sum()
+                
+                metrics['items_flagged'] = len(self.population[
+                    (self.population['isi_item'] == True) | 
+                    (self.population['near_threshold'] == True)
+                ])
+            
+            if self.sample_selection is not None:
+                metrics['sample_count'] = len(self.sample_selection)
+            
+            if self.exceptions:
+                metrics['exceptions'] = len(self.exceptions)
+                
+                # Find largest exception
+                largest = max(self.exceptions, key=lambda x: abs(x.get('Amount', 0)))
+                metrics['largest_exception'] = {
+                    'doc_no_or_asset': largest.get('Description', 'N/A'),
+                    'amount': abs(largest.get('Amount', 0))
+                }
+                
+        except Exception as e:
+            logging.error(f"Metrics calculation error: {str(e)}")
+        
+        return metrics
+
+    def _generate_summary(self) -> str:
+        """Generate a concise summary of the analysis"""
+        try:
+            metrics = self._calculate_metrics()
+            
+            summary = (f"Analyzed {metrics['population_count']:,} transactions, "
+                      f"selected {metrics['sample_count']:,} samples for testing. "
+                      f"CapEx value: ${metrics['capex_value']:,.2f}, "
+                      f"R&M value: ${metrics['rnm_value']:,.2f}. "
+                      f"Identified {metrics['exceptions']:,} exceptions requiring attention.")
+            
+            if self.proposed_ajes:
+                summary += f" Proposed {len(self.proposed_ajes)} adjusting journal entries."
+            
+            return summary
+            
+        except Exception as e:
+            logging.error(f"Summary generation error: {str(e)}")
+            return "Analysis completed with errors. Please review the logs."
+
+    def _identify_open_requests(self) -> List[str]:
+        """Identify any open requests or missing items"""
+        open_requests = []
+        
+        if self.tb_data is None:
+            open_requests.append("Trial Balance mapping needed for full tie-out")
+        
+        if not hasattr(self, 'asset_register') or self.asset_register is None:
+            open_requests.append("Asset register required for property record tracing")
+        
+        if self.test_results is not None:
+            pending_tests = int((self.test_results['Status'] == 'Not Performed').sum())
+            if pending_tests > 0:
+                open_requests.append(f"{pending_tests} test procedures require supporting documentation")
+        
+        return open_requests
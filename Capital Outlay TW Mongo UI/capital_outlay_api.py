@@ -12,7 +12,8 @@ from werkzeug.utils import secure_filename
 from datetime import datetime
 import uuid
 from pathlib import Path
-from capex_analyzer_api import CapExAnalyzer
+from capex_engine import CapExAnalyzer, StageCache
+from narrative_service import create_narrative_service
 
 # Configure logging
 logging.basicConfig(
@@ -30,6 +31,16 @@ UPLOAD_FOLDER = Path('./uploads')
 OUTPUT_FOLDER = Path('./outputs')
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls', 'pdf', 'txt'}
 
+# PDF ledgers: page limit (0 = all pages) and table mode ('first', 'continued' or 'all')
+PDF_MAX_PAGES = int(os.environ.get('PDF_MAX_PAGES', '0')) or None
+PDF_TABLE_MODE = os.environ.get('PDF_TABLE_MODE', 'first')
+
+# Model responses keyed by prompt hash
+NARRATIVE_CACHE_FOLDER = Path(os.environ.get('NARRATIVE_CACHE_FOLDER', './cache/narratives'))
+
+# Analysis stage outputs kept in memory, keyed by upload content and parameters
+STAGE_CACHE_ENTRIES = int(os.environ.get('STAGE_CACHE_ENTRIES', '16'))
+
 UPLOAD_FOLDER.mkdir(exist_ok=True)
 OUTPUT_FOLDER.mkdir(exist_ok=True)
 
@@ -37,6 +48,12 @@ app.config['UPLOAD_FOLDER'] = str(UPLOAD_FOLDER)
 app.config['OUTPUT_FOLDER'] = str(OUTPUT_FOLDER)
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB
 
+# Memo polishing and test narratives, generated concurrently after the artifacts
+narrative_service = create_narrative_service(str(NARRATIVE_CACHE_FOLDER))
+
+# Re-uploaded files with new parameters only rerun the stages those parameters affect
+stage_cache = StageCache(STAGE_CACHE_ENTRIES)
+
 
 def allowed_file(filename: str) -> bool:
     """Check if file extension is allowed"""
@@ -82,6 +99,11 @@ def get_info():
                 'type': 'float',
                 'default': 50000,
                 'description': 'Materiality threshold in dollars'
+            },
+            'sampling_method': {
+                'type': 'string',
+                'default': 'coverage',
+                'description': "'coverage' (largest items up to the coverage target) or 'mus' (monetary-unit sampling)"
             }
         },
         'required_files': ['gl_file'],
@@ -109,12 +131,13 @@ def execute_analysis():
         isi_level = float(request.form.get('isi_level', 10000))
         coverage_target = float(request.form.get('coverage_target', 0.75))
         materiality = float(request.form.get('materiality', 50000))
+        sampling_method = request.form.get('sampling_method', 'coverage')
         
         logger.info("=" * 70)
         logger.info("CAPITAL OUTLAY ANALYSIS: Starting execution")
         logger.info("=" * 70)
         logger.info(f"Parameters: cap_threshold=${cap_threshold}, isi_level=${isi_level}, "
-                   f"coverage={coverage_target}, materiality=${materiality}")
+                   f"coverage={coverage_target}, materiality=${materiality}, sampling={sampling_method}")
         
         # Handle file uploads
         if not request.files:
@@ -156,7 +179,11 @@ def execute_analysis():
             cap_threshold=cap_threshold,
             isi_level=isi_level,
             coverage_target=coverage_target,
-            materiality=materiality
+            materiality=materiality,
+            sampling_method=sampling_method,
+            pdf_max_pages=PDF_MAX_PAGES,
+            pdf_table_mode=PDF_TABLE_MODE,
+            stage_cache=stage_cache
         )
         
         # Run analysis
@@ -166,6 +193,10 @@ def execute_analysis():
             logger.error(f"Analysis failed: {result.get('error')}")
             return jsonify(result), 400
         
+        # Narratives run once the numeric artifacts exist (timeout-bounded, cached)
+        narrative = narrative_service.run(analyzer.narrative_requests())
+        analyzer.apply_narrative(narrative)
+        
         # Move output files to outputs folder
         output_session = OUTPUT_FOLDER / session_id
         output_session.mkdir(exist_ok=True)
@@ -202,6 +233,7 @@ def execute_analysis():
                 'metrics': result['metrics'],
                 'files_created': files_created,
                 'open_requests': result.get('open_requests', []),
+                'narrative': narrative,
                 'processing_time_ms': processing_time
             }
         }), 200
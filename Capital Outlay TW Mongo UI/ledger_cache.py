@@ -0,0 +1,183 @@
+"""
+Ledger Cache - Parsed ledger snapshots keyed by file content
+Stores each parsed upload as a Parquet file so reruns with new parameters skip parsing
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pyarrow import ArrowException
+
+logger = logging.getLogger(__name__)
+
+# Bytes read at a time when hashing uploads
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Snapshot formats by preference; pickle holds the mixed-type columns Parquet rejects
+SNAPSHOT_FORMATS = ('parquet', 'pickle')
+
+
+def file_sha256(file_path: str) -> str:
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def run_key(inputs: Dict, parameters: Dict) -> str:
+    """Key identifying an analysis run by its input hashes and parameters"""
+    payload = json.dumps({'inputs': inputs, 'parameters': parameters}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LedgerCache:
+    """Parquet snapshots of parsed ledgers, indexed in MongoDB when a collection is given"""
+
+    def __init__(self, cache_folder: str, collection=None):
+        """
+        Args:
+            cache_folder: Directory holding the Parquet snapshots
+            collection: Optional MongoDB collection indexing the snapshots
+        """
+        self.cache_folder = cache_folder
+        self.collection = collection
+        self._hashes: Dict[Tuple[str, int, float], str] = {}
+
+        os.makedirs(cache_folder, exist_ok=True)
+
+    def content_hash(self, file_path: str) -> str:
+        """Content hash of a file, remembered while its size and mtime are unchanged"""
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime)
+        if key not in self._hashes:
+            self._hashes[key] = file_sha256(file_path)
+        return self._hashes[key]
+
+    def _cache_key(self, file_path: str, options: Optional[Dict]) -> str:
+        """Snapshot key: content hash plus the parse options that affect the result"""
+        content = self.content_hash(file_path)
+        if not options:
+            return content
+        suffix = hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return f"{content}-{suffix}"
+
+    def _snapshot_path(self, key: str, snapshot_format: str) -> str:
+        extension = 'parquet' if snapshot_format == 'parquet' else 'pkl'
+        return os.path.join(self.cache_folder, f"{key}.{extension}")
+
+    def _find_snapshot(self, key: str) -> Optional[Tuple[str, str]]:
+        """(format, path) of the snapshot stored under key, if any"""
+        for snapshot_format in SNAPSHOT_FORMATS:
+            snapshot = self._snapshot_path(key, snapshot_format)
+            if os.path.exists(snapshot):
+                return snapshot_format, snapshot
+        return None
+
+    def load(self, file_path: str, options: Optional[Dict] = None) -> Optional[pd.DataFrame]:
+        """
+        Parsed frame for a file, if a snapshot of the same content exists
+
+        Args:
+            file_path: Uploaded file path
+            options: Parse options the snapshot must have been made with
+
+        Returns:
+            The cached DataFrame, or None on a miss
+        """
+        try:
+            key = self._cache_key(file_path, options)
+            found = self._find_snapshot(key)
+
+            if self.collection is not None:
+                if self.collection.find_one({'_id': key}) is None:
+                    return None
+                if found is None:
+                    self.collection.delete_one({'_id': key})
+                    return None
+            elif found is None:
+                return None
+
+            snapshot_format, snapshot = found
+            if snapshot_format == 'parquet':
+                frame = pd.read_parquet(snapshot)
+                # Parquet gives None for missing text; parsers give NaN
+                for column in frame.columns[frame.dtypes == object]:
+                    frame[column] = frame[column].where(frame[column].notna(), np.nan)
+            else:
+                frame = pd.read_pickle(snapshot)
+
+            if self.collection is not None:
+                self.collection.update_one({'_id': key}, {'$set': {'last_used': datetime.utcnow()}})
+
+            logger.info(f"Ledger cache hit for {os.path.basename(file_path)}: {len(frame)} records")
+            return frame
+
+        except Exception as e:
+            logger.warning(f"Ledger cache read error for {file_path}: {str(e)}")
+            return None
+
+    def store(self, file_path: str, frame: pd.DataFrame, options: Optional[Dict] = None) -> bool:
+        """
+        Save a parsed frame as the snapshot for a file's content
+
+        Frames Parquet cannot represent (e.g. Excel columns mixing numbers
+        and text) are pickled instead.
+
+        Args:
+            file_path: Uploaded file path
+            frame: Parsed DataFrame
+            options: Parse options used to produce the frame
+
+        Returns:
+            True if the snapshot was written
+        """
+        snapshot = None
+        try:
+            key = self._cache_key(file_path, options)
+            snapshot_format = 'parquet'
+            snapshot = self._snapshot_path(key, snapshot_format)
+
+            try:
+                frame.to_parquet(snapshot, index=False)
+            except (TypeError, ValueError, ArrowException) as e:
+                logger.info(f"Pickling {os.path.basename(file_path)} snapshot, Parquet rejected it: {str(e)}")
+                if os.path.exists(snapshot):
+                    os.remove(snapshot)
+                snapshot_format = 'pickle'
+                snapshot = self._snapshot_path(key, snapshot_format)
+                frame.to_pickle(snapshot)
+
+            if self.collection is not None:
+                now = datetime.utcnow()
+                self.collection.update_one(
+                    {'_id': key},
+                    {
+                        '$set': {
+                            'content_hash': self.content_hash(file_path),
+                            'filename': os.path.basename(file_path),
+                            'options': options or {},
+                            'snapshot': snapshot,
+                            'format': snapshot_format,
+                            'rows': len(frame),
+                            'columns': [str(column) for column in frame.columns],
+                            'last_used': now
+                        },
+                        '$setOnInsert': {'created_at': now}
+                    },
+                    upsert=True
+                )
+            return True
+
+        except Exception as e:
+            logger.warning(f"Ledger cache write skipped for {file_path}: {str(e)}")
+            if snapshot and os.path.exists(snapshot):
+                os.remove(snapshot)
+            return False
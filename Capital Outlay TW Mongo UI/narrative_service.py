@@ -0,0 +1,224 @@
+"""
+Narrative Service - Async, cached Gemini narrative generation
+Runs memo polishing and test narratives concurrently after the numeric artifacts exist
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+from gemini_integration import GeminiIntegrator, GEMINI_MODEL, types
+
+logger = logging.getLogger(__name__)
+
+# Backends selectable through NARRATIVE_BACKEND
+NARRATIVE_BACKENDS = ('gemini', 'stub')
+
+
+def describe_test_results(test_summary: list) -> str:
+    """Plain-text narrative of a summarize_test_results summary, no model involved"""
+    lines = ["Attribute testing was performed on the selected samples with the following results:", ""]
+    for entry in test_summary:
+        line = f"- {entry['test']}: {entry['count']} {entry['status']}"
+        if entry['exception']:
+            line += " (exceptions noted)"
+        lines.append(line)
+
+    exceptions = sum(entry['count'] for entry in test_summary if entry['exception'])
+    lines.append("")
+    lines.append(f"{exceptions} test exceptions were noted." if exceptions
+                 else "No test exceptions were noted.")
+    return "\n".join(lines)
+
+
+class NarrativeRequest:
+    """One narrative to generate"""
+
+    def __init__(self, prompt: str, temperature: float = 0.3, max_output_tokens: int = 1000,
+                 source: str = ''):
+        """
+        Args:
+            prompt: Full prompt sent to the model
+            temperature: Sampling temperature
+            max_output_tokens: Response length limit
+            source: Locally generated text the narrative is based on (returned by the stub)
+        """
+        self.prompt = prompt
+        self.temperature = temperature
+        self.max_output_tokens = max_output_tokens
+        self.source = source
+
+    def cache_key(self, model: str) -> str:
+        """Hash of everything that determines the response"""
+        payload = json.dumps({
+            'model': model,
+            'prompt': self.prompt,
+            'temperature': self.temperature,
+            'max_output_tokens': self.max_output_tokens
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class GeminiBackend:
+    """Gemini through the google-genai async client"""
+
+    name = GEMINI_MODEL
+
+    def __init__(self, integrator: Optional[GeminiIntegrator] = None):
+        self.integrator = integrator or GeminiIntegrator()
+
+    def is_available(self) -> bool:
+        return self.integrator.is_available()
+
+    async def generate(self, request: NarrativeRequest) -> Optional[str]:
+        response = await self.integrator.client.aio.models.generate_content(
+            model=GEMINI_MODEL,
+            contents=request.prompt,
+            config=types.GenerateContentConfig(
+                temperature=request.temperature,
+                max_output_tokens=request.max_output_tokens
+            ) if types else None
+        )
+        return response.text or None
+
+
+class StubBackend:
+    """Offline backend: returns each request's locally generated source text"""
+
+    name = 'stub'
+
+    def is_available(self) -> bool:
+        return True
+
+    async def generate(self, request: NarrativeRequest) -> Optional[str]:
+        await asyncio.sleep(0)
+        return request.source or None
+
+
+class NarrativeService:
+    """Generates narratives concurrently with a timeout, a concurrency cap and a disk cache"""
+
+    def __init__(self, backend, cache_folder: str, timeout: float = 60,
+                 max_concurrency: int = 2):
+        """
+        Args:
+            backend: GeminiBackend or StubBackend
+            cache_folder: Directory for cached responses, one JSON file per prompt hash
+            timeout: Seconds allowed per model call
+            max_concurrency: Model calls in flight at once
+        """
+        self.backend = backend
+        self.cache_folder = cache_folder
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+
+        os.makedirs(cache_folder, exist_ok=True)
+
+    def is_available(self) -> bool:
+        return self.backend.is_available()
+
+    def _cache_path(self, request: NarrativeRequest) -> str:
+        return os.path.join(self.cache_folder, f"{request.cache_key(self.backend.name)}.json")
+
+    def _read_cache(self, request: NarrativeRequest) -> Optional[str]:
+        cache_path = self._cache_path(request)
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('text')
+        except Exception as e:
+            logger.warning(f"Narrative cache read error: {str(e)}")
+            return None
+
+    def _write_cache(self, request: NarrativeRequest, text: str):
+        try:
+            with open(self._cache_path(request), 'w', encoding='utf-8') as f:
+                json.dump({'backend': self.backend.name, 'text': text}, f)
+        except Exception as e:
+            logger.warning(f"Narrative cache write error: {str(e)}")
+
+    async def _generate_one(self, name: str, request: NarrativeRequest,
+                            semaphore: asyncio.Semaphore) -> Optional[str]:
+        cached = self._read_cache(request)
+        if cached is not None:
+            logger.info(f"Narrative cache hit: {name}")
+            return cached
+
+        async with semaphore:
+            try:
+                text = await asyncio.wait_for(self.backend.generate(request), self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Narrative '{name}' timed out after {self.timeout}s")
+                return None
+            except Exception as e:
+                logger.error(f"Narrative '{name}' error: {str(e)}")
+                return None
+
+        if text:
+            self._write_cache(request, text)
+            logger.info(f"Narrative generated: {name}")
+        return text
+
+    async def generate_all(self, requests: Dict[str, NarrativeRequest]) -> Dict[str, Optional[str]]:
+        """Generate every narrative concurrently; failed or timed-out ones are None"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        names = list(requests)
+        texts = await asyncio.gather(*(
+            self._generate_one(name, requests[name], semaphore) for name in names
+        ))
+        return dict(zip(names, texts))
+
+    def run(self, requests: Dict[str, NarrativeRequest]) -> Dict[str, Optional[str]]:
+        """Generate narratives and wait for them (for callers without an event loop)"""
+        if not requests or not self.is_available():
+            return {}
+        return asyncio.run(self.generate_all(requests))
+
+    def start(self, requests: Dict[str, NarrativeRequest],
+              on_complete: Callable[[Dict[str, Optional[str]]], None]) -> Optional[threading.Thread]:
+        """
+        Generate narratives in a background thread and hand them to on_complete
+
+        Returns:
+            The worker thread, or None if there is nothing to generate
+        """
+        if not requests or not self.is_available():
+            return None
+
+        def worker():
+            try:
+                on_complete(self.run(requests))
+            except Exception as e:
+                logger.error(f"Narrative generation failed: {str(e)}")
+
+        thread = threading.Thread(target=worker, name='narrative-service', daemon=True)
+        thread.start()
+        return thread
+
+
+def create_narrative_service(cache_folder: str) -> NarrativeService:
+    """
+    Narrative service configured from the environment
+
+    NARRATIVE_BACKEND: 'gemini' or 'stub' (default: gemini when GEMINI_API_KEY is set)
+    NARRATIVE_TIMEOUT: Seconds allowed per model call
+    NARRATIVE_CONCURRENCY: Model calls in flight at once
+    """
+    backend_name = os.environ.get('NARRATIVE_BACKEND')
+    if backend_name is None:
+        backend_name = 'gemini' if os.environ.get('GEMINI_API_KEY') else 'stub'
+    if backend_name not in NARRATIVE_BACKENDS:
+        raise ValueError(f"Unknown narrative backend: {backend_name}")
+
+    backend = GeminiBackend() if backend_name == 'gemini' else StubBackend()
+    return NarrativeService(
+        backend,
+        cache_folder,
+        timeout=float(os.environ.get('NARRATIVE_TIMEOUT', '60')),
+        max_concurrency=int(os.environ.get('NARRATIVE_CONCURRENCY', '2'))
+    )
@@ -0,0 +1,158 @@
+"""
+PDF Table Reader - Streaming pdfplumber table extraction
+Reads tables page by page so callers can stop as soon as they have the table they need
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+import pdfplumber
+
+logger = logging.getLogger(__name__)
+
+# A pdfplumber table: list of rows, first row is the header
+Table = List[List[Optional[str]]]
+
+# Pages handed to each worker in full extraction
+PAGES_PER_TASK = 25
+
+
+def iter_pdf_tables(filepath: Union[str, Path], max_pages: Optional[int] = None,
+                    start_page: int = 0) -> Iterator[Tuple[int, Table]]:
+    """
+    Yield (page number, table) for each table, one page at a time
+
+    Pages are only parsed when the consumer asks for the next table, and each
+    page's layout cache is released before moving on.
+
+    Args:
+        filepath: PDF file path
+        max_pages: Maximum number of pages to read (None = all)
+        start_page: Zero-based index of the first page to read
+    """
+    with pdfplumber.open(filepath) as pdf:
+        stop_page = start_page + max_pages if max_pages else None
+        for page in pdf.pages[start_page:stop_page]:
+            try:
+                tables = page.extract_tables()
+            finally:
+                page.close()
+
+            for table in tables:
+                if table:
+                    yield page.page_number, table
+
+
+def _header_key(row: List[Optional[str]]) -> Tuple[str, ...]:
+    """Normalized header row used to recognize continuation tables"""
+    return tuple((cell or '').strip().lower() for cell in row)
+
+
+def read_pdf_table(filepath: Union[str, Path], max_pages: Optional[int] = None,
+                   merge_continuations: bool = False) -> Optional[Table]:
+    """
+    Read the first table in a PDF, stopping as soon as it is found
+
+    Args:
+        filepath: PDF file path
+        max_pages: Maximum number of pages to scan (None = all)
+        merge_continuations: Also append the rows of tables on the following
+            pages that repeat the same header, until a page without one
+
+    Returns:
+        Header row followed by data rows, or None if no table was found
+    """
+    header = None
+    rows = []
+    last_page = None
+
+    tables = iter_pdf_tables(filepath, max_pages)
+    try:
+        for page_number, table in tables:
+            if header is None:
+                header, rows, last_page = table[0], list(table[1:]), page_number
+                if not merge_continuations:
+                    break
+                continue
+
+            if page_number == last_page:
+                continue  # Other tables on a page already used
+
+            if page_number != last_page + 1 or _header_key(table[0]) != _header_key(header):
+                break  # The table did not continue onto this page
+
+            rows.extend(table[1:])
+            last_page = page_number
+    finally:
+        tables.close()
+
+    if header is None:
+        return None
+
+    logger.info(f"Read PDF table with {len(rows)} rows (last page {last_page})")
+    return [header] + rows
+
+
+def _extract_page_range(filepath: str, start_page: int, stop_page: int) -> List[Tuple[int, Table]]:
+    """Process pool task: every table on pages [start_page, stop_page)"""
+    return list(iter_pdf_tables(filepath, stop_page - start_page, start_page))
+
+
+def extract_pdf_tables(filepath: Union[str, Path], max_pages: Optional[int] = None,
+                       workers: Optional[int] = None) -> List[Tuple[int, Table]]:
+    """
+    Extract every table in a PDF, parsing page ranges in a process pool
+
+    Args:
+        filepath: PDF file path
+        max_pages: Maximum number of pages to read (None = all)
+        workers: Worker processes (None = one per CPU)
+
+    Returns:
+        List of (page number, table) in page order
+    """
+    with pdfplumber.open(filepath) as pdf:
+        page_count = len(pdf.pages)
+    if max_pages:
+        page_count = min(page_count, max_pages)
+
+    ranges = [(start, min(start + PAGES_PER_TASK, page_count))
+              for start in range(0, page_count, PAGES_PER_TASK)]
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+
+    if workers <= 1:
+        return list(iter_pdf_tables(filepath, max_pages))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(
+            _extract_page_range,
+            [str(filepath)] * len(ranges),
+            [start for start, _ in ranges],
+            [stop for _, stop in ranges]
+        )
+        return [item for chunk in chunks for item in chunk]
+
+
+def combine_tables(tables: List[Tuple[int, Table]]) -> Optional[Table]:
+    """
+    Combine the first table with every later table that repeats its header
+
+    Args:
+        tables: (page number, table) pairs, e.g. from extract_pdf_tables
+
+    Returns:
+        Header row followed by all matching data rows, or None if empty
+    """
+    if not tables:
+        return None
+
+    header = tables[0][1][0]
+    rows = list(tables[0][1][1:])
+    for _, table in tables[1:]:
+        if _header_key(table[0]) == _header_key(header):
+            rows.extend(table[1:])
+
+    return [header] + rows
@@ -0,0 +1,81 @@
+"""
+Sample Selection - Vectorized coverage and monetary-unit sampling
+Works on amount arrays so selection stays fast for populations in the millions
+"""
+
+from typing import Optional
+
+import numpy as np
+
+# Sampling methods accepted by CapExAnalyzer
+SAMPLING_METHODS = ('coverage', 'mus')
+
+
+def select_coverage_samples(amounts: np.ndarray, remaining_needed: float, max_items: int = 50) -> np.ndarray:
+    """
+    Pick the largest items until their absolute amounts cover remaining_needed
+
+    Only the max_items largest items can ever be picked, so they are found
+    with a partial sort; the cut-off is a searchsorted on their running total.
+
+    Args:
+        amounts: Item amounts
+        remaining_needed: Value the selected items should cover
+        max_items: Maximum number of items to select
+
+    Returns:
+        Positions of the selected items, largest first
+    """
+    abs_amounts = np.abs(np.asarray(amounts, dtype=float))
+    if remaining_needed <= 0 or len(abs_amounts) == 0 or max_items <= 0:
+        return np.array([], dtype=int)
+
+    if len(abs_amounts) > max_items:
+        candidates = np.argpartition(-abs_amounts, max_items - 1)[:max_items]
+    else:
+        candidates = np.arange(len(abs_amounts))
+    order = candidates[np.argsort(-abs_amounts[candidates], kind='stable')]
+
+    # First item whose running total reaches the target is the last one taken
+    cumulative = np.cumsum(abs_amounts[order])
+    count = min(int(np.searchsorted(cumulative, remaining_needed, side='left')) + 1, len(order))
+    return order[:count]
+
+
+def select_mus_samples(amounts: np.ndarray, interval: float, random_seed: Optional[int] = None,
+                       max_samples: Optional[int] = None) -> np.ndarray:
+    """
+    Systematic monetary-unit sampling
+
+    Every interval-th dollar (from a random start) selects the item that
+    contains it, so items are picked in proportion to their size and any
+    item at least one interval large is always picked.
+
+    If the interval would select more than max_samples items, it is widened
+    to population value / max_samples, so the selection stays systematic but
+    never exceeds the cap.
+
+    Args:
+        amounts: Item amounts
+        interval: Sampling interval in dollars
+        random_seed: Seed for the random start (fixed seed = reproducible selection)
+        max_samples: Maximum number of items to select (None = no cap)
+
+    Returns:
+        Positions of the selected items, in population order
+    """
+    abs_amounts = np.abs(np.asarray(amounts, dtype=float))
+    if len(abs_amounts) == 0 or interval <= 0:
+        return np.array([], dtype=int)
+
+    cumulative = np.cumsum(abs_amounts)
+    if max_samples is not None:
+        if max_samples <= 0:
+            return np.array([], dtype=int)
+        interval = max(interval, cumulative[-1] / max_samples)
+
+    start = np.random.default_rng(random_seed).uniform(0, interval)
+    points = np.arange(start, cumulative[-1], interval)[:max_samples]
+
+    # Item i holds the dollars in (cumulative[i - 1], cumulative[i]]
+    return np.unique(np.searchsorted(cumulative, points, side='left'))
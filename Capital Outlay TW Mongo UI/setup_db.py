@@ -9,5 +9,8 @@ db = client.get_database()
 db.uploaded_files.create_index([("uploaded_on", DESCENDING)])
 db.uploaded_files.create_index([("filename", ASCENDING)])
 db.analysis_results.create_index([("run_date", DESCENDING)])
+db.analysis_results.create_index([("run_key", ASCENDING), ("run_date", DESCENDING)])
+db.ledger_cache.create_index([("content_hash", ASCENDING)])
+db.ledger_cache.create_index([("last_used", DESCENDING)])
 
 print("Indexes created successfully!")
\ No newline at end of file
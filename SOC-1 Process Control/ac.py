@@ -17,7 +17,8 @@ from db_operations import (
     doc_ops,
     session_ops,
     result_ops,
-    audit_ops
+    audit_ops,
+    extraction_cache_ops
 )
 
 # Import document processing logic
@@ -28,7 +29,7 @@ from document_processor import (
     extract_text_from_docx,
     extract_text_from_excel,
     clean_data_for_json,
-    send_raw_to_n8n,
+    dispatch_to_n8n,
     save_to_excel
 )
 
@@ -78,7 +79,7 @@ def upload_file():
         try:
             if file_extension == '.pdf':
                 with open(file_path, 'rb') as f:
-                    raw_text, extracted_data = extract_text_from_pdf(f)
+                    raw_text, extracted_data = extract_text_from_pdf(f, cache=extraction_cache_ops)
                     # If PyMuPDF extraction returns little text, try pdf2image as fallback
                     if len(raw_text.strip()) < 100:  # Threshold for minimal text
                         alt_text, alt_data = extract_text_from_pdf_with_pdf2image(f)
@@ -88,11 +89,11 @@ def upload_file():
             
             elif file_extension == '.docx':
                 with open(file_path, 'rb') as f:
-                    raw_text, extracted_data = extract_text_from_docx(f)
+                    raw_text, extracted_data = extract_text_from_docx(f, cache=extraction_cache_ops)
 
             elif file_extension in ['.xlsx', '.xls']:
                 with open(file_path, 'rb') as f:
-                    raw_text, extracted_data = extract_text_from_excel(f)
+                    raw_text, extracted_data = extract_text_from_excel(f, cache=extraction_cache_ops)
 
             elif file_extension in ['.png', '.jpg', '.jpeg']:
                 from PIL import Image
@@ -177,6 +178,7 @@ def send_to_n8n():
     data = request.json
     session_id = data.get('session_id')
     repeat_count = int(data.get('count', 1))
+    read_timeout = float(data['timeout']) if data.get('timeout') else None
     
     if not session_id:
         return jsonify({'error': 'No session ID provided'}), 400
@@ -253,14 +255,13 @@ def send_to_n8n():
             print(f"Error reading Excel file for row count: {e}")
             current_row = 1
 
-        # Step 1: Send to n8n webhook and collect results
+        # Step 1: Send to n8n webhook concurrently, then handle results in iteration order
+        dispatch_results = dispatch_to_n8n(extracted_data, webhook_url, filename, repeat_count,
+                                           read_timeout=read_timeout)
+        
         all_results = []
-        for i in range(repeat_count):
+        for i, (success, n8n_response, message) in enumerate(dispatch_results):
             try:
-                success, n8n_response, message = send_raw_to_n8n(
-                    extracted_data, webhook_url, f"{filename}_part{i+1}"
-                )
-                
                 if not success:
                     session_ops.add_processing_step(
                         session_id, f"n8n_iteration_{i+1}", "failed",
@@ -30,5 +30,8 @@ class Config:
     # Excel Output
     EXCEL_FILE_PATH = os.getenv('EXCEL_FILE_PATH', "output.xlsx")
     
+    # Extraction cache: entries unused for this many days are removed
+    EXTRACTION_CACHE_TTL_DAYS = int(os.getenv('EXTRACTION_CACHE_TTL_DAYS', 30))
+    
     # File Processing
     ALLOWED_EXTENSIONS = {'.pdf', '.docx', '.xlsx', '.xls', '.png', '.jpg', '.jpeg'}
\ No newline at end of file
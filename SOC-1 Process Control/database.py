@@ -60,6 +60,10 @@ class MongoDB:
             self.db.processed_results.create_index([("session_id", 1)])
             self.db.processed_results.create_index([("created_at", -1)])
             
+            # Extraction cache indexes
+            self.db.extraction_cache.create_index([("extractor", 1)])
+            self.db.extraction_cache.create_index([("last_used", -1)])
+            
             # Audit logs indexes
             self.db.audit_logs.create_index([("timestamp", -1)])
             self.db.audit_logs.create_index([("action_type", 1)])
@@ -1,8 +1,11 @@
 # db_operations.py
 from database import mongo_db
-from models import DocumentModel, ProcessingSessionModel, ProcessedResultModel, AuditLogModel
+from models import DocumentModel, ProcessingSessionModel, ProcessedResultModel, AuditLogModel, ExtractionCacheModel
 from bson import ObjectId
-from datetime import datetime
+from config import Config
+import gridfs
+import json
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 
 class DocumentOperations:
@@ -239,6 +242,97 @@ class ProcessedResultOperations:
             print(f"Error counting results: {e}")
             return 0
 
+class ExtractionCacheOperations:
+    """Content-addressed store for extraction results; large payloads go to GridFS"""
+    
+    # Payloads above this many bytes of JSON are kept in GridFS instead of inline
+    INLINE_LIMIT = 4 * 1024 * 1024
+    # Seconds between sweeps for entries unused longer than EXTRACTION_CACHE_TTL_DAYS
+    PRUNE_INTERVAL = 3600
+    
+    def __init__(self):
+        self.last_pruned = None
+        if mongo_db is None:
+            self.collection = None
+            self.fs = None
+        else:
+            self.collection = mongo_db.get_collection('extraction_cache')
+            self.fs = gridfs.GridFS(mongo_db.db, collection='extraction_cache_files')
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached payload for a key, or None on a miss"""
+        if self.collection is None:
+            return None
+            
+        try:
+            entry = self.collection.find_one_and_update(
+                {"_id": key},
+                {"$set": {"last_used": datetime.utcnow()}}
+            )
+            if entry is None:
+                return None
+            if entry.get("file_id") is not None:
+                return json.loads(self.fs.get(entry["file_id"]).read().decode('utf-8'))
+            return entry["payload"]
+        except Exception as e:
+            print(f"Error reading extraction cache: {e}")
+            return None
+    
+    def put(self, key: str, payload: Dict) -> bool:
+        """Store a payload under a key"""
+        if self.collection is None:
+            return False
+            
+        try:
+            encoded = json.dumps(payload, default=str).encode('utf-8')
+            if len(encoded) > self.INLINE_LIMIT:
+                file_id = self.fs.put(encoded, filename=key)
+                entry = ExtractionCacheModel.create_entry(key, file_id=file_id, size=len(encoded))
+            else:
+                file_id = None
+                entry = ExtractionCacheModel.create_entry(key, payload=payload, size=len(encoded))
+            
+            previous = self.collection.find_one_and_replace({"_id": key}, entry, upsert=True)
+            if previous and previous.get("file_id") is not None and previous["file_id"] != file_id:
+                self.fs.delete(previous["file_id"])
+            
+            now = datetime.utcnow()
+            if self.last_pruned is None or (now - self.last_pruned).total_seconds() > self.PRUNE_INTERVAL:
+                self.prune()
+            return True
+        except Exception as e:
+            print(f"Error writing extraction cache: {e}")
+            return False
+    
+    def prune(self, max_age_days: int = None) -> int:
+        """Remove entries, and their GridFS payloads, not used in max_age_days"""
+        if self.collection is None:
+            return 0
+            
+        try:
+            self.last_pruned = datetime.utcnow()
+            cutoff = self.last_pruned - timedelta(days=max_age_days or Config.EXTRACTION_CACHE_TTL_DAYS)
+            stale = list(self.collection.find({"last_used": {"$lt": cutoff}}, {"file_id": 1}))
+            for entry in stale:
+                if entry.get("file_id") is not None:
+                    self.fs.delete(entry["file_id"])
+            if stale:
+                self.collection.delete_many({"_id": {"$in": [entry["_id"] for entry in stale]}})
+            return len(stale)
+        except Exception as e:
+            print(f"Error pruning extraction cache: {e}")
+            return 0
+    
+    def count_entries(self) -> int:
+        """Count cached extraction results"""
+        if self.collection is None:
+            return 0
+        try:
+            return self.collection.count_documents({})
+        except Exception as e:
+            print(f"Error counting extraction cache: {e}")
+            return 0
+
 class AuditOperations:
     """CRUD operations for audit logs"""
     
@@ -277,4 +371,5 @@ class AuditOperations:
 doc_ops = DocumentOperations()
 session_ops = SessionOperations()
 result_ops = ProcessedResultOperations()
-audit_ops = AuditOperations()
\ No newline at end of file
+audit_ops = AuditOperations()
+extraction_cache_ops = ExtractionCacheOperations()
\ No newline at end of file
@@ -14,87 +14,312 @@ from openpyxl import load_workbook, Workbook
 from openpyxl.styles import Font, Alignment, PatternFill
 import numpy as np
 import base64
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import gzip
+import time
+import uuid
+import urllib3
 
 pytesseract.pytesseract.tesseract_cmd = r'C:\Users\Tamanna.garg.HCLLP\AppData\Local\Programs\Tesseract-OCR\tesseract.exe'  # Example for Windows
 
+# PDF OCR settings
+PDF_OCR_DPI = 300
+PDF_MIN_TEXT_LAYER_CHARS = int(os.getenv('PDF_MIN_TEXT_LAYER_CHARS', 200))  # Below this a page is rendered and OCR'd
+PDF_OCR_WORKERS = int(os.getenv('PDF_OCR_WORKERS', os.cpu_count() or 1))
+PDF_CACHE_KEY_DPI = 72  # Render used to key pages that are OCR'd
+
+# Extraction cache: bump an extractor's version whenever its output changes
+EXTRACTOR_VERSIONS = {
+    'pdf_page': '4',
+    'docx': '1',
+    'excel': '2'
+}
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Excel CSV attachment: rows written per chunk, and the per-sheet size cap in bytes (0 for no cap)
+EXCEL_CSV_CHUNK_ROWS = 5000
+EXCEL_CSV_MAX_BYTES = int(os.getenv('EXCEL_CSV_MAX_BYTES', 0)) or None
+
+# n8n webhook dispatch
+N8N_CONNECT_TIMEOUT = 10
+N8N_READ_TIMEOUT = float(os.getenv('N8N_READ_TIMEOUT', 120))  # Default; routes may pass their own
+N8N_MAX_CONCURRENCY = int(os.getenv('N8N_MAX_CONCURRENCY', 4))
+N8N_RETRIES = int(os.getenv('N8N_RETRIES', 2))
+N8N_BACKOFF = float(os.getenv('N8N_BACKOFF', 1.0))  # Seconds before the first retry, doubled after each
+# Only statuses returned before the workflow runs are retried; 502/504 may mean it is still running
+N8N_RETRY_STATUSES = {429, 503}
+N8N_GZIP_MIN_BYTES = int(os.getenv('N8N_GZIP_MIN_BYTES', 1024 * 1024))  # 0 to never compress
+
+def file_sha256(file):
+    """SHA-256 of an open file's bytes, read in chunks"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+def extraction_cache_key(extractor, content_hash):
+    """Cache key for an extractor's output on content with the given hash"""
+    return f"{extractor}:v{EXTRACTOR_VERSIONS[extractor]}:{content_hash}"
+
+def _cached_extraction(file, extractor, extract, cache, options=None):
+    """Return extract(file) from the cache when the same bytes were extracted with the same options before"""
+    if cache is None:
+        return extract(file)
+    
+    content_hash = file_sha256(file)
+    if options:
+        content_hash += "-" + hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    key = extraction_cache_key(extractor, content_hash)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached["text"], cached["data"]
+    
+    text, data = extract(file)
+    if data:  # Failed extractions return an error string and no data
+        cache.put(key, {"text": text, "data": data})
+    return text, data
+
 # Function to extract text from image using Tesseract
 def extract_text_from_image(image):
     try:
-        text = pytesseract.image_to_string(image)
-        return text
+        return _ocr_image(image)
     except Exception as e:
         return f"Error extracting text from image: {str(e)}"
 
-def extract_text_from_pdf(pdf_file):
-    try:
-        pdf_file.seek(0)
-        pdf_bytes = pdf_file.read()
-        pdf_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        
-        extracted_text = ""
-        all_extracted_data = []
-        
-        for page_num in range(len(pdf_doc)):
-            page = pdf_doc[page_num]
-            page_output = f"\n--- Page {page_num + 1} ---\n"
+def _ocr_image(image):
+    """OCR an image with Tesseract; raises when OCR fails (missing binary, bad image)"""
+    return pytesseract.image_to_string(image)
+
+def _pdf_page_plan(pdf_doc):
+    """
+    Embedded images on each page as (xref, duplicate_of, digest)
+    
+    duplicate_of is set when the image was already seen, by xref or by
+    content hash, so each image is OCR'd only once.
+    """
+    seen_xrefs = {}
+    seen_hashes = {}
+    plan = []
+    
+    for page_num in range(len(pdf_doc)):
+        page_images = []
+        for img in pdf_doc[page_num].get_images(full=True):
+            xref = img[0]
+            if xref in seen_xrefs:
+                duplicate_of, digest = seen_xrefs[xref]
+                page_images.append((xref, duplicate_of or xref, digest))
+                continue
             
-            # Extract text directly from PDF
-            pdf_text = page.get_text()
-            if pdf_text.strip():
-                page_output += f"[PDF Text Extraction]\n{pdf_text}\n"
-                all_extracted_data.append({
+            try:
+                digest = hashlib.sha256(pdf_doc.xref_stream_raw(xref) or b"").hexdigest()
+            except Exception:
+                digest = None
+            
+            duplicate_of = seen_hashes.get(digest) if digest else None
+            if digest and duplicate_of is None:
+                seen_hashes[digest] = xref
+            seen_xrefs[xref] = (duplicate_of, digest)
+            page_images.append((xref, duplicate_of, digest))
+        plan.append(page_images)
+    
+    return plan
+
+def _extract_pdf_page(pdf_doc, page_num, page_images):
+    """Text layer, rendered-page OCR when the text layer is sparse, and embedded image OCR for one page"""
+    page = pdf_doc[page_num]
+    page_output = f"\n--- Page {page_num + 1} ---\n"
+    page_data = []
+    failed = False
+    
+    # Extract text directly from PDF
+    pdf_text = page.get_text()
+    if pdf_text.strip():
+        page_output += f"[PDF Text Extraction]\n{pdf_text}\n"
+        page_data.append({
+            "page": page_num + 1,
+            "source": "pdf_text",
+            "content": pdf_text
+        })
+    
+    # OCR from rendered page, only when the text layer is missing or sparse
+    if len(pdf_text.strip()) < PDF_MIN_TEXT_LAYER_CHARS:
+        try:
+            pix = page.get_pixmap(dpi=PDF_OCR_DPI)
+            image = Image.open(io.BytesIO(pix.tobytes("png")))
+            rendered_text = _ocr_image(image).strip()
+            page_output += f"[OCR from rendered page]\n{rendered_text if rendered_text else 'No text found.'}\n"
+            
+            if rendered_text:
+                page_data.append({
                     "page": page_num + 1,
-                    "source": "pdf_text",
-                    "content": pdf_text
+                    "source": "page_ocr",
+                    "content": rendered_text
                 })
-            
-            # OCR from rendered page
+        except Exception as e:
+            failed = True
+            page_output += f"[Error rendering page for OCR]: {str(e)}\n"
+    else:
+        page_output += "[OCR from rendered page skipped: text layer present]\n"
+    
+    # Text from embedded images not already OCR'd on an earlier page
+    if page_images:
+        for xref, duplicate_of, _ in page_images:
+            if duplicate_of is not None:
+                if duplicate_of == xref:
+                    page_output += f"\n[Image {xref} already processed on an earlier page]\n"
+                else:
+                    page_output += f"\n[Image {xref} is identical to image {duplicate_of}, already processed]\n"
+                continue
             try:
-                pix = page.get_pixmap(dpi=300)
-                image = Image.open(io.BytesIO(pix.tobytes("png")))
-                rendered_text = extract_text_from_image(image).strip()
-                page_output += f"[OCR from rendered page]\n{rendered_text if rendered_text else 'No text found.'}\n"
+                base_image = pdf_doc.extract_image(xref)
+                image_bytes = base_image["image"]
+                image_ext = base_image["ext"].lower()
                 
-                if rendered_text:
-                    all_extracted_data.append({
-                        "page": page_num + 1,
-                        "source": "page_ocr",
-                        "content": rendered_text
-                    })
+                if image_ext in ["jpeg", "jpg", "png"]:
+                    img_obj = Image.open(io.BytesIO(image_bytes))
+                    img_text = _ocr_image(img_obj).strip()
+                    page_output += f"\n[OCR from image {xref}]\n{img_text if img_text else 'No text found in image.'}\n"
+                    
+                    if img_text:
+                        page_data.append({
+                            "page": page_num + 1,
+                            "source": f"embedded_image_{xref}",
+                            "content": img_text
+                        })
+                else:
+                    page_output += f"\n[Unsupported image format: {image_ext} for image {xref}]\n"
             except Exception as e:
-                page_output += f"[Error rendering page for OCR]: {str(e)}\n"
-            
-            # Text from embedded images
-            images = page.get_images(full=True)
-            if images:
-                for img_index, img in enumerate(images):
-                    xref = img[0]
-                    try:
-                        base_image = pdf_doc.extract_image(xref)
-                        image_bytes = base_image["image"]
-                        image_ext = base_image["ext"].lower()
-                        
-                        if image_ext in ["jpeg", "jpg", "png"]:
-                            img_obj = Image.open(io.BytesIO(image_bytes))
-                            img_text = extract_text_from_image(img_obj).strip()
-                            page_output += f"\n[OCR from image {xref}]\n{img_text if img_text else 'No text found in image.'}\n"
-                            
-                            if img_text:
-                                all_extracted_data.append({
-                                    "page": page_num + 1,
-                                    "source": f"embedded_image_{xref}",
-                                    "content": img_text
-                                })
-                        else:
-                            page_output += f"\n[Unsupported image format: {image_ext} for image {xref}]\n"
-                    except Exception as e:
-                        page_output += f"\n[Error processing image {xref}]: {str(e)}\n"
-            else:
-                page_output += "\n[No embedded images found]\n"
-            
-            extracted_text += page_output
-        
+                failed = True
+                page_output += f"\n[Error processing image {xref}]: {str(e)}\n"
+    else:
+        page_output += "\n[No embedded images found]\n"
+    
+    return {"page": page_num + 1, "text": page_output, "data": page_data, "failed": failed}
+
+# PDF opened once per pool worker
+_worker_pdf_doc = None
+
+def _init_pdf_worker(pdf_bytes):
+    global _worker_pdf_doc
+    _worker_pdf_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+def _extract_pdf_page_in_worker(page_num, page_images):
+    return _extract_pdf_page(_worker_pdf_doc, page_num, page_images)
+
+def _pdf_page_needs_ocr(pdf_doc, page_num, page_images):
+    """Whether a page has a sparse text layer or an embedded image not OCR'd elsewhere"""
+    if any(duplicate_of is None for _, duplicate_of, _ in page_images):
+        return True
+    return len(pdf_doc[page_num].get_text().strip()) < PDF_MIN_TEXT_LAYER_CHARS
+
+def _pdf_page_hash(pdf_doc, page_num, page_images):
+    """
+    Hash of what a page's extraction reads: its text layer, its embedded
+    images and, for pages that get rendered for OCR, a low-resolution
+    render, so pages that differ only through shared resources (form
+    XObjects, fonts) never share a key
+    """
+    page = pdf_doc[page_num]
+    pdf_text = page.get_text()
+    digest = hashlib.sha256()
+    digest.update(pdf_text.encode('utf-8', 'surrogatepass'))
+    digest.update(repr((tuple(page.rect), page.rotation, page_images)).encode('utf-8'))
+    if len(pdf_text.strip()) < PDF_MIN_TEXT_LAYER_CHARS:
+        digest.update(page.get_pixmap(dpi=PDF_CACHE_KEY_DPI).samples)
+    return digest.hexdigest()
+
+def _page_cache_entry(page_result):
+    """Page result without its page number, so a moved page still hits the cache"""
+    header = f"\n--- Page {page_result['page']} ---\n"
+    return {
+        "text": page_result["text"][len(header):],
+        "data": [{key: value for key, value in item.items() if key != "page"}
+                 for item in page_result["data"]]
+    }
+
+def _page_from_cache(page_num, entry):
+    return {
+        "page": page_num + 1,
+        "text": f"\n--- Page {page_num + 1} ---\n" + entry["text"],
+        "data": [{"page": page_num + 1, **item} for item in entry["data"]],
+        "failed": False
+    }
+
+def iter_pdf_pages(pdf_file, workers=None, cache=None):
+    """
+    Yield each page's extraction result in page order as soon as it is ready
+    
+    Pages that need OCR are processed in a process pool, text-only pages
+    inline; each result is a dict with
+    "page", "text" (the page's section of the extracted text), "data"
+    (its all_extracted_data entries) and "failed" (OCR or image
+    extraction failed on the page). With a cache (an object with
+    get(key) and put(key, value)), pages whose content was extracted
+    before are served from it and only changed pages are OCR'd.
+    """
+    pdf_file.seek(0)
+    pdf_bytes = pdf_file.read()
+    pdf_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    
+    try:
+        plan = _pdf_page_plan(pdf_doc)
+        
+        # Pages already extracted, from this or an earlier revision of the file
+        cache_keys = {}
+        cached_pages = {}
+        if cache is not None:
+            for page_num, page_images in enumerate(plan):
+                key = extraction_cache_key('pdf_page', _pdf_page_hash(pdf_doc, page_num, page_images))
+                entry = cache.get(key)
+                if entry is not None:
+                    cached_pages[page_num] = _page_from_cache(page_num, entry)
+                else:
+                    cache_keys[page_num] = key
+        
+        # Only pages with OCR work go to the pool; text-only pages are cheap to extract here
+        ocr_pages = [page_num for page_num in range(len(plan))
+                     if page_num not in cached_pages and _pdf_page_needs_ocr(pdf_doc, page_num, plan[page_num])]
+        workers = min(workers or PDF_OCR_WORKERS, len(ocr_pages))
+        
+        def finished(page_result):
+            key = cache_keys.get(page_result["page"] - 1)
+            if key and not page_result["failed"]:  # Retry failed pages next time
+                cache.put(key, _page_cache_entry(page_result))
+            return page_result
+        
+        executor = None
+        futures = {}
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_pdf_worker,
+                                           initargs=(pdf_bytes,))
+            futures = {page_num: executor.submit(_extract_pdf_page_in_worker, page_num, plan[page_num])
+                       for page_num in ocr_pages}
+        try:
+            for page_num in range(len(plan)):
+                if page_num in cached_pages:
+                    yield cached_pages[page_num]
+                elif page_num in futures:
+                    yield finished(futures[page_num].result())
+                else:
+                    yield finished(_extract_pdf_page(pdf_doc, page_num, plan[page_num]))
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+    finally:
         pdf_doc.close()
+
+def extract_text_from_pdf(pdf_file, cache=None):
+    try:
+        extracted_text = ""
+        all_extracted_data = []
+        
+        for page_result in iter_pdf_pages(pdf_file, cache=cache):
+            extracted_text += page_result["text"]
+            all_extracted_data.extend(page_result["data"])
+        
         return extracted_text.strip(), all_extracted_data
     
     except Exception as e:
@@ -123,8 +348,11 @@ def extract_text_from_pdf_with_pdf2image(pdf_file):
     except Exception as e:
         return f"Error extracting PDF with pdf2image: {str(e)}", []
 
-def extract_text_from_docx(docx_file):
-    """Extract text from Word document"""
+def extract_text_from_docx(docx_file, cache=None):
+    """Extract text from Word document, reusing the cached result for identical bytes"""
+    return _cached_extraction(docx_file, 'docx', _extract_text_from_docx, cache)
+
+def _extract_text_from_docx(docx_file):
     try:
         docx_file.seek(0)
         doc = Document(docx_file)
@@ -254,108 +482,238 @@ def clean_data_for_json(data):
 #     except Exception as e:
 #         return f"Error extracting content from Excel: {str(e)}", []
 
-def extract_text_from_excel(excel_file):
-    """Extract text from Excel file, convert CSV to base64"""
+def _cell_text(value):
+    """Text of one object-column cell, as clean_data_for_json would render it"""
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return "" if pd.isna(value) else value.isoformat()
+    if isinstance(value, (float, np.floating)) and not np.isfinite(value):
+        return ""
+    if isinstance(value, np.generic):
+        value = value.item()
+    return "" if value is None else str(value)
+
+def _excel_text_frame(df):
+    """
+    Clean a sheet once: every cell as stripped text, with NaN, inf, NaT and
+    null-like strings as empty text and column names as strings
+    """
+    columns = {}
+    for position in range(df.shape[1]):
+        series = df.iloc[:, position]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            text = series.astype(str).where(series.notna(), "")
+        elif pd.api.types.is_bool_dtype(series):
+            text = series.astype(str)
+        elif pd.api.types.is_numeric_dtype(series):
+            text = series.astype(str).where(np.isfinite(series.astype(float)), "")
+        else:
+            text = series.map(_cell_text)
+        text = text.str.strip()
+        columns[position] = text.mask(text.str.lower().isin(['nan', 'nat', 'none', 'null']), "")
+    
+    text_frame = pd.DataFrame(columns, index=df.index)
+    text_frame.columns = [str(col) for col in df.columns]
+    return text_frame
+
+def _excel_row_text(text_frame):
+    """'col: value | col: value' for every row, skipping empty cells, built column by column"""
+    row_text = pd.Series("", index=text_frame.index)
+    for position, col in enumerate(text_frame.columns):
+        values = text_frame.iloc[:, position]
+        part = (col + ": ") + values
+        row_text = row_text.mask(values != "", row_text.where(row_text == "", row_text + " | ") + part)
+    return row_text
+
+def iter_csv_base64(df, chunk_rows=EXCEL_CSV_CHUNK_ROWS, max_bytes=None):
+    """
+    Yield the base64 encoding of a frame's CSV piece by piece
+    
+    The CSV is written chunk_rows rows at a time, so the whole CSV is never
+    held in memory. With max_bytes, output stops after the last complete
+    row that fits; the final item is then the bool True (truncated).
+    """
+    carry = b""
+    written = 0
+    truncated = False
+    
+    for start in range(0, max(len(df), 1), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows].to_csv(index=False, header=(start == 0)).encode('utf-8')
+        if max_bytes is not None and written + len(chunk) > max_bytes:
+            cut = chunk.rfind(b"\n", 0, max_bytes - written + 1) + 1
+            chunk = chunk[:cut]
+            truncated = True
+        written += len(chunk)
+        
+        data = carry + chunk
+        usable = len(data) - len(data) % 3
+        carry = data[usable:]
+        if usable:
+            yield base64.b64encode(data[:usable]).decode('utf-8')
+        if truncated:
+            break
+    
+    if carry:
+        yield base64.b64encode(carry).decode('utf-8')
+    if truncated:
+        yield True
+
+def extract_text_from_excel(excel_file, cache=None, include_csv=True, csv_max_bytes=EXCEL_CSV_MAX_BYTES):
+    """
+    Extract text from Excel file, optionally with each sheet's CSV in base64
+    
+    Reuses the cached result for identical bytes and options. csv_max_bytes
+    caps each sheet's CSV (None for no cap); a capped CSV ends at a row
+    boundary and its entry is marked "truncated".
+    """
+    options = {"include_csv": include_csv, "csv_max_bytes": csv_max_bytes}
+    return _cached_extraction(
+        excel_file, 'excel',
+        lambda f: _extract_text_from_excel(f, include_csv, csv_max_bytes),
+        cache, options
+    )
+
+def _extract_text_from_excel(excel_file, include_csv=True, csv_max_bytes=None):
     try:
         excel_file.seek(0)
         
         # Read all sheets from the Excel file
         df_dict = pd.read_excel(excel_file, sheet_name=None)
         
-        extracted_text = ""
+        text_parts = []
         all_extracted_data = []
         
         for sheet_name, df in df_dict.items():
-            df = df.replace([np.nan, np.inf, -np.inf], "")
-            df = df.fillna("")
-
-            for col in df.columns:
-                if df[col].dtype == 'datetime64[ns]' or 'datetime' in str(df[col].dtype):
-                    df[col] = df[col].astype(str).replace('NaT', '')
+            text_parts.append(f"\n=== Sheet: {sheet_name} ===\n")
             
-            sheet_text = f"\n=== Sheet: {sheet_name} ===\n"
+            if df.empty:
+                text_parts.append("Sheet is empty\n")
+                continue
             
-            if not df.empty:
-                headers = df.columns.tolist()
-                sheet_text += "Columns: " + " | ".join(str(col) for col in headers) + "\n\n"
-                
-                for idx, row in df.iterrows():
-                    row_dict = {}
-                    row_text_parts = []
-                    
-                    for col, val in row.items():
-                        cleaned_val = clean_data_for_json(val)
-                        row_dict[str(col)] = cleaned_val
-                        
-                        if cleaned_val and str(cleaned_val).strip():
-                            row_text_parts.append(f"{col}: {cleaned_val}")
-                    
-                    row_text = " | ".join(row_text_parts)
-                    
-                    if row_text:
-                        sheet_text += f"Row {idx + 1}: {row_text}\n"
-                        all_extracted_data.append({
-                            "page": int(idx + 1),
-                            "sheet": str(sheet_name),
-                            "source": "excel_row",
-                            "content": row_text,
-                            "structured_data": row_dict
-                        })
+            text_frame = _excel_text_frame(df)
+            text_parts.append("Columns: " + " | ".join(text_frame.columns) + "\n\n")
+            
+            row_text = _excel_row_text(text_frame)
+            keep = (row_text != "").to_numpy()
+            row_numbers = (text_frame.index[keep] + 1).astype(str)
+            row_text = row_text[keep]
+            records = text_frame[keep].to_dict('records')
+            
+            text_parts.extend(f"Row {number}: {text}\n" for number, text in zip(row_numbers, row_text))
+            all_extracted_data.extend(
+                {
+                    "page": number,
+                    "sheet": str(sheet_name),
+                    "source": "excel_row",
+                    "content": text,
+                    "structured_data": record
+                }
+                for number, text, record in zip(row_numbers, row_text, records)
+            )
+            
+            if include_csv:
+                pieces = list(iter_csv_base64(text_frame, max_bytes=csv_max_bytes))
+                truncated = bool(pieces) and pieces[-1] is True
+                encoded_csv = "".join(pieces[:-1] if truncated else pieces)
                 
-                # Generate CSV representation
-                csv_representation = df.to_csv(index=False)
-
-                # Encode CSV representation to base64
-                encoded_csv = base64.b64encode(csv_representation.encode('utf-8')).decode('utf-8')
-
-                # Include encoded CSV in the extracted data
-                all_extracted_data.append({
-                    "page": sheet_name,
+                csv_entry = {
+                    "page": str(sheet_name),
                     "source": "csv_base64",
                     "content": encoded_csv
-                })
-
-                sheet_text += f"\nCSV Format (Base64 encoded):\n{encoded_csv}\n"
-            else:
-                sheet_text += "Sheet is empty\n"
-            
-            extracted_text += sheet_text
+                }
+                if truncated:
+                    csv_entry["truncated"] = "true"
+                all_extracted_data.append(csv_entry)
+                
+                label = "CSV Format (Base64 encoded, truncated)" if truncated else "CSV Format (Base64 encoded)"
+                text_parts.append(f"\n{label}:\n{encoded_csv}\n")
         
         if not all_extracted_data:
             all_extracted_data = [{
-                "page": 1,
+                "page": "1",
                 "source": "excel_empty",
                 "content": "Excel file appears to be empty or contains no readable data"
             }]
         
-        all_extracted_data = clean_data_for_json(all_extracted_data)
-        
-        return extracted_text.strip(), all_extracted_data
+        return "".join(text_parts).strip(), all_extracted_data
         
     except Exception as e:
         return f"Error extracting content from Excel: {str(e)}", []
 
 
-def send_raw_to_n8n(raw_data, webhook_url, file_name):
+_n8n_http_session = None
+
+def _n8n_session():
+    """Shared HTTP session, so webhook calls reuse pooled connections"""
+    global _n8n_http_session
+    if _n8n_http_session is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=max(N8N_MAX_CONCURRENCY, 1))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _n8n_http_session = session
+    return _n8n_http_session
+
+def _n8n_body(raw_json, file_name):
+    """Webhook JSON body around an already serialized raw_data"""
+    file_extension = os.path.splitext(file_name)[1].lower()
+    fields = json.dumps({
+        "timestamp": datetime.now().isoformat(),
+        "file_name": file_name,
+        "file_type": file_extension.replace(".", "")  # Add file type for workflow routing
+    })
+    return ('{"raw_data": ' + raw_json + ', ' + fields[1:]).encode('utf-8')
+
+def _n8n_request_not_sent(error):
+    """Whether a request exception proves the webhook never received the request"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+def send_raw_to_n8n(raw_data, webhook_url, file_name, raw_json=None, read_timeout=None):
     """
     Send raw extracted data to n8n workflow via webhook
+    
+    Uses a pooled session with a timeout and gzips bodies of at least
+    N8N_GZIP_MIN_BYTES. Only failures that show the workflow did not run
+    (no connection, 429, 503) are retried, with exponential backoff; every
+    attempt carries the same Idempotency-Key header. raw_json, when given,
+    is raw_data already serialized, so repeated sends skip re-encoding it.
     """
     try:
-        headers = {
-            "Content-Type": "application/json"
-        }
+        if raw_json is None:
+            raw_json = json.dumps(raw_data, default=str)
+        body = _n8n_body(raw_json, file_name)
         
-        # Get file extension for specialized processing
-        file_extension = os.path.splitext(file_name)[1].lower()
-        
-        payload = {
-            "raw_data": raw_data,
-            "timestamp": datetime.now().isoformat(),
-            "file_name": file_name,
-            "file_type": file_extension.replace(".", "")  # Add file type for workflow routing
+        headers = {
+            "Content-Type": "application/json",
+            "Idempotency-Key": uuid.uuid4().hex
         }
+        compress = bool(N8N_GZIP_MIN_BYTES) and len(body) >= N8N_GZIP_MIN_BYTES
+        timeout = (N8N_CONNECT_TIMEOUT, read_timeout or N8N_READ_TIMEOUT)
         
-        response = requests.post(webhook_url, json=payload, headers=headers)
+        session = _n8n_session()
+        attempt = 0
+        while True:
+            try:
+                if compress:
+                    response = session.post(webhook_url, data=gzip.compress(body),
+                                            headers={**headers, "Content-Encoding": "gzip"},
+                                            timeout=timeout)
+                    if response.status_code == 415:  # Webhook does not take gzip; send it plain
+                        compress = False
+                        continue
+                else:
+                    response = session.post(webhook_url, data=body, headers=headers, timeout=timeout)
+            except requests.ConnectionError as e:
+                if not _n8n_request_not_sent(e) or attempt >= N8N_RETRIES:
+                    raise
+            else:
+                if response.status_code not in N8N_RETRY_STATUSES or attempt >= N8N_RETRIES:
+                    break
+            
+            time.sleep(N8N_BACKOFF * (2 ** attempt))
+            attempt += 1
         
         if response.status_code == 200:
             return True, response.json(), f"Successfully sent raw data to n8n workflow. Status: {response.status_code}"
@@ -365,6 +723,34 @@ def send_raw_to_n8n(raw_data, webhook_url, file_name):
     except Exception as e:
         return False, None, f"Exception when sending data to n8n: {str(e)}"
 
+def dispatch_to_n8n(raw_data, webhook_url, file_name, repeat_count, max_concurrency=None, read_timeout=None):
+    """
+    Send raw_data to the webhook repeat_count times, concurrently
+    
+    Iteration i is sent as f"{file_name}_part{i+1}"; raw_data is serialized
+    once for all of them. At most max_concurrency (N8N_MAX_CONCURRENCY)
+    requests are in flight at a time, each waiting up to read_timeout
+    (N8N_READ_TIMEOUT) seconds for the workflow's response.
+    
+    Returns:
+        send_raw_to_n8n's (success, response, message) per iteration, in iteration order
+    """
+    try:
+        raw_json = json.dumps(raw_data, default=str)
+    except Exception as e:
+        return [(False, None, f"Exception when sending data to n8n: {str(e)}")] * repeat_count
+    
+    def send(name):
+        return send_raw_to_n8n(raw_data, webhook_url, name, raw_json, read_timeout)
+    
+    names = [f"{file_name}_part{i+1}" for i in range(repeat_count)]
+    workers = min(max_concurrency or N8N_MAX_CONCURRENCY, repeat_count)
+    if workers <= 1:
+        return [send(name) for name in names]
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(send, names))
+
 def save_to_excel(new_data, excel_path, filename, current_row=1):
     """Save data to Excel with proper formatting and structure"""
     try:
@@ -88,4 +88,23 @@ class AuditLogModel:
             "status": status,
             "details": details or {},
             "ip_address": None  # Can be added from request context
-        }
\ No newline at end of file
+        }
+
+class ExtractionCacheModel:
+    """Model for cached extraction results, keyed by content hash and extractor version"""
+    
+    @staticmethod
+    def create_entry(key: str, payload: Optional[Dict] = None,
+                     file_id: Optional[ObjectId] = None, size: int = 0) -> Dict:
+        extractor, version, content_hash = key.split(":", 2)
+        return {
+            "_id": key,
+            "extractor": extractor,
+            "extractor_version": version,
+            "content_hash": content_hash,
+            "payload": payload,  # None when the payload is stored in GridFS
+            "file_id": file_id,
+            "size": size,
+            "created_at": datetime.utcnow(),
+            "last_used": datetime.utcnow()
+        }
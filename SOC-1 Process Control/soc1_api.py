@@ -20,10 +20,10 @@ from document_processor import (
     extract_text_from_docx,
     extract_text_from_excel,
     clean_data_for_json,
-    send_raw_to_n8n,
+    dispatch_to_n8n,
     save_to_excel
 )
-from db_operations import doc_ops, session_ops, result_ops, audit_ops
+from db_operations import doc_ops, session_ops, result_ops, audit_ops, extraction_cache_ops
 
 # Initialize Flask
 app = Flask(__name__)
@@ -110,6 +110,11 @@ def tool_info():
                     "type": "boolean",
                     "default": False,
                     "description": "Whether to finalize and generate control sheet"
+                },
+                "n8n_timeout": {
+                    "type": "number",
+                    "default": None,
+                    "description": "Seconds to wait for each n8n iteration's response (default: N8N_READ_TIMEOUT)"
                 }
             }
         },
@@ -163,6 +168,7 @@ def execute():
         # Get optional parameters
         repeat_count = int(request.form.get('repeat_count', 1))
         finalize = request.form.get('finalize', 'false').lower() == 'true'
+        n8n_timeout = float(request.form['n8n_timeout']) if request.form.get('n8n_timeout') else None
         
         # Save uploaded file
         filename = secure_filename(file.filename)
@@ -186,7 +192,7 @@ def execute():
         try:
             if file_extension == '.pdf':
                 with open(file_path, 'rb') as f:
-                    raw_text, extracted_data = extract_text_from_pdf(f)
+                    raw_text, extracted_data = extract_text_from_pdf(f, cache=extraction_cache_ops)
                     if len(raw_text.strip()) < 100:
                         alt_text, alt_data = extract_text_from_pdf_with_pdf2image(f)
                         if len(alt_text.strip()) > len(raw_text.strip()):
@@ -195,11 +201,11 @@ def execute():
             
             elif file_extension == '.docx':
                 with open(file_path, 'rb') as f:
-                    raw_text, extracted_data = extract_text_from_docx(f)
+                    raw_text, extracted_data = extract_text_from_docx(f, cache=extraction_cache_ops)
             
             elif file_extension in ['.xlsx', '.xls']:
                 with open(file_path, 'rb') as f:
-                    raw_text, extracted_data = extract_text_from_excel(f)
+                    raw_text, extracted_data = extract_text_from_excel(f, cache=extraction_cache_ops)
             
             elif file_extension in ['.png', '.jpg', '.jpeg']:
                 from PIL import Image
@@ -284,13 +290,12 @@ def execute():
         
         all_results = []
         
-        # Process with n8n (repeat if needed)
-        for i in range(repeat_count):
+        # Process with n8n (repeat if needed); iterations are sent concurrently, handled in order
+        dispatch_results = dispatch_to_n8n(cleaned_extracted_data, webhook_url, filename, repeat_count,
+                                           read_timeout=n8n_timeout)
+        
+        for i, (success, n8n_response, message) in enumerate(dispatch_results):
             try:
-                success, n8n_response, message = send_raw_to_n8n(
-                    cleaned_extracted_data, webhook_url, f"{filename}_part{i+1}"
-                )
-                
                 if not success:
                     session_ops.add_processing_step(
                         session_id, f"n8n_iteration_{i+1}", "failed",
@@ -71,6 +71,7 @@ except Exception as e:
 # Import models
 try:
     from models import FileUpload, Deposit, InterestCalculation, AgingAnalysis, AuditProgram, Report, AuditLog
+    from services.report_generator import invalidate_report_cache
     print("✓ Models imported")
 except Exception as e:
     print(f"✗ Models import error: {str(e)}")
@@ -140,7 +141,9 @@ def upload_file():
                 return jsonify({
                     'message': 'File processed successfully',
                     'file_id': str(file_upload.id),
-                    'processed_records': result['records_processed']
+                    'processed_records': result['records_processed'],
+                    'rows_per_second': result['rows_per_second'],
+                    'row_errors': result['errors']
                 })
             except ValueError as e:
                 return jsonify({'error': str(e)}), 400
@@ -169,6 +172,7 @@ def delete_file_upload(file_id):
             interest_deleted += InterestCalculation.objects(deposit=deposit).delete()
         
         deposits_deleted = Deposit.objects(file_upload=file_upload).delete()
+        invalidate_report_cache()
         
         if file_upload.file_path and os.path.exists(file_upload.file_path):
             os.remove(file_upload.file_path)
@@ -261,6 +265,7 @@ def delete_all_files():
         InterestCalculation.objects.delete()
         Deposit.objects.delete()
         FileUpload.objects.delete()
+        invalidate_report_cache()
         
         return jsonify({
             'success': True,
@@ -280,6 +285,7 @@ def cleanup_orphaned_data():
         else:
             orphaned = Deposit.objects(file_upload__nin=valid_file_ids).delete()
             orphaned += Deposit.objects(file_upload=None).delete()
+        invalidate_report_cache()
         
         return jsonify({'success': True, 'deposits_deleted': orphaned})
     except Exception as e:
@@ -346,7 +352,8 @@ def run_aging_analysis():
     try:
         from services.analysis_engine import AnalysisEngine
         engine = AnalysisEngine()
-        result = engine.perform_aging_analysis()
+        data = request.get_json(silent=True) or {}
+        result = engine.perform_aging_analysis(full_refresh=bool(data.get('full_refresh')))
         return jsonify(result)
     except Exception as e:
         print(f"Error running aging analysis: {str(e)}")
@@ -360,7 +367,8 @@ def calculate_interest():
     try:
         from services.analysis_engine import AnalysisEngine
         engine = AnalysisEngine()
-        result = engine.calculate_interest_accruals()
+        data = request.get_json(silent=True) or {}
+        result = engine.calculate_interest_accruals(full_refresh=bool(data.get('full_refresh')))
         return jsonify(result)
     except Exception as e:
         print(f"Error calculating interest: {str(e)}")
@@ -380,6 +388,49 @@ def get_aging_summary():
         print(f"Error getting summary: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+
+@app.route('/api/reports', methods=['GET'])
+def get_reports():
+    """Get one or more reports (e.g. ?types=summary,aging) in a single call."""
+    try:
+        from services.report_generator import ReportGenerator
+        types = request.args.get('types')
+        report_types = [t.strip() for t in types.split(',') if t.strip()] if types else None
+        reports = ReportGenerator().generate_reports(report_types)
+        return jsonify({'success': True, 'reports': reports})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error generating reports: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/analysis-runs', methods=['GET'])
+def get_analysis_runs():
+    """Get the analysis run ledger, newest first."""
+    try:
+        from models import AnalysisRun
+        limit = request.args.get('limit', 50, type=int)
+        runs = AnalysisRun.objects.order_by('-started_at').limit(limit)
+        runs_data = [{
+            'id': str(run.id),
+            'analysis_type': run.analysis_type,
+            'analysis_date': run.analysis_date.isoformat(),
+            'mode': run.mode,
+            'status': run.status,
+            'total_deposits': run.total_deposits,
+            'recomputed': run.recomputed,
+            'unchanged': run.unchanged,
+            'removed': run.removed,
+            'error_message': run.error_message,
+            'started_at': run.started_at.isoformat(),
+            'completed_at': run.completed_at.isoformat() if run.completed_at else None
+        } for run in runs]
+        return jsonify({'success': True, 'runs': runs_data})
+    except Exception as e:
+        print(f"Error getting analysis runs: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # Add this to your app.py file
 
 @app.route('/api/generate-audit-program', methods=['POST'])
@@ -26,4 +26,7 @@ class Config:
     ]
     
     # Dormancy threshold in days
-    DORMANCY_THRESHOLD_DAYS = 1095  # 3 years
\ No newline at end of file
+    DORMANCY_THRESHOLD_DAYS = 1095  # 3 years
+    
+    # Seconds a generated report is served from cache
+    REPORT_CACHE_TTL = int(os.getenv('REPORT_CACHE_TTL', 60))
@@ -60,6 +60,7 @@ class AgingAnalysis(Document):
     # ⭐ ADDED FIELD
     compliance_status = fields.StringField(default='compliant')  # compliant, under-review, non-compliant
     notes = fields.StringField()
+    deposit_version = fields.StringField()  # Hash of the deposit fields analyzed
     
     created_at = fields.DateTimeField(default=datetime.now)
     
@@ -82,6 +83,7 @@ class InterestCalculation(Document):
     interest_accrued = fields.FloatField(required=True)
     cumulative_interest = fields.FloatField(default=0.0)
     total_value = fields.FloatField(required=True)
+    deposit_version = fields.StringField()  # Hash of the deposit fields analyzed
     
     created_at = fields.DateTimeField(default=datetime.now)
     
@@ -91,6 +93,26 @@ class InterestCalculation(Document):
     }
 
 
+class AnalysisRun(Document):
+    """Ledger entry for one aging or interest analysis run."""
+    analysis_type = fields.StringField(required=True)  # aging, interest
+    analysis_date = fields.DateField(required=True)
+    mode = fields.StringField(default='incremental')  # incremental, full
+    status = fields.StringField(default='running')  # running, completed, failed
+    total_deposits = fields.IntField(default=0)
+    recomputed = fields.IntField(default=0)
+    unchanged = fields.IntField(default=0)
+    removed = fields.IntField(default=0)
+    error_message = fields.StringField()
+    started_at = fields.DateTimeField(default=datetime.now)
+    completed_at = fields.DateTimeField()
+    
+    meta = {
+        'collection': 'analysis_runs',
+        'indexes': ['analysis_type', 'analysis_date', 'status', 'started_at']
+    }
+
+
 class AuditProgram(Document):
     """Audit program."""
     name = fields.StringField(required=True)
@@ -17,8 +17,10 @@ from werkzeug.utils import secure_filename
 from datetime import datetime
 from pathlib import Path
 import json
+import numpy as np
 import pandas as pd
 import traceback
+import xlsxwriter
 
 # Configure logging
 logging.basicConfig(
@@ -40,6 +42,22 @@ OUTPUT_FOLDER.mkdir(exist_ok=True)
 
 ALLOWED_EXTENSIONS = {'.xlsx', '.xls', '.csv', '.pdf'}
 
+# Standalone aging buckets: upper bound of days overdue -> label
+OVERDUE_BUCKET_LIMITS = [30, 90, 180]
+OVERDUE_BUCKET_LABELS = ['0-30 days overdue', '31-90 days overdue', '91-180 days overdue', '180+ days overdue']
+
+# Report workbook styling (formats are created once per workbook)
+TITLE_COLOR = '#366092'
+HEADER_COLOR = '#4472C4'
+RISK_COLORS = {'high': '#FFC7CE', 'medium': '#FFEB9C', 'low': '#C6EFCE'}
+TOTALS_COLOR = '#E7E6E6'
+CURRENCY_FORMAT = '$#,##0.00'
+RATE_FORMAT = '0.00"%"'
+DATE_FORMAT = 'yyyy-mm-dd'
+
+# Rows converted for writing at a time
+WRITE_CHUNK_SIZE = 10000
+
 # Original app configuration
 ORIGINAL_APP_URL = "http://localhost:8567"
 ORIGINAL_APP_AVAILABLE = False
@@ -186,103 +204,239 @@ def process_excel_file_standalone(filepath: str) -> pd.DataFrame:
         raise
 
 
-def perform_aging_analysis(df: pd.DataFrame) -> dict:
-    """Perform aging analysis on deposits"""
+def aging_frame(df: pd.DataFrame, today: datetime) -> pd.DataFrame:
+    """Aging bucket and risk for every deposit, computed column-wise"""
+    deposit_date = df['deposit_date'].fillna(today) if 'deposit_date' in df.columns \
+        else pd.Series(pd.Timestamp(today), index=df.index)
+    maturity_date = df['maturity_date'] if 'maturity_date' in df.columns \
+        else pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+    maturity_date = maturity_date.fillna(deposit_date + pd.Timedelta(days=365))
+    
+    days_to_maturity = (maturity_date - pd.Timestamp(today)).dt.days.to_numpy()
+    overdue = days_to_maturity < 0
+    days_overdue = -days_to_maturity
+    
+    labels = np.array(OVERDUE_BUCKET_LABELS, dtype=object)
+    bucket = np.where(overdue, labels[np.searchsorted(OVERDUE_BUCKET_LIMITS, days_overdue)], 'Current')
+    risk = np.where(overdue, np.where(days_overdue > 90, 'high', 'medium'), 'low')
+    
+    return pd.DataFrame({
+        'account_number': df['account_number'].to_numpy() if 'account_number' in df.columns else '',
+        'customer_name': df['customer_name'].to_numpy() if 'customer_name' in df.columns else '',
+        'amount': df['amount'].astype(float).to_numpy() if 'amount' in df.columns else 0.0,
+        'deposit_date': deposit_date.dt.strftime('%Y-%m-%d').to_numpy(),
+        'maturity_date': maturity_date.dt.strftime('%Y-%m-%d').to_numpy(),
+        'days_to_maturity': days_to_maturity,
+        'aging_bucket': bucket,
+        'risk_level': risk
+    })
+
+
+def interest_frame(df: pd.DataFrame, today: datetime) -> pd.DataFrame:
+    """Simple interest for every deposit with a non-zero rate, computed column-wise"""
+    rate = df['interest_rate'].astype(float) if 'interest_rate' in df.columns \
+        else pd.Series(0.0, index=df.index)
+    earning = df[(rate != 0).to_numpy()]
+    rate = rate[(rate != 0).to_numpy()].to_numpy()
+    
+    amount = earning['amount'].astype(float).to_numpy() if 'amount' in earning.columns else np.zeros(len(earning))
+    deposit_date = earning['deposit_date'].fillna(today) if 'deposit_date' in earning.columns \
+        else pd.Series(pd.Timestamp(today), index=earning.index)
+    days_held = (pd.Timestamp(today) - deposit_date).dt.days.to_numpy()
+    interest_earned = amount * rate * (days_held / 365.0)
+    
+    return pd.DataFrame({
+        'account_number': earning['account_number'].to_numpy() if 'account_number' in earning.columns else '',
+        'customer_name': earning['customer_name'].to_numpy() if 'customer_name' in earning.columns else '',
+        'principal': amount,
+        'interest_rate': rate * 100,  # As percentage
+        'days_held': days_held,
+        'interest_earned': interest_earned,
+        'total_value': amount + interest_earned
+    })
+
+
+def perform_aging_analysis(df: pd.DataFrame, as_frame: bool = False) -> dict:
+    """Perform aging analysis on deposits (results as records, or a DataFrame if as_frame)"""
     try:
-        today = datetime.now()
-        results = []
-        
-        for idx, row in df.iterrows():
-            deposit_date = row.get('deposit_date', today)
-            if pd.isna(deposit_date):
-                deposit_date = today
-            
-            maturity_date = row.get('maturity_date')
-            if pd.isna(maturity_date):
-                maturity_date = deposit_date + pd.Timedelta(days=365)
-            
-            days_to_maturity = (maturity_date - today).days
-            
-            # Determine aging bucket
-            if days_to_maturity < 0:
-                days_overdue = abs(days_to_maturity)
-                if days_overdue <= 30:
-                    bucket = '0-30 days overdue'
-                elif days_overdue <= 90:
-                    bucket = '31-90 days overdue'
-                elif days_overdue <= 180:
-                    bucket = '91-180 days overdue'
-                else:
-                    bucket = '180+ days overdue'
-                risk = 'high' if days_overdue > 90 else 'medium'
-            else:
-                bucket = 'Current'
-                risk = 'low'
-            
-            results.append({
-                'account_number': row.get('account_number', ''),
-                'customer_name': row.get('customer_name', ''),
-                'amount': float(row.get('amount', 0)),
-                'deposit_date': str(deposit_date.date()),
-                'maturity_date': str(maturity_date.date()) if not pd.isna(maturity_date) else None,
-                'days_to_maturity': days_to_maturity,
-                'aging_bucket': bucket,
-                'risk_level': risk
-            })
+        results = aging_frame(df, datetime.now())
         
         return {
             'status': 'success',
             'total_analyzed': len(results),
-            'results': results
+            'results': results if as_frame else results.to_dict('records')
         }
     except Exception as e:
         logger.error(f"Aging analysis error: {str(e)}")
         return {'status': 'error', 'error': str(e)}
 
 
-def calculate_interest_standalone(df: pd.DataFrame) -> dict:
-    """Calculate interest accruals"""
+def calculate_interest_standalone(df: pd.DataFrame, as_frame: bool = False) -> dict:
+    """Calculate interest accruals (results as records, or a DataFrame if as_frame)"""
     try:
-        today = datetime.now()
-        results = []
-        
-        for idx, row in df.iterrows():
-            amount = float(row.get('amount', 0))
-            rate = float(row.get('interest_rate', 0))
-            
-            if rate == 0:
-                continue
-            
-            deposit_date = row.get('deposit_date', today)
-            if pd.isna(deposit_date):
-                deposit_date = today
-            
-            days_held = (today - deposit_date).days
-            years_held = days_held / 365.0
-            
-            interest_earned = amount * rate * years_held
-            total_value = amount + interest_earned
-            
-            results.append({
-                'account_number': row.get('account_number', ''),
-                'customer_name': row.get('customer_name', ''),
-                'principal': amount,
-                'interest_rate': rate * 100,  # As percentage
-                'days_held': days_held,
-                'interest_earned': interest_earned,
-                'total_value': total_value
-            })
+        results = interest_frame(df, datetime.now())
         
         return {
             'status': 'success',
             'total_calculated': len(results),
-            'results': results
+            'results': results if as_frame else results.to_dict('records')
         }
     except Exception as e:
         logger.error(f"Interest calculation error: {str(e)}")
         return {'status': 'error', 'error': str(e)}
 
 
+class ReportWorkbook:
+    """
+    Write-only analysis workbook
+    
+    Uses xlsxwriter's constant_memory mode: each row is flushed to disk as
+    soon as the next one starts, so memory stays flat however many rows are
+    written. Formats are created once and column widths/number formats are
+    set per column rather than per cell.
+    """
+    
+    def __init__(self, output_path: str):
+        self.workbook = xlsxwriter.Workbook(output_path, {
+            'constant_memory': True,
+            'strings_to_urls': False,
+            'nan_inf_to_errors': True
+        })
+        add = self.workbook.add_format
+        
+        self.title_format = add({'bold': True, 'size': 14, 'font_color': '#FFFFFF',
+                                 'bg_color': TITLE_COLOR, 'align': 'center', 'valign': 'vcenter'})
+        self.banner_format = add({'bold': True, 'size': 16, 'font_color': '#FFFFFF',
+                                  'bg_color': TITLE_COLOR, 'align': 'center', 'valign': 'vcenter'})
+        self.section_format = add({'bold': True, 'size': 12})
+        self.label_format = add({'bold': True})
+        self.ok_format = add({'font_color': '#008000'})
+        self.header_format = add({'bold': True, 'font_color': '#FFFFFF', 'bg_color': HEADER_COLOR,
+                                  'align': 'center'})
+        self.bordered_header_format = add({'bold': True, 'font_color': '#FFFFFF', 'bg_color': HEADER_COLOR,
+                                           'align': 'center', 'border': 1})
+        self.currency_format = add({'num_format': CURRENCY_FORMAT})
+        self.rate_format = add({'num_format': RATE_FORMAT})
+        self.date_format = add({'num_format': DATE_FORMAT})
+        self.risk_formats = {level: add({'bg_color': color}) for level, color in RISK_COLORS.items()}
+        self.totals_label_format = add({'bold': True, 'size': 12, 'bg_color': TOTALS_COLOR})
+        self.totals_currency_format = add({'bold': True, 'num_format': CURRENCY_FORMAT, 'bg_color': TOTALS_COLOR})
+        self.totals_format = add({'bg_color': TOTALS_COLOR})
+    
+    def sheet_count(self) -> int:
+        return len(self.workbook.worksheets())
+    
+    def close(self):
+        self.workbook.close()
+    
+    def _title(self, worksheet, text: str, width: int, cell_format):
+        """Title across the first row"""
+        if width > 1:
+            worksheet.merge_range(0, 0, 0, width - 1, text, cell_format)
+        else:
+            worksheet.write(0, 0, text, cell_format)
+    
+    def _rows(self, frame: pd.DataFrame):
+        """Frame rows as tuples with missing values blank, converted a chunk at a time"""
+        for start in range(0, len(frame), WRITE_CHUNK_SIZE):
+            chunk = frame.iloc[start:start + WRITE_CHUNK_SIZE].astype(object)
+            yield from chunk.where(chunk.notna(), None).itertuples(index=False, name=None)
+    
+    def _table(self, worksheet, frame: pd.DataFrame, header_row: int, headers: list, header_format,
+               width: int, column_formats: dict, cell_formats: dict = None):
+        """
+        Header plus one row per frame row
+        
+        Args:
+            column_formats: Column position -> format applied to the whole column
+            cell_formats: Column position -> {value: format} for per-value styling
+        """
+        for position in range(len(headers)):
+            worksheet.set_column(position, position, width, column_formats.get(position))
+        worksheet.write_row(header_row, 0, headers, header_format)
+        
+        cell_formats = cell_formats or {}
+        for row, values in enumerate(self._rows(frame), header_row + 1):
+            worksheet.write_row(row, 0, values)
+            for position, formats in cell_formats.items():
+                cell_format = formats.get(values[position])
+                if cell_format is not None:
+                    worksheet.write(row, position, values[position], cell_format)
+    
+    def add_summary(self, info: list, analysis_results: dict):
+        worksheet = self.workbook.add_worksheet("Summary")
+        worksheet.set_column(0, 0, 25)
+        worksheet.set_column(1, 1, 40)
+        
+        worksheet.set_row(0, 30)
+        self._title(worksheet, "SECURITIES DEPOSITS ANALYSIS", 5, self.banner_format)
+        
+        row = 2
+        worksheet.write(row, 0, "Session Information", self.section_format)
+        row += 1
+        for label, value in info:
+            worksheet.write(row, 0, label, self.label_format)
+            worksheet.write(row, 1, value)
+            row += 1
+        
+        # Analysis Results Summary
+        row += 2
+        worksheet.write(row, 0, "Analysis Results Summary", self.section_format)
+        row += 1
+        for analysis_name, result in analysis_results.items():
+            worksheet.write(row, 0, f"{analysis_name.title()} Analysis:", self.label_format)
+            worksheet.write(row, 1, f"✓ {result.get('total_analyzed', result.get('total_calculated', 0))} records",
+                            self.ok_format)
+            row += 1
+    
+    def add_aging(self, aging_df: pd.DataFrame):
+        worksheet = self.workbook.add_worksheet("Aging Analysis")
+        columns = list(aging_df.columns)
+        self._title(worksheet, "AGING ANALYSIS", 8, self.title_format)
+        self._table(
+            worksheet, aging_df, 2,
+            [column.replace('_', ' ').title() for column in columns], self.bordered_header_format, 15,
+            column_formats={columns.index('amount'): self.currency_format},
+            cell_formats={columns.index('risk_level'): self.risk_formats}
+        )
+    
+    def add_interest(self, interest_df: pd.DataFrame):
+        worksheet = self.workbook.add_worksheet("Interest Calculations")
+        columns = list(interest_df.columns)
+        currency_columns = [columns.index(name) for name in ('principal', 'interest_earned', 'total_value')]
+        
+        self._title(worksheet, "INTEREST CALCULATIONS", 7, self.title_format)
+        column_formats = {position: self.currency_format for position in currency_columns}
+        column_formats[columns.index('interest_rate')] = self.rate_format
+        self._table(
+            worksheet, interest_df, 2,
+            [column.replace('_', ' ').title() for column in columns], self.bordered_header_format, 18,
+            column_formats=column_formats
+        )
+        
+        # Totals row, one blank row below the data
+        total_row = len(interest_df) + 4
+        for position in range(len(columns)):
+            if position == 0:
+                worksheet.write(total_row, position, "TOTALS:", self.totals_label_format)
+            elif position in currency_columns:
+                total = float(interest_df[columns[position]].sum())
+                worksheet.write_number(total_row, position, total, self.totals_currency_format)
+            else:
+                worksheet.write_blank(total_row, position, None, self.totals_format)
+    
+    def add_raw_data(self, df: pd.DataFrame):
+        worksheet = self.workbook.add_worksheet("Raw Data")
+        self._title(worksheet, "RAW DEPOSIT DATA", len(df.columns), self.title_format)
+        column_formats = {
+            position: self.date_format
+            for position, dtype in enumerate(df.dtypes)
+            if pd.api.types.is_datetime64_any_dtype(dtype)
+        }
+        self._table(worksheet, df, 2, [str(column) for column in df.columns], self.header_format, 15,
+                    column_formats=column_formats)
+
+
 @app.route('/api/v1/execute', methods=['POST'])
 def execute_analysis():
     """Execute securities deposits analysis - EXCEL OUTPUT VERSION"""
@@ -419,55 +573,28 @@ def execute_analysis():
         
         logger.info(f"✅ Processed {records_processed} records")
         
-        # Run analyses
+        # Run analyses (results kept as DataFrames for the workbook)
         analysis_results = {}
         
         if analysis_type in ['aging', 'all']:
-            analysis_results['aging'] = perform_aging_analysis(df)
+            analysis_results['aging'] = perform_aging_analysis(df, as_frame=True)
             logger.info("✅ Aging analysis complete")
         
         if analysis_type in ['interest', 'all']:
-            analysis_results['interest'] = calculate_interest_standalone(df)
+            analysis_results['interest'] = calculate_interest_standalone(df, as_frame=True)
             logger.info("✅ Interest calculation complete")
         
         # ========================================================================
         # 🎯 GENERATE COMPREHENSIVE EXCEL REPORT (Like Other Tools!)
         # ========================================================================
         
-        import pandas as pd
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-        from openpyxl.utils.dataframe import dataframe_to_rows
-        
         output_filename = f"Securities_Deposits_Analysis_{session_id}.xlsx"
         output_path = OUTPUT_FOLDER / output_filename
         
-        wb = Workbook()
-        
-        # Remove default sheet
-        if 'Sheet' in wb.sheetnames:
-            wb.remove(wb['Sheet'])
+        report = ReportWorkbook(str(output_path))
         
-        # ====================================================================
         # SHEET 1: SUMMARY
-        # ====================================================================
-        ws_summary = wb.create_sheet("Summary", 0)
-        
-        # Header
-        ws_summary['A1'] = "SECURITIES DEPOSITS ANALYSIS"
-        ws_summary['A1'].font = Font(bold=True, size=16, color="FFFFFF")
-        ws_summary['A1'].fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        ws_summary['A1'].alignment = Alignment(horizontal='center', vertical='center')
-        ws_summary.merge_cells('A1:E1')
-        ws_summary.row_dimensions[1].height = 30
-        
-        # Session Info
-        row = 3
-        ws_summary[f'A{row}'] = "Session Information"
-        ws_summary[f'A{row}'].font = Font(bold=True, size=12)
-        row += 1
-        
-        info_data = [
+        report.add_summary([
             ("Session ID:", session_id),
             ("Analysis Date:", datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
             ("File Name:", file.filename),
@@ -475,198 +602,23 @@ def execute_analysis():
             ("Organization Type:", org_type),
             ("Analysis Type:", analysis_type),
             ("Analysis Mode:", "Standalone (MongoDB-free)")
-        ]
-        
-        for label, value in info_data:
-            ws_summary[f'A{row}'] = label
-            ws_summary[f'A{row}'].font = Font(bold=True)
-            ws_summary[f'B{row}'] = value
-            row += 1
-        
-        # Analysis Results Summary
-        row += 2
-        ws_summary[f'A{row}'] = "Analysis Results Summary"
-        ws_summary[f'A{row}'].font = Font(bold=True, size=12)
-        row += 1
-        
-        for analysis_name, result in analysis_results.items():
-            ws_summary[f'A{row}'] = f"{analysis_name.title()} Analysis:"
-            ws_summary[f'A{row}'].font = Font(bold=True)
-            ws_summary[f'B{row}'] = f"✓ {result.get('total_analyzed', result.get('total_calculated', 0))} records"
-            ws_summary[f'B{row}'].font = Font(color="008000")
-            row += 1
+        ], analysis_results)
         
-        # Auto-size columns
-        ws_summary.column_dimensions['A'].width = 25
-        ws_summary.column_dimensions['B'].width = 40
-        
-        # ====================================================================
         # SHEET 2: AGING ANALYSIS
-        # ====================================================================
-        if 'aging' in analysis_results and analysis_results['aging'].get('results'):
-            ws_aging = wb.create_sheet("Aging Analysis")
-            
-            # Header
-            ws_aging['A1'] = "AGING ANALYSIS"
-            ws_aging['A1'].font = Font(bold=True, size=14, color="FFFFFF")
-            ws_aging['A1'].fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            ws_aging['A1'].alignment = Alignment(horizontal='center')
-            ws_aging.merge_cells('A1:H1')
-            
-            # Convert to DataFrame
-            aging_df = pd.DataFrame(analysis_results['aging']['results'])
-            
-            # Write headers
-            headers = list(aging_df.columns)
-            for col_idx, header in enumerate(headers, 1):
-                cell = ws_aging.cell(row=3, column=col_idx)
-                cell.value = header.replace('_', ' ').title()
-                cell.font = Font(bold=True, color="FFFFFF")
-                cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-                cell.alignment = Alignment(horizontal='center')
-                cell.border = Border(
-                    left=Side(style='thin'),
-                    right=Side(style='thin'),
-                    top=Side(style='thin'),
-                    bottom=Side(style='thin')
-                )
-            
-            # Write data
-            for row_idx, row_data in enumerate(aging_df.values, 4):
-                for col_idx, value in enumerate(row_data, 1):
-                    cell = ws_aging.cell(row=row_idx, column=col_idx)
-                    cell.value = value
-                    
-                    # Format amounts
-                    if col_idx == 3:  # Amount column
-                        cell.number_format = '$#,##0.00'
-                    
-                    # Color code risk levels
-                    if col_idx == 8:  # Risk level column
-                        if value == 'high':
-                            cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-                        elif value == 'medium':
-                            cell.fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
-                        else:
-                            cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-            
-            # Auto-size columns
-            for col_idx in range(1, len(headers) + 1):
-                ws_aging.column_dimensions[chr(64 + col_idx)].width = 15
+        aging_df = analysis_results.get('aging', {}).get('results')
+        if aging_df is not None and len(aging_df):
+            report.add_aging(aging_df)
         
-        # ====================================================================
         # SHEET 3: INTEREST CALCULATIONS
-        # ====================================================================
-        if 'interest' in analysis_results and analysis_results['interest'].get('results'):
-            ws_interest = wb.create_sheet("Interest Calculations")
-            
-            # Header
-            ws_interest['A1'] = "INTEREST CALCULATIONS"
-            ws_interest['A1'].font = Font(bold=True, size=14, color="FFFFFF")
-            ws_interest['A1'].fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            ws_interest['A1'].alignment = Alignment(horizontal='center')
-            ws_interest.merge_cells('A1:G1')
-            
-            # Convert to DataFrame
-            interest_df = pd.DataFrame(analysis_results['interest']['results'])
-            
-            # Write headers
-            headers = list(interest_df.columns)
-            for col_idx, header in enumerate(headers, 1):
-                cell = ws_interest.cell(row=3, column=col_idx)
-                cell.value = header.replace('_', ' ').title()
-                cell.font = Font(bold=True, color="FFFFFF")
-                cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-                cell.alignment = Alignment(horizontal='center')
-                cell.border = Border(
-                    left=Side(style='thin'),
-                    right=Side(style='thin'),
-                    top=Side(style='thin'),
-                    bottom=Side(style='thin')
-                )
-            
-            # Write data with totals
-            total_principal = 0
-            total_interest = 0
-            total_value = 0
-            
-            for row_idx, row_data in enumerate(interest_df.values, 4):
-                for col_idx, value in enumerate(row_data, 1):
-                    cell = ws_interest.cell(row=row_idx, column=col_idx)
-                    cell.value = value
-                    
-                    # Format currency columns
-                    if col_idx in [3, 6, 7]:  # Principal, Interest, Total columns
-                        cell.number_format = '$#,##0.00'
-                        
-                        # Sum totals
-                        if col_idx == 3:
-                            total_principal += float(value) if value else 0
-                        elif col_idx == 6:
-                            total_interest += float(value) if value else 0
-                        elif col_idx == 7:
-                            total_value += float(value) if value else 0
-                    
-                    # Format percentage
-                    if col_idx == 4:  # Interest rate
-                        cell.number_format = '0.00"%"'
-            
-            # Add totals row
-            total_row = len(interest_df) + 5
-            ws_interest[f'A{total_row}'] = "TOTALS:"
-            ws_interest[f'A{total_row}'].font = Font(bold=True, size=12)
-            ws_interest[f'C{total_row}'] = total_principal
-            ws_interest[f'C{total_row}'].number_format = '$#,##0.00'
-            ws_interest[f'C{total_row}'].font = Font(bold=True)
-            ws_interest[f'F{total_row}'] = total_interest
-            ws_interest[f'F{total_row}'].number_format = '$#,##0.00'
-            ws_interest[f'F{total_row}'].font = Font(bold=True)
-            ws_interest[f'G{total_row}'] = total_value
-            ws_interest[f'G{total_row}'].number_format = '$#,##0.00'
-            ws_interest[f'G{total_row}'].font = Font(bold=True)
-            
-            # Highlight totals row
-            for col_idx in range(1, len(headers) + 1):
-                ws_interest.cell(row=total_row, column=col_idx).fill = PatternFill(
-                    start_color="E7E6E6",
-                    end_color="E7E6E6",
-                    fill_type="solid"
-                )
-            
-            # Auto-size columns
-            for col_idx in range(1, len(headers) + 1):
-                ws_interest.column_dimensions[chr(64 + col_idx)].width = 18
+        interest_df = analysis_results.get('interest', {}).get('results')
+        if interest_df is not None and len(interest_df):
+            report.add_interest(interest_df)
         
-        # ====================================================================
         # SHEET 4: RAW DATA
-        # ====================================================================
-        ws_raw = wb.create_sheet("Raw Data")
-        
-        # Header
-        ws_raw['A1'] = "RAW DEPOSIT DATA"
-        ws_raw['A1'].font = Font(bold=True, size=14, color="FFFFFF")
-        ws_raw['A1'].fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        ws_raw['A1'].alignment = Alignment(horizontal='center')
-        ws_raw.merge_cells(f'A1:{chr(64 + len(df.columns))}1')
-        
-        # Write DataFrame
-        for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=True), 3):
-            for c_idx, value in enumerate(row, 1):
-                cell = ws_raw.cell(row=r_idx, column=c_idx)
-                cell.value = value
-                
-                # Header row formatting
-                if r_idx == 3:
-                    cell.font = Font(bold=True, color="FFFFFF")
-                    cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-                    cell.alignment = Alignment(horizontal='center')
-        
-        # Auto-size columns
-        for col_idx in range(1, len(df.columns) + 1):
-            ws_raw.column_dimensions[chr(64 + col_idx)].width = 15
-        
-        # Save Excel file
-        wb.save(str(output_path))
+        report.add_raw_data(df)
+        
+        sheets_created = report.sheet_count()
+        report.close()
         logger.info(f"✅ Excel report generated: {output_filename}")
         
         # ========================================================================
@@ -680,14 +632,14 @@ def execute_analysis():
             'analyses_completed': len(analysis_results),
             'analysis_mode': 'standalone_no_mongodb',
             'file_type': Path(file.filename).suffix,
-            'sheets_created': len(wb.sheetnames)
+            'sheets_created': sheets_created
         }
         
         logger.info("=" * 70)
         logger.info("EXECUTION COMPLETE (standalone - Excel output)")
         logger.info(f"  Records: {records_processed}")
         logger.info(f"  Analyses: {len(analysis_results)}")
-        logger.info(f"  Sheets: {len(wb.sheetnames)}")
+        logger.info(f"  Sheets: {sheets_created}")
         logger.info(f"  Report: {output_filename}")
         logger.info("=" * 70)
         
@@ -3,10 +3,13 @@ Analysis engine for deposits aging and risk assessment
 Updated with proper field names and compliance tracking
 """
 
-from models import Deposit, AgingAnalysis, InterestCalculation
+from models import Deposit, AgingAnalysis, InterestCalculation, AnalysisRun
 from datetime import datetime, timedelta
 from mongoengine import Q
 
+from services.columnar_engine import ColumnarEngine
+from services.report_generator import invalidate_report_cache
+
 
 class AnalysisEngine:
     """Engine for analyzing deposits."""
@@ -20,16 +23,25 @@ class AnalysisEngine:
             {'name': '181-365', 'min': 181, 'max': 365, 'risk': 'high'},
             {'name': '365+', 'min': 366, 'max': 999999, 'risk': 'high'}
         ]
+        self.columnar = ColumnarEngine(self.aging_buckets)
     
-    def perform_aging_analysis(self):
-        """Perform aging analysis on all deposits."""
+    def perform_aging_analysis(self, full_refresh=False):
+        """
+        Perform aging analysis on all deposits.
+        
+        Stored results are only rewritten for deposits that changed or moved
+        bucket since their last analysis, unless full_refresh is set.
+        """
+        run = self._start_run('aging', full_refresh)
         try:
-            # Delete existing aging analysis
-            AgingAnalysis.objects.delete()
+            if full_refresh:
+                AgingAnalysis.objects.delete()
             
-            deposits = Deposit.objects.all()
+            deposits = self.columnar.load_deposits()
             
-            if not deposits:
+            if deposits.empty:
+                removed = AgingAnalysis.objects.delete()
+                self._finish_run(run, 0, 0, removed)
                 return {
                     'status': 'error',
                     'message': 'No deposits found',
@@ -40,78 +52,30 @@ class AnalysisEngine:
                 }
             
             today = datetime.now().date()
-            detailed_results = []
             
-            for deposit in deposits:
-                if not deposit.maturity_date:
-                    # If no maturity date, use 1 year from deposit date
-                    maturity_date = deposit.deposit_date + timedelta(days=365)
-                else:
-                    maturity_date = deposit.maturity_date
-                
-                # Calculate days to/since maturity
-                days_to_maturity = (maturity_date - today).days
-                
-                # Determine aging bucket and risk level
-                if days_to_maturity < 0:
-                    # Past maturity - use absolute value for aging
-                    days_since_maturity = abs(days_to_maturity)
-                    aging_bucket = self._get_aging_bucket(days_since_maturity)
-                    risk_level = 'high' if days_since_maturity > 90 else 'medium'
-                else:
-                    # Not yet matured
-                    aging_bucket = '0-30'  # Current
-                    risk_level = 'low'
-                
-                # Determine compliance status
-                compliance_status = self._determine_compliance(days_to_maturity, deposit)
-                
-                # Calculate days since last activity
-                last_activity = deposit.last_activity_date or deposit.deposit_date
-                days_since_activity = (today - last_activity).days
-                
-                # Create aging analysis record
-                aging = AgingAnalysis(
-                    deposit=deposit,
-                    analysis_date=today,
-                    days_to_maturity=days_to_maturity,
-                    aging_bucket=aging_bucket,
-                    risk_level=risk_level,
-                    amount=deposit.amount,
-                    compliance_status=compliance_status,
-                    notes=f"Days since activity: {days_since_activity}"
-                )
-                aging.save()
-                
-                detailed_results.append({
-                    'account_number': deposit.account_number,
-                    'customer_name': deposit.customer_name,
-                    'amount': deposit.amount,
-                    'deposit_date': deposit.deposit_date.isoformat(),
-                    'maturity_date': maturity_date.isoformat(),
-                    'days_since_maturity': abs(days_to_maturity) if days_to_maturity < 0 else None,
-                    'days_since_last_activity': days_since_activity,
-                    'aging_bucket': aging_bucket,
-                    'risk_level': risk_level,
-                    'compliance_status': compliance_status
-                })
+            # Bucket, risk and compliance for the whole book at once
+            aging = self.columnar.compute_aging(deposits, today)
+            recomputed, removed = self.columnar.sync_aging(aging, today)
+            self._finish_run(run, len(aging), recomputed, removed)
             
-            # Generate summary
-            summary = self._generate_aging_summary()
+            summary = self.columnar.summarize_aging(aging)
             
             return {
                 'status': 'success',
                 'total_deposits': len(deposits),
-                'total_analyzed': len(detailed_results),
+                'total_analyzed': len(aging),
+                'recomputed': recomputed,
+                'run_id': str(run.id),
                 'bucket_summary': summary.get('by_bucket', {}),
                 'risk_distribution': summary.get('by_risk', {}),
-                'detailed_results': detailed_results
+                'detailed_results': self.columnar.aging_records(aging)
             }
             
         except Exception as e:
             print(f"Aging analysis error: {str(e)}")
             import traceback
             traceback.print_exc()
+            self._fail_run(run, e)
             return {
                 'status': 'error',
                 'message': str(e),
@@ -121,31 +85,6 @@ class AnalysisEngine:
                 'detailed_results': []
             }
     
-    def _get_aging_bucket(self, days):
-        """Get aging bucket name based on days."""
-        for bucket in self.aging_buckets:
-            if bucket['min'] <= days <= bucket['max']:
-                return bucket['name']
-        return '365+'
-    
-    def _determine_compliance(self, days_to_maturity, deposit):
-        """Determine compliance status based on various factors."""
-        # Past maturity by more than 90 days
-        if days_to_maturity < -90:
-            return 'non-compliant'
-        
-        # Past maturity but within 90 days
-        if days_to_maturity < 0:
-            return 'under-review'
-        
-        # Check for unclaimed deposits (no activity for 180+ days)
-        if deposit.last_activity_date:
-            days_inactive = (datetime.now().date() - deposit.last_activity_date).days
-            if days_inactive > 180:
-                return 'under-review'
-        
-        return 'compliant'
-    
     def _generate_aging_summary(self):
         """Generate aging summary statistics."""
         try:
@@ -159,23 +98,24 @@ class AnalysisEngine:
                 }
             }
             
-            # Group by bucket
-            aging_records = AgingAnalysis.objects.all()
-            
-            for record in aging_records:
-                bucket = record.aging_bucket
-                risk = record.risk_level
-                amount = float(record.amount)
-                
-                # By bucket
-                if bucket not in summary['by_bucket']:
-                    summary['by_bucket'][bucket] = {'count': 0, 'amount': 0}
-                summary['by_bucket'][bucket]['count'] += 1
-                summary['by_bucket'][bucket]['amount'] += amount
-                
-                # By risk
-                if risk in summary['by_risk']:
-                    summary['by_risk'][risk] += 1
+            # Group by bucket and risk in the database
+            bucket_totals = {
+                row['_id']: row for row in AgingAnalysis.objects.aggregate([
+                    {'$group': {'_id': '$aging_bucket', 'count': {'$sum': 1}, 'amount': {'$sum': '$amount'}}}
+                ])
+            }
+            for bucket in self.aging_buckets:
+                row = bucket_totals.pop(bucket['name'], None)
+                if row:
+                    summary['by_bucket'][bucket['name']] = {'count': row['count'], 'amount': float(row['amount'])}
+            for bucket, row in bucket_totals.items():
+                summary['by_bucket'][bucket] = {'count': row['count'], 'amount': float(row['amount'])}
+            
+            for row in AgingAnalysis.objects.aggregate([
+                {'$group': {'_id': '$risk_level', 'count': {'$sum': 1}}}
+            ]):
+                if row['_id'] in summary['by_risk']:
+                    summary['by_risk'][row['_id']] = row['count']
             
             return summary
             
@@ -183,14 +123,23 @@ class AnalysisEngine:
             print(f"Summary generation error: {str(e)}")
             return {'by_bucket': {}, 'by_risk': {'low': 0, 'medium': 0, 'high': 0, 'critical': 0}}
     
-    def calculate_interest_accruals(self):
-        """Calculate interest accruals with proper field names."""
+    def calculate_interest_accruals(self, full_refresh=False):
+        """
+        Calculate interest accruals with proper field names.
+        
+        Stored results are only rewritten for deposits that changed or were
+        last calculated on an earlier date, unless full_refresh is set.
+        """
+        run = self._start_run('interest', full_refresh)
         try:
-            InterestCalculation.objects.delete()
+            if full_refresh:
+                InterestCalculation.objects.delete()
             
-            deposits = Deposit.objects.filter(interest_rate__gt=0)
+            deposits = self.columnar.load_deposits({'interest_rate': {'$gt': 0}})
             
-            if not deposits:
+            if deposits.empty:
+                removed = InterestCalculation.objects.delete()
+                self._finish_run(run, 0, 0, removed)
                 return {
                     'status': 'success',
                     'message': 'No deposits with interest rates found',
@@ -199,61 +148,61 @@ class AnalysisEngine:
                 }
             
             today = datetime.now().date()
-            interest_data = []
             
-            for deposit in deposits:
-                days_held = (today - deposit.deposit_date).days
-                years_held = days_held / 365.0
-                
-                # Simple interest calculation
-                principal = deposit.amount
-                rate = deposit.interest_rate
-                interest_earned = principal * rate * years_held
-                
-                # For first calculation, cumulative equals earned
-                cumulative = interest_earned
-                total_value = principal + cumulative
-                
-                interest_calc = InterestCalculation(
-                    deposit=deposit,
-                    calculation_date=today,
-                    interest_rate=rate,
-                    days_held=days_held,
-                    principal_amount=principal,
-                    interest_earned=interest_earned,
-                    interest_accrued=interest_earned,  # Same as earned
-                    cumulative_interest=cumulative,
-                    total_value=total_value
-                )
-                interest_calc.save()
-                
-                interest_data.append({
-                    'account_number': deposit.account_number,
-                    'customer_name': deposit.customer_name,
-                    'principal': principal,
-                    'interest_rate': rate * 100,  # Convert to percentage
-                    'days_held': days_held,
-                    'interest_earned': interest_earned,
-                    'cumulative_interest': cumulative,
-                    'total_value': total_value
-                })
+            # Simple interest for every deposit at once
+            interest = self.columnar.compute_interest(deposits, today)
+            recomputed, removed = self.columnar.sync_interest(interest, today)
+            self._finish_run(run, len(interest), recomputed, removed)
             
             return {
                 'status': 'success',
-                'total_calculated': len(interest_data),
-                'interest_data': interest_data
+                'total_calculated': len(interest),
+                'recomputed': recomputed,
+                'run_id': str(run.id),
+                'interest_data': self.columnar.interest_records(interest)
             }
             
         except Exception as e:
             print(f"Interest calculation error: {str(e)}")
             import traceback
             traceback.print_exc()
+            self._fail_run(run, e)
             return {
                 'status': 'error',
                 'message': str(e),
                 'total_calculated': 0
             }
     
+    def _start_run(self, analysis_type, full_refresh):
+        """Record the start of an analysis run in the run ledger."""
+        return AnalysisRun(
+            analysis_type=analysis_type,
+            analysis_date=datetime.now().date(),
+            mode='full' if full_refresh else 'incremental'
+        ).save()
+    
+    def _finish_run(self, run, total_deposits, recomputed, removed):
+        """Record a completed run's counts."""
+        if recomputed or removed:
+            invalidate_report_cache()
+        run.status = 'completed'
+        run.total_deposits = total_deposits
+        run.recomputed = recomputed
+        run.unchanged = total_deposits - recomputed
+        run.removed = removed
+        run.completed_at = datetime.now()
+        run.save()
+    
+    def _fail_run(self, run, error):
+        """Record a failed run."""
+        try:
+            run.status = 'failed'
+            run.error_message = str(error)
+            run.completed_at = datetime.now()
+            run.save()
+        except Exception as e:
+            print(f"Run ledger error: {str(e)}")
+    
     def identify_unclaimed_deposits(self, inactivity_days=180):
         """Identify unclaimed deposits."""
         try:
@@ -0,0 +1,334 @@
+"""
+Columnar aging and interest engine for deposits
+Loads deposits as arrays and analyzes the whole book in a few vectorized passes;
+only results that are new, changed, reclassified or from an earlier day are
+written back
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
+
+from models import Deposit, AgingAnalysis, InterestCalculation
+
+# Deposit fields the analysis reads (projection for the raw collection query)
+DEPOSIT_FIELDS = [
+    'account_number', 'customer_name', 'amount', 'interest_rate',
+    'deposit_date', 'maturity_date', 'last_activity_date'
+]
+DATE_FIELDS = ['deposit_date', 'maturity_date', 'last_activity_date']
+
+# Term assumed when a deposit has no maturity date
+DEFAULT_TERM_DAYS = 365
+
+# Days past maturity after which a deposit is high risk and non-compliant
+OVERDUE_RISK_DAYS = 90
+
+# Days without activity after which a current deposit goes under review
+INACTIVITY_REVIEW_DAYS = 180
+
+# Documents per insert_many / bulk_write call
+INSERT_CHUNK_SIZE = 10000
+
+# Stored aging fields that must match for a result to be kept as is
+AGING_CLASSIFICATION = ['aging_bucket', 'risk_level', 'compliance_status']
+
+
+class ColumnarEngine:
+    """Vectorized aging and interest calculations over deposit arrays."""
+
+    def __init__(self, aging_buckets):
+        """
+        Args:
+            aging_buckets: Bucket dicts ({'name', 'min', ...}) in ascending, contiguous order
+        """
+        self.bucket_names = np.array([bucket['name'] for bucket in aging_buckets], dtype=object)
+        self.bucket_edges = np.array([bucket['min'] for bucket in aging_buckets])
+
+    def load_deposits(self, query=None):
+        """Load deposits into a DataFrame, reading only the analyzed fields."""
+        projection = {field: 1 for field in DEPOSIT_FIELDS}
+        cursor = Deposit._get_collection().find(query or {}, projection)
+
+        deposits = pd.DataFrame(list(cursor), columns=['_id'] + DEPOSIT_FIELDS)
+        deposits['amount'] = pd.to_numeric(deposits['amount'], errors='coerce').fillna(0.0)
+        deposits['interest_rate'] = pd.to_numeric(deposits['interest_rate'], errors='coerce').fillna(0.0)
+        for field in DATE_FIELDS:
+            deposits[field] = pd.to_datetime(deposits[field], errors='coerce').dt.normalize()
+
+        deposits['version'] = self.deposit_versions(deposits)
+        return deposits
+
+    def deposit_versions(self, deposits):
+        """Content version per deposit: hash of the fields the analysis reads."""
+        hashes = pd.util.hash_pandas_object(deposits[DEPOSIT_FIELDS], index=False)
+        return hashes.map('{:016x}'.format).to_numpy(dtype=object)
+
+    def bucket_for_days(self, days):
+        """Bucket name for each day count (searchsorted over the bucket lower edges)."""
+        positions = np.searchsorted(self.bucket_edges, days, side='right') - 1
+        return self.bucket_names[np.clip(positions, 0, len(self.bucket_names) - 1)]
+
+    def compute_aging(self, deposits, today):
+        """
+        Aging, risk and compliance for every deposit.
+
+        Overdue deposits are bucketed by days past maturity; current deposits
+        fall in the first bucket.
+        """
+        today = pd.Timestamp(today)
+        deposit_date = deposits['deposit_date']
+        maturity_date = deposits['maturity_date'].fillna(deposit_date + pd.Timedelta(days=DEFAULT_TERM_DAYS))
+        last_activity = deposits['last_activity_date']
+
+        days_to_maturity = (maturity_date - today).dt.days.to_numpy()
+        overdue = days_to_maturity < 0
+        days_overdue = np.where(overdue, -days_to_maturity, 0)
+
+        aging_bucket = np.where(overdue, self.bucket_for_days(days_overdue), self.bucket_names[0])
+        risk_level = np.where(
+            overdue,
+            np.where(days_overdue > OVERDUE_RISK_DAYS, 'high', 'medium'),
+            'low'
+        )
+
+        days_since_activity = (today - last_activity.fillna(deposit_date)).dt.days.to_numpy()
+        inactive = (last_activity.notna() & ((today - last_activity).dt.days > INACTIVITY_REVIEW_DAYS)).to_numpy()
+        compliance_status = np.select(
+            [days_to_maturity < -OVERDUE_RISK_DAYS, overdue, inactive],
+            ['non-compliant', 'under-review', 'under-review'],
+            default='compliant'
+        )
+
+        return pd.DataFrame({
+            'deposit': deposits['_id'].to_numpy(),
+            'deposit_version': deposits['version'].to_numpy(),
+            'account_number': deposits['account_number'].to_numpy(),
+            'customer_name': deposits['customer_name'].to_numpy(),
+            'amount': deposits['amount'].to_numpy(),
+            'deposit_date': deposit_date.to_numpy(),
+            'maturity_date': maturity_date.to_numpy(),
+            'days_to_maturity': days_to_maturity,
+            'days_since_activity': days_since_activity,
+            'aging_bucket': aging_bucket,
+            'risk_level': risk_level,
+            'compliance_status': compliance_status
+        })
+
+    def compute_interest(self, deposits, today):
+        """Simple interest to date for every deposit with a positive rate."""
+        today = pd.Timestamp(today)
+        earning = deposits[deposits['interest_rate'] > 0]
+
+        principal = earning['amount'].to_numpy()
+        rate = earning['interest_rate'].to_numpy()
+        days_held = (today - earning['deposit_date']).dt.days.to_numpy()
+        interest_earned = principal * rate * (days_held / 365.0)
+
+        return pd.DataFrame({
+            'deposit': earning['_id'].to_numpy(),
+            'deposit_version': earning['version'].to_numpy(),
+            'account_number': earning['account_number'].to_numpy(),
+            'customer_name': earning['customer_name'].to_numpy(),
+            'principal': principal,
+            'interest_rate': rate,
+            'days_held': days_held,
+            'interest_earned': interest_earned,
+            # First calculation: cumulative equals earned
+            'cumulative_interest': interest_earned,
+            'total_value': principal + interest_earned
+        })
+
+    def summarize_aging(self, aging):
+        """Count and amount per bucket (in bucket order) and count per risk level."""
+        by_bucket = {}
+        grouped = aging.groupby('aging_bucket')['amount'].agg(['count', 'sum'])
+        for name in self.bucket_names:
+            if name in grouped.index:
+                by_bucket[name] = {
+                    'count': int(grouped.at[name, 'count']),
+                    'amount': float(grouped.at[name, 'sum'])
+                }
+
+        risk_counts = aging['risk_level'].value_counts()
+        by_risk = {risk: int(risk_counts.get(risk, 0)) for risk in ('low', 'medium', 'high', 'critical')}
+
+        return {'by_bucket': by_bucket, 'by_risk': by_risk}
+
+    def aging_records(self, aging):
+        """Per-deposit aging results as JSON-ready dicts."""
+        overdue = aging['days_to_maturity'] < 0
+        records = pd.DataFrame({
+            'account_number': aging['account_number'],
+            'customer_name': aging['customer_name'],
+            'amount': aging['amount'],
+            'deposit_date': aging['deposit_date'].dt.strftime('%Y-%m-%d'),
+            'maturity_date': aging['maturity_date'].dt.strftime('%Y-%m-%d'),
+            'days_since_maturity': (-aging['days_to_maturity']).astype(object).where(overdue, None),
+            'days_since_last_activity': aging['days_since_activity'],
+            'aging_bucket': aging['aging_bucket'],
+            'risk_level': aging['risk_level'],
+            'compliance_status': aging['compliance_status']
+        })
+        return records.to_dict('records')
+
+    def interest_records(self, interest):
+        """Per-deposit interest results as JSON-ready dicts (rate as a percentage)."""
+        records = pd.DataFrame({
+            'account_number': interest['account_number'],
+            'customer_name': interest['customer_name'],
+            'principal': interest['principal'],
+            'interest_rate': interest['interest_rate'] * 100,
+            'days_held': interest['days_held'],
+            'interest_earned': interest['interest_earned'],
+            'cumulative_interest': interest['cumulative_interest'],
+            'total_value': interest['total_value']
+        })
+        return records.to_dict('records')
+
+    def aging_documents(self, aging, today):
+        """AgingAnalysis documents for aging results, in raw collection form."""
+        analysis_date = datetime(today.year, today.month, today.day)
+        created_at = datetime.now()
+        return [
+            {
+                'deposit': deposit,
+                'analysis_date': analysis_date,
+                'days_to_maturity': int(days_to_maturity),
+                'aging_bucket': aging_bucket,
+                'risk_level': risk_level,
+                'amount': float(amount),
+                'compliance_status': compliance_status,
+                'notes': f"Days since activity: {days_since_activity}",
+                'deposit_version': deposit_version,
+                'created_at': created_at
+            }
+            for deposit, days_to_maturity, aging_bucket, risk_level, amount, compliance_status, days_since_activity, deposit_version
+            in zip(
+                aging['deposit'], aging['days_to_maturity'], aging['aging_bucket'], aging['risk_level'],
+                aging['amount'], aging['compliance_status'], aging['days_since_activity'], aging['deposit_version']
+            )
+        ]
+
+    def interest_documents(self, interest, today):
+        """InterestCalculation documents for interest results, in raw collection form."""
+        calculation_date = datetime(today.year, today.month, today.day)
+        created_at = datetime.now()
+        return [
+            {
+                'deposit': deposit,
+                'calculation_date': calculation_date,
+                'interest_rate': float(rate),
+                'days_held': int(days_held),
+                'principal_amount': float(principal),
+                'interest_earned': float(earned),
+                'interest_accrued': float(earned),  # Same as earned
+                'cumulative_interest': float(cumulative),
+                'total_value': float(total),
+                'deposit_version': deposit_version,
+                'created_at': created_at
+            }
+            for deposit, rate, days_held, principal, earned, cumulative, total, deposit_version
+            in zip(
+                interest['deposit'], interest['interest_rate'], interest['days_held'], interest['principal'],
+                interest['interest_earned'], interest['cumulative_interest'], interest['total_value'],
+                interest['deposit_version']
+            )
+        ]
+
+    def sync_aging(self, aging, today):
+        """
+        Bring stored aging results in line with the current analysis.
+
+        Only deposits that are new, whose version changed, whose bucket,
+        risk or compliance status moved, or that were last analyzed on an
+        earlier date (days to maturity and since activity count from the
+        analysis date) are written; results for deposits no longer present
+        are removed.
+
+        Returns:
+            (recomputed, removed) counts
+        """
+        collection = AgingAnalysis._get_collection()
+        stored = self._stored_results(collection, AGING_CLASSIFICATION + ['analysis_date'])
+
+        merged = aging[['deposit', 'deposit_version'] + AGING_CLASSIFICATION].merge(
+            stored, on='deposit', how='left', suffixes=('', '_stored')
+        )
+        stale = merged['deposit_version_stored'].isna()
+        for column in ['deposit_version'] + AGING_CLASSIFICATION:
+            stale |= merged[column] != merged[f'{column}_stored']
+        stale |= pd.to_datetime(merged['analysis_date']) != pd.Timestamp(today)
+        stale = stale.to_numpy()
+
+        recomputed = self._write_results(collection, aging[stale], today, self.aging_documents, stored.empty)
+        removed = self._remove_results(collection, stored, aging['deposit'])
+        return recomputed, removed
+
+    def sync_interest(self, interest, today):
+        """
+        Bring stored interest results in line with the current calculation.
+
+        Interest accrues daily, so results calculated on an earlier date are
+        rewritten along with new and changed deposits; results for deposits
+        no longer earning interest are removed.
+
+        Returns:
+            (recomputed, removed) counts
+        """
+        collection = InterestCalculation._get_collection()
+        stored = self._stored_results(collection, ['calculation_date'])
+
+        merged = interest[['deposit', 'deposit_version']].merge(
+            stored, on='deposit', how='left', suffixes=('', '_stored')
+        )
+        stale = (
+            merged['deposit_version_stored'].isna()
+            | (merged['deposit_version'] != merged['deposit_version_stored'])
+            | (pd.to_datetime(merged['calculation_date']) != pd.Timestamp(today))
+        ).to_numpy()
+
+        recomputed = self._write_results(collection, interest[stale], today, self.interest_documents, stored.empty)
+        removed = self._remove_results(collection, stored, interest['deposit'])
+        return recomputed, removed
+
+    def _stored_results(self, collection, columns):
+        """Stored result per deposit: its deposit version plus the given fields."""
+        fields = ['deposit', 'deposit_version'] + columns
+        cursor = collection.find({}, {field: 1 for field in fields})
+        stored = pd.DataFrame(list(cursor), columns=['_id'] + fields).drop(columns='_id')
+        # Results written before versions were tracked never match
+        stored['deposit_version'] = stored['deposit_version'].fillna('')
+        return stored.drop_duplicates('deposit', keep='last')
+
+    def _write_results(self, collection, results, today, to_documents, insert_only):
+        """Insert (empty collection) or upsert by deposit, in chunks; returns the number written."""
+        written = 0
+        for start in range(0, len(results), INSERT_CHUNK_SIZE):
+            documents = to_documents(results.iloc[start:start + INSERT_CHUNK_SIZE], today)
+            if insert_only:
+                collection.insert_many(documents, ordered=False)
+            else:
+                collection.bulk_write([
+                    UpdateOne(
+                        {'deposit': document['deposit']},
+                        {
+                            '$set': {key: value for key, value in document.items() if key != 'created_at'},
+                            '$setOnInsert': {'created_at': document['created_at']}
+                        },
+                        upsert=True
+                    )
+                    for document in documents
+                ], ordered=False)
+            written += len(documents)
+        return written
+
+    def _remove_results(self, collection, stored, current_deposits):
+        """Delete stored results whose deposit is not in the current set; returns the number deleted."""
+        gone = stored.loc[~stored['deposit'].isin(current_deposits), 'deposit'].tolist()
+        removed = 0
+        for start in range(0, len(gone), INSERT_CHUNK_SIZE):
+            removed += collection.delete_many({'deposit': {'$in': gone[start:start + INSERT_CHUNK_SIZE]}}).deleted_count
+        return removed
@@ -4,11 +4,14 @@ Handles Excel, CSV, and PDF file processing with robust error handling
 """
 
 import os
+import time
+import numpy as np
 import pandas as pd
 import pdfplumber
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 import re
+from pymongo.errors import BulkWriteError
 
 
 class FileProcessor:
@@ -58,9 +61,23 @@ class FileProcessor:
         ]
     }
     
+    # Reverse lookup: column variation -> standard field name. Built from the
+    # last mapping to the first so the first mapping listing a variation wins
+    COLUMN_LOOKUP = {
+        variation: standard_name
+        for standard_name, variations in reversed(list(COLUMN_MAPPINGS.items()))
+        for variation in variations
+    }
+    
+    DATE_COLUMNS = ['deposit_date', 'maturity_date', 'last_activity_date']
+    
+    # Deposits per insert_many call
+    INSERT_CHUNK_SIZE = 5000
+    
     def __init__(self):
         self.processed_records = 0
         self.errors = []
+        self.rows_per_second = 0.0
     
     def process_file(self, file_path: str, file_upload_id: str) -> Dict[str, Any]:
         """
@@ -91,6 +108,7 @@ class FileProcessor:
             return {
                 'status': 'success',
                 'records_processed': records_saved,
+                'rows_per_second': self.rows_per_second,
                 'errors': self.errors
             }
             
@@ -229,16 +247,11 @@ class FileProcessor:
         # Convert column names to lowercase and strip whitespace
         df.columns = df.columns.str.lower().str.strip()
         
-        # Create mapping dictionary
-        column_map = {}
-        for col in df.columns:
-            for standard_name, variations in self.COLUMN_MAPPINGS.items():
-                if col in variations:
-                    column_map[col] = standard_name
-                    break
-        
         # Rename columns
-        df = df.rename(columns=column_map)
+        df = df.rename(columns=lambda col: self.COLUMN_LOOKUP.get(col, col))
+        
+        # Several source columns can map to one field; keep the first
+        df = df.loc[:, ~df.columns.duplicated()]
         
         return df
     
@@ -249,21 +262,18 @@ class FileProcessor:
         
         # Clean amount field - remove currency symbols, commas
         if 'amount' in df.columns:
-            df['amount'] = df['amount'].astype(str).str.replace('$', '').str.replace(',', '')
-            df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+            df['amount'] = self._to_number(df['amount'], r'[$,]')
         
         # Clean interest rate - convert percentage to decimal
         if 'interest_rate' in df.columns:
-            df['interest_rate'] = df['interest_rate'].astype(str).str.replace('%', '')
-            df['interest_rate'] = pd.to_numeric(df['interest_rate'], errors='coerce')
+            rate = self._to_number(df['interest_rate'], r'%')
             # If values are > 1, assume they're percentages and convert to decimal
-            df.loc[df['interest_rate'] > 1, 'interest_rate'] = df['interest_rate'] / 100
+            df['interest_rate'] = rate.where(~(rate > 1), rate / 100)
         
         # Parse dates
-        date_columns = ['deposit_date', 'maturity_date', 'last_activity_date']
-        for col in date_columns:
+        for col in self.DATE_COLUMNS:
             if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
+                df[col] = self._to_dates(df[col])
         
         # Fill missing required fields
         if 'account_number' not in df.columns:
@@ -287,43 +297,110 @@ class FileProcessor:
         
         return df
     
+    def _to_number(self, series: pd.Series, strip_pattern: str) -> pd.Series:
+        """Coerce a column to numbers, stripping symbols from text values"""
+        if pd.api.types.is_numeric_dtype(series):
+            return series.astype(float)
+        cleaned = series.astype(str).str.replace(strip_pattern, '', regex=True)
+        return pd.to_numeric(cleaned, errors='coerce')
+    
+    def _to_dates(self, series: pd.Series) -> pd.Series:
+        """
+        Parse a column to dates in one vectorized pass
+        
+        Values the inferred format misses (e.g. a time on some rows only)
+        are re-parsed individually; anything still unparseable becomes NaT.
+        """
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series
+        parsed = pd.to_datetime(series, errors='coerce')
+        retry = parsed.isna() & series.notna() & (series.astype(str).str.strip() != '')
+        if retry.any():
+            parsed[retry] = pd.to_datetime(series[retry].astype(str), errors='coerce', format='mixed')
+        return parsed
+    
+    def _to_records(self, df: pd.DataFrame, file_upload_id) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """
+        Convert cleaned rows to raw deposit documents
+        
+        Returns:
+            (documents, source row number of each document); rows without a
+            usable deposit date are recorded in self.errors and skipped
+        """
+        missing_date = df['deposit_date'].isna()
+        for idx in df.index[missing_date]:
+            self.errors.append(f"Row {idx + 1}: deposit_date is missing or not a valid date")
+        df = df[~missing_date]
+        
+        # _clean_data guarantees the required columns
+        frame = pd.DataFrame({
+            'account_number': df['account_number'].map(str),
+            'customer_name': df['customer_name'].map(str),
+            'deposit_type': df['deposit_type'].map(str),
+            'amount': df['amount'].astype(float),
+            'interest_rate': df['interest_rate'].astype(float)
+        }, index=df.index)
+        
+        for col in self.DATE_COLUMNS:
+            if col in df.columns:
+                # DateField storage: midnight datetimes, None when missing
+                dates = pd.to_datetime(df[col]).dt.normalize()
+                frame[col] = pd.Series(np.where(dates.notna(), dates.dt.to_pydatetime(), None),
+                                       index=df.index, dtype=object)
+        
+        for col in ['branch_code', 'product_code']:
+            if col in df.columns:
+                frame[col] = df[col].map(str).astype(object).where(df[col].notna(), None)
+        
+        now = datetime.now()
+        defaults = {
+            'status': 'active',
+            'file_upload': file_upload_id,
+            'created_at': now,
+            'updated_at': now
+        }
+        
+        # Missing optional fields are left out, as mongoengine does
+        documents = [
+            {**{key: value for key, value in record.items() if value is not None}, **defaults}
+            for record in frame.to_dict('records')
+        ]
+        return documents, [idx + 1 for idx in frame.index]
+    
     def _save_to_database(self, df: pd.DataFrame, file_upload_id: str) -> int:
-        """Save processed data to MongoDB"""
+        """Save processed data to MongoDB in chunked bulk inserts"""
         from models import Deposit, FileUpload
         
         file_upload = FileUpload.objects(id=file_upload_id).first()
         if not file_upload:
             raise ValueError("FileUpload not found")
         
-        records_saved = 0
+        start = time.perf_counter()
+        documents, row_numbers = self._to_records(df, file_upload.id)
+        collection = Deposit._get_collection()
         
-        for idx, row in df.iterrows():
+        records_saved = 0
+        for offset in range(0, len(documents), self.INSERT_CHUNK_SIZE):
+            chunk = documents[offset:offset + self.INSERT_CHUNK_SIZE]
             try:
-                # Create deposit record
-                deposit = Deposit(
-                    account_number=str(row.get('account_number', '')),
-                    customer_name=str(row.get('customer_name', '')),
-                    deposit_type=str(row.get('deposit_type', 'unknown')),
-                    amount=float(row.get('amount', 0.0)),
-                    interest_rate=float(row.get('interest_rate', 0.0)),
-                    deposit_date=row.get('deposit_date'),
-                    maturity_date=row.get('maturity_date'),
-                    last_activity_date=row.get('last_activity_date'),
-                    branch_code=str(row.get('branch_code', '')) if pd.notna(row.get('branch_code')) else None,
-                    product_code=str(row.get('product_code', '')) if pd.notna(row.get('product_code')) else None,
-                    status='active',
-                    file_upload=file_upload
-                )
-                deposit.save()
-                records_saved += 1
-                
-            except Exception as e:
-                self.errors.append(f"Row {idx + 1}: {str(e)}")
-                continue
+                collection.insert_many(chunk, ordered=False)
+                records_saved += len(chunk)
+            except BulkWriteError as e:
+                # Unordered insert: every other row in the chunk was written
+                records_saved += e.details.get('nInserted', 0)
+                for error in e.details.get('writeErrors', []):
+                    self.errors.append(f"Row {row_numbers[offset + error['index']]}: {error.get('errmsg')}")
+        
+        elapsed = time.perf_counter() - start
+        self.rows_per_second = round(records_saved / elapsed, 1) if elapsed > 0 else 0.0
         
         # Update file upload record
         file_upload.records_processed = records_saved
         file_upload.status = 'processed'
         file_upload.save()
         
+        # Cached reports no longer reflect the deposit book
+        from services.report_generator import invalidate_report_cache
+        invalidate_report_cache()
+        
         return records_saved
\ No newline at end of file
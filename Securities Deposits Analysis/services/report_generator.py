@@ -1,17 +1,67 @@
 """
 Report generation service for securities deposits analysis (MongoDB version)
+Each report is one $facet aggregation; results are cached briefly
 """
 
+import copy
 import json
 import os
+import threading
+import time
 from datetime import datetime, timedelta
+from config import Config
 from models import Deposit, InterestCalculation, AgingAnalysis, Report
 
 
+# Rows kept in unbounded detail lists, well inside the 16MB $facet result limit
+DETAIL_LIMIT = 5000
+
+# Generated reports by (report type, parameters): (expires at, report)
+_report_cache = {}
+_report_cache_lock = threading.Lock()
+
+
+def invalidate_report_cache():
+    """Drop cached reports (call when deposits or analysis results change)."""
+    with _report_cache_lock:
+        _report_cache.clear()
+
+
+def _deposit_lookup():
+    """$lookup + $unwind joining a result row to its deposit."""
+    return [
+        {'$lookup': {
+            'from': Deposit._get_collection_name(),
+            'localField': 'deposit',
+            'foreignField': '_id',
+            'as': 'deposit'
+        }},
+        {'$unwind': '$deposit'}
+    ]
+
+
+def _facet(queryset, facets, match=None):
+    """Run one $facet aggregation and return its single result document."""
+    pipeline = [{'$match': match}] if match else []
+    pipeline.append({'$facet': facets})
+    result = list(queryset.aggregate(pipeline))
+    return result[0] if result else {name: [] for name in facets}
+
+
+def _first(rows, field, default=0):
+    """Field of the first row of a $group/$count facet, or default when empty."""
+    return rows[0].get(field, default) if rows else default
+
+
 class ReportGenerator:
     """Service for generating various types of reports."""
     
-    def __init__(self):
+    def __init__(self, cache_ttl=None):
+        """
+        Args:
+            cache_ttl (int): Seconds a generated report is reused (default Config.REPORT_CACHE_TTL)
+        """
+        self.cache_ttl = Config.REPORT_CACHE_TTL if cache_ttl is None else cache_ttl
         self.report_types = {
             'summary': self._generate_summary_report,
             'aging': self._generate_aging_report,
@@ -35,71 +85,77 @@ class ReportGenerator:
         if report_type not in self.report_types:
             raise ValueError(f"Unsupported report type: {report_type}")
         
-        return self.report_types[report_type](parameters or {})
+        parameters = parameters or {}
+        key = (report_type, json.dumps(parameters, sort_keys=True, default=str))
+        now = time.monotonic()
+        
+        with _report_cache_lock:
+            cached = _report_cache.get(key)
+        if cached and cached[0] > now:
+            return copy.deepcopy(cached[1])
+        
+        report = self.report_types[report_type](parameters)
+        
+        if self.cache_ttl > 0:
+            with _report_cache_lock:
+                _report_cache[key] = (now + self.cache_ttl, copy.deepcopy(report))
+        return report
+    
+    def generate_reports(self, report_types=None, parameters=None):
+        """
+        Generate several reports at once (e.g. the dashboard cards).
+        
+        Args:
+            report_types (list): Report types to generate (default: all)
+            parameters (dict): Optional parameters passed to every report
+            
+        Returns:
+            dict: Report data by report type
+        """
+        return {
+            report_type: self.generate_report(report_type, parameters)
+            for report_type in (report_types or list(self.report_types))
+        }
     
     def _generate_summary_report(self, parameters):
         """Generate summary report of all deposits."""
         try:
             current_date = datetime.now().date()
-            
-            # Basic statistics using MongoDB aggregation
-            total_deposits = Deposit.objects.count()
-            
-            # Calculate total amount
-            pipeline = [
-                {'$group': {
-                    '_id': None,
-                    'total': {'$sum': '$amount'}
-                }}
-            ]
-            result = list(Deposit.objects.aggregate(pipeline))
-            total_amount = result[0]['total'] if result else 0
-            
-            # Status breakdown
-            status_pipeline = [
-                {'$group': {
-                    '_id': '$status',
-                    'count': {'$sum': 1},
-                    'amount': {'$sum': '$amount'}
-                }}
-            ]
-            status_data = list(Deposit.objects.aggregate(status_pipeline))
-            
-            status_summary = {}
-            for item in status_data:
-                status_summary[item['_id']] = {
-                    'count': item['count'],
-                    'amount': float(item['amount'])
-                }
-            
-            # Deposit type breakdown
-            type_pipeline = [
-                {'$group': {
-                    '_id': '$deposit_type',
-                    'count': {'$sum': 1},
-                    'amount': {'$sum': '$amount'}
-                }}
-            ]
-            type_data = list(Deposit.objects.aggregate(type_pipeline))
-            
-            type_summary = {}
-            for item in type_data:
-                type_summary[item['_id']] = {
-                    'count': item['count'],
-                    'amount': float(item['amount'])
-                }
-            
-            # Recent activity (last 30 days)
             thirty_days_ago = datetime.now() - timedelta(days=30)
-            recent_deposits = Deposit.objects(created_at__gte=thirty_days_ago).count()
+            
+            result = _facet(Deposit.objects, {
+                'totals': [
+                    {'$group': {'_id': None, 'count': {'$sum': 1}, 'total': {'$sum': '$amount'}}}
+                ],
+                'by_status': [
+                    {'$group': {'_id': '$status', 'count': {'$sum': 1}, 'amount': {'$sum': '$amount'}}}
+                ],
+                'by_type': [
+                    {'$group': {'_id': '$deposit_type', 'count': {'$sum': 1}, 'amount': {'$sum': '$amount'}}}
+                ],
+                # Recent activity (last 30 days)
+                'recent': [
+                    {'$match': {'created_at': {'$gte': thirty_days_ago}}},
+                    {'$count': 'count'}
+                ]
+            })
+            
+            status_summary = {
+                item['_id']: {'count': item['count'], 'amount': float(item['amount'])}
+                for item in result['by_status']
+            }
+            type_summary = {
+                item['_id']: {'count': item['count'], 'amount': float(item['amount'])}
+                for item in result['by_type']
+            }
             
             return {
                 'report_type': 'summary',
                 'report_date': current_date.isoformat(),
                 'summary_stats': {
-                    'total_deposits': total_deposits,
-                    'total_amount': float(total_amount),
-                    'recent_deposits_30_days': recent_deposits
+                    'total_deposits': _first(result['totals'], 'count'),
+                    'total_amount': float(_first(result['totals'], 'total')),
+                    'recent_deposits_30_days': _first(result['recent'], 'count')
                 },
                 'status_breakdown': status_summary,
                 'type_breakdown': type_summary,
@@ -110,44 +166,53 @@ class ReportGenerator:
             raise Exception(f"Error generating summary report: {str(e)}")
     
     def _generate_aging_report(self, parameters):
-        """Generate aging analysis report."""
+        """Generate aging analysis report from the latest result per deposit."""
         try:
             current_date = datetime.now().date()
             
-            # Get recent aging analysis
-            aging_records = AgingAnalysis.objects(analysis_date=current_date)
+            result = _facet(AgingAnalysis.objects, {
+                'by_bucket': [
+                    {'$group': {'_id': '$aging_bucket', 'count': {'$sum': 1}, 'amount': {'$sum': '$amount'}}}
+                ],
+                'by_risk': [
+                    {'$group': {'_id': '$risk_level', 'count': {'$sum': 1}}}
+                ],
+                'high_risk': [
+                    {'$match': {'risk_level': {'$in': ['high', 'critical']}}},
+                    {'$limit': 50},
+                    *_deposit_lookup(),
+                    {'$project': {
+                        'account_number': '$deposit.account_number',
+                        'customer_name': '$deposit.customer_name',
+                        'amount': '$deposit.amount',
+                        'aging_bucket': 1,
+                        'risk_level': 1,
+                        'days_to_maturity': 1
+                    }}
+                ]
+            })
             
             # Aging bucket summary
-            aging_summary = {}
-            for record in aging_records:
-                bucket = record.aging_bucket
-                if bucket not in aging_summary:
-                    aging_summary[bucket] = {'count': 0, 'amount': 0}
-                aging_summary[bucket]['count'] += 1
-                aging_summary[bucket]['amount'] += float(record.deposit.amount)
+            aging_summary = {
+                item['_id']: {'count': item['count'], 'amount': float(item['amount'])}
+                for item in result['by_bucket']
+            }
             
             # Risk level distribution
             risk_summary = {'low': 0, 'medium': 0, 'high': 0, 'critical': 0}
-            for record in aging_records:
-                if record.risk_level in risk_summary:
-                    risk_summary[record.risk_level] += 1
+            for item in result['by_risk']:
+                if item['_id'] in risk_summary:
+                    risk_summary[item['_id']] = item['count']
             
             # High-risk deposits details
-            high_risk_deposits = AgingAnalysis.objects(
-                analysis_date=current_date,
-                risk_level__in=['high', 'critical']
-            ).limit(50)
-            
-            high_risk_details = []
-            for record in high_risk_deposits:
-                high_risk_details.append({
-                    'account_number': record.deposit.account_number,
-                    'customer_name': record.deposit.customer_name,
-                    'amount': float(record.deposit.amount),
-                    'aging_bucket': record.aging_bucket,
-                    'risk_level': record.risk_level,
-                    'days_since_maturity': record.days_since_maturity
-                })
+            high_risk_details = [{
+                'account_number': row['account_number'],
+                'customer_name': row['customer_name'],
+                'amount': float(row['amount']),
+                'aging_bucket': row['aging_bucket'],
+                'risk_level': row['risk_level'],
+                'days_since_maturity': -row['days_to_maturity'] if row['days_to_maturity'] < 0 else None
+            } for row in result['high_risk']]
             
             total_analyzed = sum(v['count'] for v in aging_summary.values()) if aging_summary else 0
             
@@ -165,44 +230,49 @@ class ReportGenerator:
             raise Exception(f"Error generating aging report: {str(e)}")
     
     def _generate_interest_report(self, parameters):
-        """Generate interest accrual report."""
+        """Generate interest accrual report from the latest result per deposit."""
         try:
             current_date = datetime.now().date()
             
-            # Interest calculations summary
-            calculations = InterestCalculation.objects(calculation_date=current_date)
-            
-            total_earned = 0
-            total_cumulative = 0
-            calculations_count = 0
-            
-            for calc in calculations:
-                total_earned += float(calc.interest_earned)
-                total_cumulative += float(calc.cumulative_interest)
-                calculations_count += 1
-            
-            # Top earning deposits
-            top_earners = InterestCalculation.objects(
-                calculation_date=current_date
-            ).order_by('-interest_earned').limit(20)
-            
-            top_earners_details = []
-            for calc in top_earners:
-                top_earners_details.append({
-                    'account_number': calc.deposit.account_number,
-                    'customer_name': calc.deposit.customer_name,
-                    'principal_amount': float(calc.principal_amount),
-                    'interest_earned': float(calc.interest_earned),
-                    'cumulative_interest': float(calc.cumulative_interest)
-                })
+            result = _facet(InterestCalculation.objects, {
+                'totals': [
+                    {'$group': {
+                        '_id': None,
+                        'count': {'$sum': 1},
+                        'earned': {'$sum': '$interest_earned'},
+                        'cumulative': {'$sum': '$cumulative_interest'}
+                    }}
+                ],
+                # Top earning deposits
+                'top_earners': [
+                    {'$sort': {'interest_earned': -1}},
+                    {'$limit': 20},
+                    *_deposit_lookup(),
+                    {'$project': {
+                        'account_number': '$deposit.account_number',
+                        'customer_name': '$deposit.customer_name',
+                        'principal_amount': 1,
+                        'interest_earned': 1,
+                        'cumulative_interest': 1
+                    }}
+                ]
+            })
+            
+            top_earners_details = [{
+                'account_number': row['account_number'],
+                'customer_name': row['customer_name'],
+                'principal_amount': float(row['principal_amount']),
+                'interest_earned': float(row['interest_earned']),
+                'cumulative_interest': float(row['cumulative_interest'])
+            } for row in result['top_earners']]
             
             return {
                 'report_type': 'interest',
                 'report_date': current_date.isoformat(),
                 'summary': {
-                    'total_interest_earned': total_earned,
-                    'total_cumulative_interest': total_cumulative,
-                    'deposits_calculated': calculations_count
+                    'total_interest_earned': float(_first(result['totals'], 'earned')),
+                    'total_cumulative_interest': float(_first(result['totals'], 'cumulative')),
+                    'deposits_calculated': _first(result['totals'], 'count')
                 },
                 'top_earners': top_earners_details,
                 'generated_at': datetime.now().isoformat()
@@ -215,49 +285,65 @@ class ReportGenerator:
         """Generate exception report for unusual or problematic deposits."""
         try:
             current_date = datetime.now().date()
+            old_threshold = current_date - timedelta(days=3650)
+            fields = {'account_number': 1, 'customer_name': 1, 'amount': 1, 'deposit_type': 1, 'deposit_date': 1}
+            
+            result = _facet(Deposit.objects, {
+                # Large deposits (over $100,000)
+                'large_amount': [
+                    {'$match': {'amount': {'$gt': 100000}}},
+                    {'$limit': 50},
+                    {'$project': fields}
+                ],
+                # Deposits with zero interest rate but should have interest
+                'zero_interest': [
+                    {'$match': {
+                        'interest_rate': 0,
+                        'deposit_type': {'$in': ['certificate', 'cd', 'time_deposit']}
+                    }},
+                    {'$limit': 50},
+                    {'$project': fields}
+                ],
+                # Very old deposits (over 10 years)
+                'very_old': [
+                    {'$match': {'deposit_date': {
+                        '$lt': datetime(old_threshold.year, old_threshold.month, old_threshold.day)
+                    }}},
+                    {'$limit': 50},
+                    {'$project': fields}
+                ]
+            })
             
             exceptions = []
             
-            # Large deposits (over $100,000)
-            large_deposits = Deposit.objects(amount__gt=100000).limit(50)
-            
-            for deposit in large_deposits:
+            for deposit in result['large_amount']:
                 exceptions.append({
                     'type': 'large_amount',
-                    'account_number': deposit.account_number,
-                    'customer_name': deposit.customer_name,
-                    'amount': float(deposit.amount),
-                    'description': f'Large deposit amount: ${deposit.amount:,.2f}',
+                    'account_number': deposit['account_number'],
+                    'customer_name': deposit['customer_name'],
+                    'amount': float(deposit['amount']),
+                    'description': f"Large deposit amount: ${deposit['amount']:,.2f}",
                     'severity': 'medium'
                 })
             
-            # Deposits with zero interest rate but should have interest
-            zero_interest = Deposit.objects(
-                interest_rate=0,
-                deposit_type__in=['certificate', 'cd', 'time_deposit']
-            ).limit(50)
-            
-            for deposit in zero_interest:
+            for deposit in result['zero_interest']:
                 exceptions.append({
                     'type': 'zero_interest',
-                    'account_number': deposit.account_number,
-                    'customer_name': deposit.customer_name,
-                    'deposit_type': deposit.deposit_type,
+                    'account_number': deposit['account_number'],
+                    'customer_name': deposit['customer_name'],
+                    'deposit_type': deposit['deposit_type'],
                     'description': 'Interest-bearing deposit type with zero interest rate',
                     'severity': 'low'
                 })
             
-            # Very old deposits (over 10 years)
-            old_threshold = current_date - timedelta(days=3650)
-            old_deposits = Deposit.objects(deposit_date__lt=old_threshold).limit(50)
-            
-            for deposit in old_deposits:
-                years_old = (current_date - deposit.deposit_date).days // 365
+            for deposit in result['very_old']:
+                deposit_date = deposit['deposit_date'].date()
+                years_old = (current_date - deposit_date).days // 365
                 exceptions.append({
                     'type': 'very_old',
-                    'account_number': deposit.account_number,
-                    'customer_name': deposit.customer_name,
-                    'deposit_date': deposit.deposit_date.isoformat(),
+                    'account_number': deposit['account_number'],
+                    'customer_name': deposit['customer_name'],
+                    'deposit_date': deposit_date.isoformat(),
                     'description': f'Very old deposit: {years_old} years',
                     'severity': 'high'
                 })
@@ -284,31 +370,34 @@ class ReportGenerator:
         try:
             current_date = datetime.now().date()
             
-            # Compliance status summary
-            compliance_records = AgingAnalysis.objects(analysis_date=current_date)
-            
-            compliance_summary = {}
-            for record in compliance_records:
-                status = record.compliance_status
-                if status not in compliance_summary:
-                    compliance_summary[status] = 0
-                compliance_summary[status] += 1
-            
-            # Non-compliant deposits details
-            non_compliant = AgingAnalysis.objects(
-                analysis_date=current_date,
-                compliance_status__ne='compliant'
-            )
-            
-            non_compliant_details = []
-            for record in non_compliant:
-                non_compliant_details.append({
-                    'account_number': record.deposit.account_number,
-                    'customer_name': record.deposit.customer_name,
-                    'amount': float(record.deposit.amount),
-                    'compliance_status': record.compliance_status,
-                    'notes': record.notes
-                })
+            result = _facet(AgingAnalysis.objects, {
+                'by_status': [
+                    {'$group': {'_id': '$compliance_status', 'count': {'$sum': 1}}}
+                ],
+                # Non-compliant deposits details
+                'non_compliant': [
+                    {'$match': {'compliance_status': {'$ne': 'compliant'}}},
+                    {'$limit': DETAIL_LIMIT},
+                    *_deposit_lookup(),
+                    {'$project': {
+                        'account_number': '$deposit.account_number',
+                        'customer_name': '$deposit.customer_name',
+                        'amount': '$deposit.amount',
+                        'compliance_status': 1,
+                        'notes': 1
+                    }}
+                ]
+            })
+            
+            compliance_summary = {item['_id']: item['count'] for item in result['by_status']}
+            
+            non_compliant_details = [{
+                'account_number': row['account_number'],
+                'customer_name': row['customer_name'],
+                'amount': float(row['amount']),
+                'compliance_status': row['compliance_status'],
+                'notes': row.get('notes')
+            } for row in result['non_compliant']]
             
             return {
                 'report_type': 'compliance',
@@ -325,32 +414,41 @@ class ReportGenerator:
     def _generate_unclaimed_report(self, parameters):
         """Generate unclaimed deposits report."""
         try:
-            # Get unclaimed deposits
-            unclaimed_deposits = Deposit.objects(status='unclaimed')
+            current_date = datetime.now().date()
             
-            unclaimed_details = []
-            total_unclaimed_amount = 0
+            result = _facet(Deposit.objects, {
+                'totals': [
+                    {'$group': {'_id': None, 'count': {'$sum': 1}, 'amount': {'$sum': '$amount'}}}
+                ],
+                'deposits': [
+                    {'$limit': DETAIL_LIMIT},
+                    {'$project': {
+                        'account_number': 1,
+                        'customer_name': 1,
+                        'amount': 1,
+                        'deposit_date': 1,
+                        'last_activity_date': 1
+                    }}
+                ]
+            }, match={'status': 'unclaimed'})
             
-            for deposit in unclaimed_deposits:
-                activity_date = deposit.last_activity_date or deposit.deposit_date
-                days_dormant = (datetime.now().date() - activity_date).days
-                
+            unclaimed_details = []
+            for deposit in result['deposits']:
+                activity_date = (deposit.get('last_activity_date') or deposit['deposit_date']).date()
                 unclaimed_details.append({
-                    'account_number': deposit.account_number,
-                    'customer_name': deposit.customer_name,
-                    'amount': float(deposit.amount),
-                    'deposit_date': deposit.deposit_date.isoformat(),
+                    'account_number': deposit['account_number'],
+                    'customer_name': deposit['customer_name'],
+                    'amount': float(deposit['amount']),
+                    'deposit_date': deposit['deposit_date'].date().isoformat(),
                     'last_activity_date': activity_date.isoformat(),
-                    'days_dormant': days_dormant
+                    'days_dormant': (current_date - activity_date).days
                 })
-                
-                total_unclaimed_amount += float(deposit.amount)
             
             return {
                 'report_type': 'unclaimed',
-                'report_date': datetime.now().date().isoformat(),
-                'total_unclaimed_deposits': len(unclaimed_details),
-                'total_unclaimed_amount': total_unclaimed_amount,
+                'report_date': current_date.isoformat(),
+                'total_unclaimed_deposits': _first(result['totals'], 'count'),
+                'total_unclaimed_amount': float(_first(result['totals'], 'amount')),
                 'unclaimed_deposits': unclaimed_details,
                 'generated_at': datetime.now().isoformat()
             }